@@ -0,0 +1,104 @@
+from vectorial import resolve_engine
+
+# Números precodificados que se guardan como máximo en cada tabla (dígitos: 10^4 sufijos)
+TABLE_DIGITS = 4
+TABLE_SIZE = 10 ** TABLE_DIGITS
+
+# Tablas del proceso, por (dígitos, año inicial, cantidad de números)
+_tables = {}
+
+class AffixTable:
+    """
+    Números de una configuración (dígitos con ceros o rango de años) ya codificados en
+    UTF-8, listos para concatenarse con la palabra sin crear cadenas intermedias.
+
+    La memoria está acotada a TABLE_SIZE números: con más de TABLE_DIGITS dígitos solo se
+    guardan los últimos TABLE_DIGITS y cada bloque añade delante el prefijo común
+    (ej. para 6 dígitos, '12' + '0000'..'9999'). Los rangos de años mayores que la tabla
+    se codifican por bloques sobre la marcha.
+    'vectorized' indica si los bloques se construyen con el motor de NumPy.
+    """
+    def __init__(self, num_digits=0, years_start=None, number_count=0, vectorized=None):
+        self.vectorized = resolve_engine() if vectorized is None else vectorized
+        self.num_digits = num_digits
+        self.years_start = years_start
+        self.number_count = number_count
+        if years_start is not None:
+            self._table = None
+            if number_count <= TABLE_SIZE:
+                self._table = [str(year).encode("ascii") for year in range(years_start, years_start + number_count)]
+            self._low_digits = 0
+        else:
+            self._low_digits = min(num_digits, TABLE_DIGITS)
+            self._table = [str(i).zfill(self._low_digits).encode("ascii") for i in range(10 ** self._low_digits)]
+
+    @property
+    def block_size(self):
+        """Cantidad máxima de números de cada bloque (los bloques de dígitos comparten prefijo)."""
+        return TABLE_SIZE if self.years_start is not None else len(self._table)
+
+    def block_stop(self, start):
+        """
+        Devuelve el final del bloque que contiene el número 'start'. Los bloques están
+        alineados a block_size y todos sus números tienen el mismo ancho (los años se
+        cortan además donde cambia el número de cifras, ej. 999 -> 1000).
+        """
+        stop = (start // self.block_size + 1) * self.block_size
+        if self.years_start is not None:
+            year = self.years_start + start
+            width = len(str(abs(year)))
+            # Primer año con otro número de cifras (en negativos, hacia el cero)
+            next_width_year = 10 ** width if year >= 0 else -(10 ** (width - 1)) + 1
+            stop = min(stop, next_width_year - self.years_start)
+        return min(stop, self.number_count)
+
+    def block(self, start, stop):
+        """
+        Devuelve la lista de números [start, stop) codificados. El rango no puede cruzar
+        un límite de bloque (ver block_stop).
+        """
+        if self.years_start is not None:
+            if self._table is not None:
+                return self._table[start:stop]
+            return [str(year).encode("ascii") for year in range(self.years_start + start, self.years_start + stop)]
+        low_size = len(self._table)
+        high, low_start = divmod(start, low_size)
+        low_stop = low_start + (stop - start)
+        if self.num_digits == self._low_digits:
+            return self._table[low_start:low_stop]
+        prefix = str(high).zfill(self.num_digits - self._low_digits).encode("ascii")
+        return [prefix + low for low in self._table[low_start:low_stop]]
+
+def _table_key(index):
+    return (index.num_digits, index.years_start, index.number_count)
+
+def affix_table(index):
+    """
+    Devuelve la tabla de números de un CandidateIndex, creándola la primera vez.
+    Las tablas instaladas con install_affix_tables (o heredadas del proceso principal)
+    se reutilizan, así cada configuración se construye una sola vez por trabajo.
+    """
+    key = _table_key(index)
+    table = _tables.get(key)
+    if table is None:
+        table = AffixTable(*key)
+        _tables[key] = table
+    return table
+
+def build_affix_tables(indexes, engine="auto"):
+    """
+    Construye las tablas de números de varios CandidateIndex (una por configuración)
+    para el motor indicado ('auto', 'python' o 'numpy').
+    """
+    vectorized = resolve_engine(engine)
+    tables = {}
+    for index in indexes:
+        key = _table_key(index)
+        if index.number_count and key not in tables:
+            tables[key] = AffixTable(*key, vectorized=vectorized)
+    install_affix_tables(tables)
+    return tables
+
+def install_affix_tables(tables):
+    """Instala en el proceso actual tablas construidas en otro (inicializador del pool)."""
+    _tables.update(tables)
@@ -0,0 +1,92 @@
+import hashlib
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Tasa de falsos positivos por defecto del filtro
+DEFAULT_BLOOM_FP_RATE = 0.001
+
+def bloom_parameters(expected_items, fp_rate=DEFAULT_BLOOM_FP_RATE, max_bytes=None):
+    """
+    Calcula el número de bits y de funciones hash óptimos para 'expected_items' elementos
+    con la tasa de falsos positivos indicada, sin pasar de max_bytes si se especifica.
+    Devuelve (num_bits, num_hashes, tasa_efectiva).
+    """
+    if not 0 < fp_rate < 1:
+        raise ValueError("La tasa de falsos positivos debe estar entre 0 y 1.")
+    expected_items = max(1, expected_items)
+    num_bits = math.ceil(-expected_items * math.log(fp_rate) / (math.log(2) ** 2))
+    if max_bytes is not None:
+        num_bits = min(num_bits, max_bytes * 8)
+    num_bits = max(64, num_bits)
+    num_hashes = max(1, round(num_bits / expected_items * math.log(2)))
+    effective_rate = (1 - math.exp(-num_hashes * expected_items / num_bits)) ** num_hashes
+    return num_bits, num_hashes, effective_rate
+
+class SharedBloomFilter:
+    """
+    Filtro Bloom en memoria compartida (multiprocessing.shared_memory) visible para todos
+    los procesos del pool. Se usa en la escritura para suprimir claves ya vistas.
+    No usa locks: dos procesos que añaden a la vez la misma clave pueden dejar pasar un
+    duplicado, pero nunca se descarta una clave nueva salvo por un falso positivo.
+    """
+    def __init__(self, shm, num_bits, num_hashes, owner):
+        self._shm = shm
+        self._bits = shm.buf
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self._owner = owner
+
+    @classmethod
+    def create(cls, num_bits, num_hashes):
+        """Crea un filtro vacío. El proceso que lo crea debe llamar a unlink() al terminar."""
+        shm = shared_memory.SharedMemory(create=True, size=(num_bits + 7) // 8)
+        shm.buf[:] = bytes(shm.size)
+        return cls(shm, num_bits, num_hashes, owner=True)
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Se conecta desde un proceso hijo a un filtro creado por el proceso principal."""
+        try:
+            shm = shared_memory.SharedMemory(name=descriptor['name'], track=False)
+        except TypeError:
+            # Python < 3.13: con 'spawn' el hijo tiene su propio resource_tracker, que liberaría
+            # la memoria al salir; con 'fork' el tracker es el del proceso principal y no se toca
+            shm = shared_memory.SharedMemory(name=descriptor['name'])
+            if multiprocessing.get_start_method() == "spawn":
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, descriptor['num_bits'], descriptor['num_hashes'], owner=False)
+
+    def descriptor(self):
+        """Datos (serializables) para conectarse al filtro desde otro proceso."""
+        return {'name': self._shm.name, 'num_bits': self.num_bits, 'num_hashes': self.num_hashes}
+
+    def add(self, item):
+        """
+        Añade una clave (bytes). Devuelve True si no estaba (es nueva) y False si ya
+        estaba o es un falso positivo.
+        """
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self._bits
+        num_bits = self.num_bits
+        is_new = False
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % num_bits
+            byte = bit >> 3
+            mask = 1 << (bit & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                is_new = True
+        return is_new
+
+    def close(self):
+        self._bits = None
+        self._shm.close()
+
+    def unlink(self):
+        """Libera la memoria compartida (solo el proceso que la creó)."""
+        if self._owner:
+            self._shm.unlink()
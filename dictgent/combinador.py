@@ -0,0 +1,205 @@
+import itertools
+import math
+import os
+import sys
+from multiprocessing import Pool
+from tqdm import tqdm
+from contenido import _print_verbose, keyword_args_dict, PARTS_PER_PROCESS
+from indice import CandidateIndex
+from afijos import build_affix_tables, install_affix_tables
+from escritor import (DEFAULT_BUFFER_SIZE, ShardWriter, shard_path, prepare_shard_directory,
+                      concatenate_shards, remove_shards)
+
+# Memoria por defecto para el lado interior de las combinaciones (256 MiB entre todos los procesos)
+DEFAULT_COMBINE_MEMORY = 256 * 1024 * 1024
+# Prefijos (lado exterior) por bloque y tamaño de cada bloque del lado interior volcado a disco
+OUTER_BLOCK = 4096
+INNER_BLOCK_BYTES = 4 * 1024 * 1024
+# Coste aproximado en memoria de cada clave del lado interior guardada como objeto bytes
+INNER_ITEM_OVERHEAD = 40
+COMBINE_DIR_SUFFIX = ".combine"
+
+def combination_groups(keywords_settings, max_words, separators=("",), permute=False):
+    """
+    Enumera las combinaciones de 2 a max_words palabras clave, en el orden de salida.
+    Sin permute se respeta el orden en que se dieron las palabras (nombre+año, no año+nombre).
+    Devuelve una lista de diccionarios con los índices de las palabras, el separador,
+    el número de claves y su tamaño exacto en bytes.
+    """
+    if max_words < 2:
+        raise ValueError("Las combinaciones necesitan al menos 2 palabras clave.")
+    if max_words > len(keywords_settings):
+        raise ValueError(f"No se pueden combinar {max_words} palabras clave: solo hay {len(keywords_settings)}.")
+    indexes = [CandidateIndex(keyword, args_dict) for keyword, args_dict in keywords_settings]
+    counts = [index.count for index in indexes]
+    # Bytes sin saltos de línea de todas las variaciones de cada palabra
+    content_bytes = [index.byte_size() - index.count for index in indexes]
+    choose = itertools.permutations if permute else itertools.combinations
+    groups = []
+    for words in range(2, max_words + 1):
+        for members in choose(range(len(indexes)), words):
+            count = math.prod(counts[member] for member in members)
+            for separator in separators:
+                # Cada variación aparece una vez por cada combinación de las demás palabras
+                size = sum(content_bytes[member] * (count // counts[member]) for member in members if counts[member])
+                size += count * (len(separator.encode("utf-8")) * (words - 1) + 1)
+                groups.append({'members': members, 'separator': separator, 'count': count, 'bytes': size})
+    return groups
+
+def _outer_prefix(indexes, position, separator):
+    """Prefijo del lado exterior en la posición indicada: variaciones unidas por el separador."""
+    words = []
+    for index in reversed(indexes):
+        position, item = divmod(position, index.count)
+        words.append(index.unrank(item))
+    return "".join(word + separator for word in reversed(words)).encode("utf-8")
+
+def _iter_spilled(path):
+    """Lee el lado interior volcado a disco en bloques de ~INNER_BLOCK_BYTES (listas de claves)."""
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            chunk = f.read(INNER_BLOCK_BYTES)
+            if not chunk:
+                break
+            data = rest + chunk
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            if cut:
+                yield data[:cut - 1].split(b"\n")
+        if rest:
+            yield [rest]
+
+def _combine_task(task):
+    """
+    Genera un rango [inicio, fin) del lado exterior de una combinación y lo une con todas
+    las variaciones del lado interior (la última palabra) mediante un 'block nested-loop
+    join': por cada bloque de OUTER_BLOCK prefijos se recorre el lado interior, que está en
+    memoria o, si no cabe, se lee del disco por bloques.
+    Devuelve (claves escritas, terminada): si falla, el fragmento conserva lo ya escrito.
+    """
+    outer = [CandidateIndex(keyword, args_dict) for keyword, args_dict in task['outer']]
+    inner = CandidateIndex(*task['inner'])
+    separator = task['separator']
+    if task['spill_path'] is None:
+        # Se parte bloque a bloque: en memoria solo la lista (lo que presupuesta generate_combinations) y un bloque
+        inner_lines = []
+        for block, _ in inner.iter_blocks():
+            inner_lines += block.split(b"\n")[:-1]
+
+    def inner_blocks():
+        if task['spill_path'] is not None:
+            return _iter_spilled(task['spill_path'])
+        return [inner_lines]
+
+    written = 0
+    completed = False
+    try:
+        with ShardWriter(task['shard_path'], buffer_size=task['buffer_size'], compression=task['compression']) as writer:
+            for block_start in range(task['start'], task['stop'], OUTER_BLOCK):
+                block_stop = min(task['stop'], block_start + OUTER_BLOCK)
+                prefixes = [_outer_prefix(outer, position, separator) for position in range(block_start, block_stop)]
+                for lines in inner_blocks():
+                    if not lines:
+                        continue
+                    for prefix in prefixes:
+                        writer.write_block(prefix + (b"\n" + prefix).join(lines) + b"\n", len(lines))
+                        written += len(lines)
+        completed = True
+    except KeyboardInterrupt:
+        tqdm.write("\nCombinación interrumpida por el usuario.")
+    except Exception as e:
+        tqdm.write(f"Error inesperado al combinar palabras clave: {e}")
+    return written, completed
+
+def _spill_inner(index, path):
+    """Vuelca todas las variaciones de una palabra clave a disco (lado interior que no cabe en memoria)."""
+    with open(path, "wb") as f:
+        for block, _ in index.iter_blocks():
+            f.write(block)
+
+def generate_combinations(keywords_data, output_filepath, max_words, separators=("",), permute=False,
+                          num_processes=None, memory_budget=DEFAULT_COMBINE_MEMORY,
+                          buffer_size=DEFAULT_BUFFER_SIZE, engine="auto", compression=None):
+    """
+    Etapa de combinación: añade al final de output_filepath las uniones de las variaciones
+    de 2 a max_words palabras clave (ej. nombre + año + mascota), con cada separador.
+    El lado exterior de cada combinación se reparte entre los procesos en rangos alineados a
+    OUTER_BLOCK (la salida no depende del número de procesos) y el lado interior se guarda
+    en memoria si cabe en memory_budget o se vuelca a disco y se relee por bloques.
+    Con compression los fragmentos se comprimen como en la generación principal.
+    Devuelve el número de claves añadidas. Si alguna tarea falla, lo ya escrito se añade
+    igualmente y se lanza IOError: las combinaciones quedan incompletas.
+    """
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+    if memory_budget is None or memory_budget <= 0:
+        raise ValueError("El presupuesto de memoria debe ser un número positivo.")
+    separators = list(separators) or [""]
+    keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+    groups = combination_groups(keywords_settings, max_words, separators, permute)
+    indexes = [CandidateIndex(keyword, args_dict) for keyword, args_dict in keywords_settings]
+    total = sum(group['count'] for group in groups)
+    tqdm.write(f"\n--- Combinación de palabras clave ---")
+    tqdm.write(f"{len(groups)} combinaciones de hasta {max_words} palabras: {total:,} claves.")
+
+    work_dir = f"{output_filepath}{COMBINE_DIR_SUFFIX}"
+    prepare_shard_directory(work_dir)
+
+    # El lado interior de cada combinación (su última palabra) se vuelca a disco si no cabe en memoria
+    per_process_budget = memory_budget // num_processes
+    spill_paths = {}
+    for member in {group['members'][-1] for group in groups}:
+        index = indexes[member]
+        if index.byte_size() + index.count * INNER_ITEM_OVERHEAD > per_process_budget:
+            spill_paths[member] = os.path.join(work_dir, f"inner-{member:04d}.txt")
+            _print_verbose(f"'{index.keyword}' no cabe en memoria como lado interior: se vuelca a '{spill_paths[member]}'.")
+            _spill_inner(index, spill_paths[member])
+
+    tasks = []
+    for group in groups:
+        outer_count = group['count'] // indexes[group['members'][-1]].count if group['count'] else 0
+        target_parts = num_processes * PARTS_PER_PROCESS
+        step = max(OUTER_BLOCK, -(-outer_count // target_parts))
+        step = -(-step // OUTER_BLOCK) * OUTER_BLOCK
+        for start in range(0, outer_count, step):
+            tasks.append({
+                'outer': [keywords_settings[member] for member in group['members'][:-1]],
+                'inner': keywords_settings[group['members'][-1]],
+                'separator': group['separator'],
+                'start': start,
+                'stop': min(outer_count, start + step),
+                'spill_path': spill_paths.get(group['members'][-1]),
+                'shard_path': shard_path(work_dir, len(tasks)),
+                'buffer_size': buffer_size,
+                'compression': compression
+            })
+    _print_verbose(f"Tareas de combinación creadas: {len(tasks)}")
+
+    shard_paths = [task['shard_path'] for task in tasks]
+    affix_tables = build_affix_tables(indexes, engine)
+    written = 0
+    failed = 0
+    pbar = tqdm(desc="Total combinado", unit="claves", total=total, leave=True, file=sys.stdout)
+    try:
+        with Pool(processes=num_processes, initializer=install_affix_tables, initargs=(affix_tables,)) as pool:
+            for count, completed in pool.imap(_combine_task, tasks):
+                written += count
+                failed += not completed
+                pbar.update(count)
+    except KeyboardInterrupt:
+        pbar.close()
+        # Las combinaciones ya escritas se conservan como en la generación normal
+        concatenate_shards(shard_paths, output_filepath, compressed=compression is not None)
+        remove_shards(work_dir)
+        raise
+    pbar.close()
+
+    _print_verbose(f"Concatenando {len(shard_paths)} fragmentos de combinaciones en '{output_filepath}'.")
+    concatenate_shards(shard_paths, output_filepath, compressed=compression is not None)
+    remove_shards(work_dir)
+    if failed:
+        raise IOError(f"{failed} de {len(tasks)} tareas de combinación han fallado; solo se añadieron "
+                      f"{written:,} de {total:,} claves a '{output_filepath}'.")
+    tqdm.write(f"Combinaciones añadidas a '{output_filepath}': {written:,} claves.")
+    return written
@@ -0,0 +1,66 @@
+import bz2
+import gzip
+import lzma
+
+COMPRESSION_FORMATS = ("gzip", "bz2", "xz")
+SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+# Cabecera de cada formato, para reconocer la entrada sin fiarse de la extensión
+MAGIC = {"gzip": b"\x1f\x8b", "bz2": b"BZh", "xz": b"\xfd7zXZ\x00"}
+# Niveles por defecto: buen equilibrio entre tamaño y velocidad para listas de claves
+LEVELS = {"gzip": 6, "bz2": 9, "xz": 3}
+_MODULES = {"gzip": gzip, "bz2": bz2, "xz": lzma}
+
+def compress_member(data, compression):
+    """
+    Comprime un bloque como un miembro completo e independiente. Los tres formatos admiten
+    miembros concatenados, así cada proceso comprime sus bloques por su cuenta y el archivo
+    final es la simple concatenación de los fragmentos.
+    """
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=LEVELS["gzip"], mtime=0)
+    if compression == "bz2":
+        return bz2.compress(data, compresslevel=LEVELS["bz2"])
+    if compression == "xz":
+        return lzma.compress(data, preset=LEVELS["xz"])
+    raise ValueError(f"Compresión desconocida: '{compression}'. Opciones: {', '.join(COMPRESSION_FORMATS)}.")
+
+def detect_compression(path):
+    """Devuelve el formato de compresión del archivo según su cabecera, o None si es texto."""
+    with open(path, "rb") as f:
+        header = f.read(max(len(magic) for magic in MAGIC.values()))
+    for compression, magic in MAGIC.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+def open_compressed(path, mode="rb", compression=None):
+    """
+    Abre un archivo en modo binario, comprimido con el formato indicado o sin comprimir
+    si compression es None. Al leer se recorren todos los miembros concatenados.
+    """
+    if compression is None:
+        return open(path, mode)
+    if compression not in _MODULES:
+        raise ValueError(f"Compresión desconocida: '{compression}'. Opciones: {', '.join(COMPRESSION_FORMATS)}.")
+    if "w" in mode or "a" in mode:
+        if compression == "xz":
+            return lzma.open(path, mode, preset=LEVELS["xz"])
+        return _MODULES[compression].open(path, mode, compresslevel=LEVELS[compression])
+    return _MODULES[compression].open(path, mode)
+
+def open_input(path):
+    """Abre para lectura binaria un archivo de texto o comprimido (gzip, bz2 o xz)."""
+    return open_compressed(path, "rb", detect_compression(path))
+
+def split_suffix(path):
+    """Separa la extensión de compresión de una ruta: ('dict.txt.gz') -> ('dict.txt', '.gz')."""
+    for suffix in SUFFIXES.values():
+        if path.endswith(suffix):
+            return path[:-len(suffix)], suffix
+    return path, ""
+
+def compressed_path(path, compression):
+    """Añade a la ruta la extensión del formato si aún no la tiene."""
+    if compression is None or path.endswith(SUFFIXES[compression]):
+        return path
+    return path + SUFFIXES[compression]
@@ -1,8 +1,26 @@
-import itertools
+import collections
 import os
+import queue
 import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from tqdm import tqdm
-from multiprocessing import Pool, Manager, Lock
+from multiprocessing import Pool
+from indice import CandidateIndex
+from politica import CandidatePolicy
+from reglas import rule_plan
+from puntos_control import (DEFAULT_CHECKPOINT_INTERVAL, state_path, save_manifest, load_manifest,
+                            save_task_state, restore_task)
+from afijos import build_affix_tables, install_affix_tables
+from bloom import SharedBloomFilter, bloom_parameters
+from progreso import create_counters, install_counters, publish, ProgressReporter
+from estadisticas import StageTimes, TaskProfiler
+from reparto import keyword_ranges
+from programador import (TaskTimer, estimate_cost, parts_for_cost, longest_first, worker_utilization,
+                         print_utilization)
+from escritor import (DEFAULT_BUFFER_SIZE, ShardWriter, RegionWriter, shard_directory, shard_path,
+                      prepare_shard_directory, concatenate_shards, remove_shards, preallocate_output)
 
 # Variable global para controlar la verbosidad
 # Se actualizará desde el módulo principal (dictgen.py)
@@ -18,6 +36,161 @@ def _print_verbose(message):
     if _verbose_mode:
         tqdm.write(f"[DETALLE] {message}")
 
+def keyword_args_dict(args):
+    """
+    Extrae de un Namespace (CLI o interactivo) las opciones de generación de una palabra clave
+    en el diccionario que reciben los procesos y el índice de candidatos.
+    """
+    policy = getattr(args, 'policy', None)
+    return {
+        'numbers': args.numbers,
+        'digits': args.digits,
+        'years_range': args.years_range,
+        'special_chars': args.special_chars,
+        'case_mix': args.case_mix,
+        'limit': args.limit,
+        'canonical': getattr(args, 'canonical', False),
+        'rules': getattr(args, 'rules', None),
+        'leet': getattr(args, 'leet', None),
+        'leet_max': getattr(args, 'leet_max', None),
+        'policy': policy.as_dict() if policy is not None else None
+    }
+
+# Reparto de palabras clave grandes entre procesos: partes por proceso (el coste de cada parte no
+# supera el total entre num_procesos * PARTS_PER_PROCESS) y tamaño mínimo de cada parte
+PARTS_PER_PROCESS = 4
+MIN_CANDIDATES_PER_PART = 20000
+# Generación por bloques (salida estándar y API): claves por bloque y bloques en vuelo por proceso
+STREAM_CHUNK_CANDIDATES = 65536
+STREAM_WINDOW_PER_PROCESS = 2
+
+@dataclass
+class GenerationSettings:
+    """
+    Opciones de generación de una palabra clave, equivalentes a las de la línea de comandos.
+    Se usan con la API de iteradores de DictionaryGenerator (iter_candidates, iter_batches...).
+    Los números solo se añaden con numbers=True, usando years_range o, si no, digits.
+    rules sustituye las variaciones básicas por reglas de hashcat (ej. ['c', '$1', 'sa@']).
+    leet añade sustituciones con esa tabla (ej. DEFAULT_LEET_TABLE), como mucho leet_max por palabra.
+    policy (CandidatePolicy) deja solo las claves que cumplen una política de longitud y caracteres.
+    """
+    numbers: bool = False
+    digits: Optional[int] = None
+    years_range: Optional[Tuple[int, int]] = None
+    special_chars: Optional[List[str]] = None
+    case_mix: bool = False
+    limit: Optional[int] = None
+    canonical: bool = False
+    rules: Optional[List[str]] = None
+    leet: Optional[Dict[str, List[str]]] = None
+    leet_max: Optional[int] = None
+    policy: Optional[CandidatePolicy] = None
+
+    def __post_init__(self):
+        if self.digits is not None and (not isinstance(self.digits, int) or self.digits < 0):
+            raise ValueError("digits debe ser un entero positivo.")
+        if self.limit is not None and (not isinstance(self.limit, int) or self.limit <= 0):
+            raise ValueError("El límite de claves debe ser un número positivo si se especifica.")
+        if self.years_range is not None:
+            self.years_range = tuple(self.years_range)
+        if self.special_chars is not None:
+            self.special_chars = list(self.special_chars)
+        if self.rules is not None:
+            self.rules = list(self.rules)
+            if self.case_mix:
+                raise ValueError("Las reglas no se pueden combinar con case_mix.")
+            rule_plan(self.rules)
+        if self.leet_max is not None and (not isinstance(self.leet_max, int) or self.leet_max < 0):
+            raise ValueError("leet_max debe ser un entero no negativo.")
+        if self.leet is not None:
+            self.leet = {char: list(substitutes) for char, substitutes in self.leet.items()}
+
+    @classmethod
+    def from_namespace(cls, args):
+        """Crea la configuración a partir de un Namespace de la línea de comandos o del modo interactivo."""
+        return cls(**keyword_args_dict(args))
+
+# Filtro Bloom del proceso hijo en la generación por bloques (se conecta en _init_chunk_worker)
+_chunk_bloom = None
+
+def _init_chunk_worker(affix_tables, bloom_descriptor, verbose, redirect_stdout):
+    """
+    Inicializa cada proceso del pool en la generación por bloques: instala las tablas de
+    afijos del trabajo, con redirect_stdout los mensajes van a stderr (la salida estándar
+    queda reservada para las claves) y, si se indica, se conecta al filtro Bloom compartido.
+    """
+    global _chunk_bloom
+    install_affix_tables(affix_tables)
+    if redirect_stdout:
+        sys.stdout = sys.stderr
+    set_verbose_mode(verbose)
+    if bloom_descriptor is not None:
+        _chunk_bloom = SharedBloomFilter.attach(bloom_descriptor)
+
+def _init_generation_worker(affix_tables, counters, verbose):
+    """
+    Inicializa cada proceso del pool en la generación a fragmentos: instala las tablas de
+    afijos y los contadores compartidos en los que cada tarea publica su progreso, y el
+    modo verboso (con spawn los procesos no lo heredan y cada tarea lo consulta).
+    """
+    install_affix_tables(affix_tables)
+    install_counters(counters)
+    set_verbose_mode(verbose)
+
+def _iter_windowed(pool, function, jobs, window, ordered=True):
+    """
+    Ejecuta function(job) en el pool para cada trabajo de 'jobs' (que se consume poco a poco)
+    con como mucho 'window' trabajos enviados y sin recoger, y devuelve un generador con los
+    resultados: en el orden de 'jobs' con ordered=True, o según terminan si no.
+    A diferencia de imap/imap_unordered, no lee todo 'jobs' por adelantado, así que la
+    memoria queda acotada aunque el consumidor vaya más despacio que los procesos.
+    """
+    # En orden: cola de resultados pendientes; sin orden: los procesos avisan al terminar
+    pending = collections.deque()
+    finished = queue.Queue()
+    in_flight = 0
+    exhausted = False
+    while True:
+        while not exhausted and in_flight < window:
+            job = next(jobs, None)
+            if job is None:
+                exhausted = True
+                break
+            if ordered:
+                pending.append(pool.apply_async(function, (job,)))
+            else:
+                pool.apply_async(function, (job,), callback=finished.put, error_callback=finished.put)
+            in_flight += 1
+        if in_flight == 0:
+            break
+        in_flight -= 1
+        if ordered:
+            yield pending.popleft().get()
+        else:
+            outcome = finished.get()
+            if isinstance(outcome, BaseException):
+                raise outcome
+            yield outcome
+
+def _iter_chunks(keywords_settings, chunk_size):
+    """
+    Divide las palabras clave en bloques consecutivos de como mucho chunk_size claves.
+    Devuelve un generador de (palabra, opciones, inicio, fin), en el orden de generación.
+    """
+    for keyword, args_dict in keywords_settings:
+        count = CandidateIndex(keyword, args_dict).count
+        for start in range(0, count, chunk_size):
+            yield keyword, args_dict, start, min(count, start + chunk_size)
+
+def _discard_stream(stream):
+    """
+    Redirige el descriptor de un flujo cuya tubería se ha cerrado a os.devnull, para que
+    los volcados pendientes (también el del cierre del intérprete) no vuelvan a fallar.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, stream.fileno())
+    os.close(devnull)
+
 class DictionaryGenerator:
     """
     Clase para generar diccionarios de contraseñas con varias opciones de mutación.
@@ -27,152 +200,345 @@ class DictionaryGenerator:
         if not isinstance(output_file, str) or not output_file:
             raise ValueError("El nombre del archivo de salida no puede estar vacío.")
         self.output_file = output_file
-        self.file_lock = None # Será inicializado por Manager en generate_dictionary_parallel
-
-    def _generate_basic_variations(self, base_word):
-        """
-        Genera variaciones básicas (original, minúscula, mayúscula, capitalizada) de una palabra.
-        Devuelve un generador.
-        """
-        _print_verbose(f"Generando variaciones básicas para: {base_word}")
-        yield base_word
-        yield base_word.lower()
-        yield base_word.upper()
-        yield base_word.capitalize()
-
-    def _generate_case_variations(self, base_word):
-        """
-        Genera todas las combinaciones de mayúsculas y minúsculas para una palabra.
-        Devuelve un generador.
-        """
-        if not isinstance(base_word, str) or not base_word:
-            raise ValueError("La palabra base no puede estar vacía o no ser una cadena.")
-        
-        _print_verbose(f"Generando mezclas de mayúsculas/minúsculas para: {base_word}")
-        for bits in itertools.product([0, 1], repeat=len(base_word)):
-            new_word = "".join(
-                char.upper() if bit else char.lower()
-                for char, bit in zip(base_word, bits)
-            )
-            yield new_word
-
-    def _generate_numbers_for_word(self, word, num_digits=0, years_range=None):
-        """
-        Genera variaciones numéricas para una *única palabra*.
-        Devuelve un generador que incluye la palabra original y sus mutaciones numéricas.
-        """
-        _print_verbose(f"Añadiendo números a: {word}")
-        yield word # Incluir la palabra original sin números
-
-        numbers_to_add = []
-
-        if years_range:
-            if not isinstance(years_range, tuple) or len(years_range) != 2:
-                raise ValueError("years_range debe ser una tupla de dos enteros (inicio, fin).")
-            start_year, end_year = years_range
-            _print_verbose(f"  Rango de años: {start_year}-{end_year}")
-            if not all(isinstance(y, int) for y in years_range) or start_year > end_year:
-                raise ValueError("Los años deben ser enteros válidos y el año de inicio no puede ser mayor que el de fin.")
-            numbers_to_add.extend(range(start_year, end_year + 1))
-        elif num_digits > 0:
-            if not isinstance(num_digits, int) or num_digits <= 0:
-                raise ValueError("num_digits debe ser un entero positivo.")
-            _print_verbose(f"  Dígitos aleatorios: {num_digits}")
-            try:
-                max_num = 10**num_digits
-                for i in range(max_num):
-                    numbers_to_add.append(str(i).zfill(num_digits))
-            except OverflowError:
-                tqdm.write(f"Advertencia: El número de dígitos ({num_digits}) es demasiado grande, lo que podría generar demasiados números o un error.")
-        
-        for num in numbers_to_add:
-            yield f"{word}{num}"
-            yield f"{num}{word}"
-            yield f"{word}_{num}"
-            yield f"{num}_{word}"
-            yield f"{word}{num}{word}"
-
-    def _generate_special_chars_for_word(self, word, special_chars_list):
-        """
-        Genera variaciones con caracteres especiales para una *única palabra*.
-        Devuelve un generador que incluye la palabra original y sus mutaciones con caracteres especiales.
-        """
-        _print_verbose(f"Añadiendo caracteres especiales a: {word} (Chars: {', '.join(special_chars_list)})")
-        yield word # Incluir la palabra original sin caracteres especiales
-
-        if not isinstance(special_chars_list, list) or not all(isinstance(c, str) for c in special_chars_list):
-            raise ValueError("special_chars_list debe ser una lista de cadenas.")
-        
-        for char in special_chars_list:
-            yield f"{word}{char}"
-            yield f"{char}{word}"
-            yield f"{word}{char}{word}"
 
     def _process_keyword(self, keyword_data):
         """
         Genera variaciones para una palabra clave basándose en los datos proporcionados
-        y escribe directamente al archivo. Esta función es para ser ejecutada por cada proceso.
+        y las escribe en el fragmento propio de la tarea o, con 'region' (--preallocate), en
+        su zona reservada del archivo de salida (sin locks entre procesos).
+        Esta función es para ser ejecutada por cada proceso.
+        Devuelve el resumen de la tarea (pid, segundos, claves y bytes generados, claves
+        suprimidas por el filtro Bloom, claves descartadas por la política de claves y, con
+        --stats, el tiempo de cada etapa), o None si falla.
         """
+        timer = TaskTimer()
         keyword = keyword_data['keyword']
-        output_filepath = keyword_data['output_filepath']
         args_dict = keyword_data['args_dict']
-        pbar_lock = keyword_data['pbar_lock']
-        file_lock_manager = keyword_data['file_lock']
+        stats_options = keyword_data['stats']
+        stages = StageTimes() if stats_options is not None else None
+        profiler = TaskProfiler(stats_options or {}, f"task-{keyword_data['slot']}")
 
+        part = keyword_data['part']
+        task_state = keyword_data['state_path']
+
+        on_flush = None
+        if task_state is not None:
+            # Tras cada volcado se guarda la posición alcanzada y los bytes confirmados del fragmento
+            def on_flush(written, num_bytes):
+                save_task_state(task_state, part['start'] + written, num_bytes)
+
+        bloom = None
         try:
-            add_numbers = args_dict['numbers']
-            num_digits = args_dict['digits']
-            years_range = args_dict['years_range']
-            add_special_chars = args_dict['special_chars'] is not None and len(args_dict['special_chars']) > 0
-            special_chars_list = args_dict['special_chars']
-            add_case_mix = args_dict['case_mix']
-            limit_keys = args_dict['limit']
-
-            _print_verbose(f"Procesando '{keyword}' con settings: Números={add_numbers}, Digitos={num_digits}, Años={years_range}, Especiales={add_special_chars}, MezclaMayus={add_case_mix}, Límite={limit_keys}")
-
-            if add_case_mix:
-                base_variations_generator = self._generate_case_variations(keyword)
-            else:
-                base_variations_generator = self._generate_basic_variations(keyword)
-
-            generated_count = 0
-            
-            for base_var in base_variations_generator:
-                if add_numbers:
-                    numbered_variations_generator = self._generate_numbers_for_word(
-                        base_var, num_digits, years_range
-                    )
+            with profiler:
+                started = time.perf_counter() if stages is not None else None
+                if keyword_data['bloom'] is not None:
+                    bloom = SharedBloomFilter.attach(keyword_data['bloom'])
+                region = keyword_data.get('region')
+                if region is not None:
+                    writer = RegionWriter(keyword_data['output_path'], *region,
+                                          buffer_size=keyword_data['buffer_size'],
+                                          flush_every=keyword_data['flush_every'],
+                                          stages=stages)
                 else:
-                    numbered_variations_generator = iter([base_var])
-
-                for num_var in numbered_variations_generator:
-                    if add_special_chars and special_chars_list:
-                        final_variations_generator = self._generate_special_chars_for_word(
-                            num_var, special_chars_list
-                        )
-                    else:
-                        final_variations_generator = iter([num_var])
-
-                    for final_var in final_variations_generator:
-                        with file_lock_manager:
-                            with open(output_filepath, "a") as f:
-                                f.write(final_var + "\n")
-                        
-                        with pbar_lock:
-                            tqdm.total_pbar.update(1)
-                        
-                        generated_count += 1
-                        if limit_keys is not None and generated_count >= limit_keys:
-                            tqdm.write(f"Límite de {limit_keys} claves alcanzado para '{keyword}' en este proceso.")
-                            return
-
-            tqdm.write(f"Proceso para '{keyword}' finalizado. Generadas {generated_count} variaciones.")
+                    writer = ShardWriter(keyword_data['shard_path'],
+                                         buffer_size=keyword_data['buffer_size'],
+                                         flush_every=keyword_data['flush_every'],
+                                         flush_interval=keyword_data['checkpoint_interval'],
+                                         on_flush=on_flush,
+                                         append=part['start'] > part['first'],
+                                         candidate_filter=bloom,
+                                         compression=keyword_data['compression'],
+                                         stages=stages)
+                if started is not None:
+                    stages.add('open', time.perf_counter() - started)
+                with writer:
+                    generated, generated_bytes, pruned = self._write_keyword_variations(
+                        keyword, args_dict, part, writer, keyword_data['slot'], stages)
+                if task_state is not None:
+                    save_task_state(task_state, part['stop'], os.path.getsize(keyword_data['shard_path']), done=True)
+            if stages is None:
+                return timer.stats(generated, suppressed=writer.suppressed, pruned=pruned, keyword=keyword)
+            return timer.stats(generated, suppressed=writer.suppressed, pruned=pruned, keyword=keyword, bytes=generated_bytes,
+                               start=part['start'], stop=part['stop'], stages=stages.as_dict(),
+                               memory_peak=profiler.memory_peak)
         except KeyboardInterrupt:
             tqdm.write(f"\nProceso para '{keyword}' interrumpido por el usuario.")
         except Exception as e:
             tqdm.write(f"Error inesperado en proceso para '{keyword}': {e}")
-    
-    def generate_dictionary_parallel(self, keywords_data, output_filepath, num_processes=None):
+        finally:
+            if bloom is not None:
+                bloom.close()
+
+    def _write_keyword_variations(self, keyword, args_dict, part, writer, slot=None, stages=None):
+        """
+        Recorre las variaciones del rango [inicio, fin) de una palabra clave, usando el
+        índice de candidatos para empezar directamente en la posición de la parte,
+        y las envía al escritor del fragmento. Tras cada bloque publica el progreso en
+        el hueco 'slot' de los contadores compartidos. Con stages (--stats) acumula el
+        tiempo de generar los bloques y de escribirlos ('write' incluye filtrar y volcar).
+        Con política de claves, las posiciones descartadas cuentan como recorridas pero no se escriben.
+        Devuelve (posiciones recorridas, bytes generados, claves descartadas por la política).
+        """
+        index = CandidateIndex(keyword, args_dict)
+        limit_keys = args_dict['limit']
+        label = f"'{keyword}'{part['label']}"
+
+        if _verbose_mode:  # Sin formatear el mensaje si no se va a mostrar
+            _print_verbose(f"Procesando {label} con settings: Números={args_dict['numbers']}, Digitos={args_dict['digits']}, Años={args_dict['years_range']}, Especiales={args_dict['special_chars']}, MezclaMayus={args_dict['case_mix']}, Límite={limit_keys}, Rango={part['start']}-{part['stop']}")
+
+        generated_count = 0
+        generated_bytes = 0
+        pruned = 0
+        mark = time.perf_counter() if stages is not None else None
+        for block, block_count in index.iter_blocks(part['start'], part['stop']):
+            if mark is not None:
+                now = time.perf_counter()
+                stages.add('generate', now - mark)
+                mark = now
+            writer.write_block(block, block_count)
+            generated_count += block_count
+            generated_bytes += len(block)
+            if index.policy is not None:
+                pruned += block_count - block.count(b"\n")
+            publish(slot, generated_count, generated_bytes)
+            if mark is not None:
+                now = time.perf_counter()
+                stages.add('write', now - mark)
+                mark = now
+
+        if index.limited and part['stop'] == index.count:
+            tqdm.write(f"Límite de {limit_keys} claves alcanzado para {label} en este proceso.")
+        else:
+            tqdm.write(f"Proceso para {label} finalizado. Generadas {generated_count - pruned} variaciones"
+                       f"{f' ({pruned} descartadas por la política)' if index.policy is not None else ''}.")
+        return generated_count, generated_bytes, pruned
+
+    def _split_keyword(self, keyword, args_dict, target_cost, start=0, stop=None):
+        """
+        Divide el rango [start, stop) del espacio de candidatos de una palabra clave (todo,
+        por defecto) en rangos contiguos que pueden ejecutarse como tareas independientes,
+        de modo que ninguno supere el coste estimado target_cost. El total ya incluye el
+        límite por palabra clave, así que cada parte respeta ese tope.
+        Devuelve una lista de partes en el mismo orden en que se generaría la palabra.
+        """
+        index = CandidateIndex(keyword, args_dict)
+        stop = index.count if stop is None else stop
+        length = stop - start
+        parts_wanted = parts_for_cost(length, estimate_cost(index, start, stop), target_cost, MIN_CANDIDATES_PER_PART)
+        ranges = [(start + length * i // parts_wanted, start + length * (i + 1) // parts_wanted)
+                  for i in range(parts_wanted)]
+        ranges = [(part_start, part_stop) for part_start, part_stop in ranges if part_stop > part_start] or [(start, start)]
+        parts = []
+        for i, (start, stop) in enumerate(ranges):
+            parts.append({
+                'start': start,
+                'stop': stop,
+                'label': f" (parte {i + 1}/{len(ranges)})" if len(ranges) > 1 else ""
+            })
+        return parts
+
+    def _generate_chunk(self, chunk):
+        """
+        Genera un bloque [inicio, fin) de una palabra clave. Con as_bytes lo devuelve como
+        bytes (una clave por línea, listo para escribir); si no, como lista de cadenas.
+        Las claves que el filtro Bloom del proceso ya ha visto se omiten, igual que las que
+        no cumplen la política de claves.
+        Devuelve (bloque, claves del rango, claves suprimidas por el filtro Bloom, claves
+        descartadas por la política).
+        """
+        keyword, args_dict, start, stop, as_bytes = chunk
+        index = CandidateIndex(keyword, args_dict)
+        bloom = _chunk_bloom
+        if as_bytes and bloom is None:
+            data = b"".join(block for block, _ in index.iter_blocks(start, stop))
+            return data, stop - start, 0, stop - start - data.count(b"\n") if index.policy is not None else 0
+        if not as_bytes and bloom is None:
+            candidates = list(index.iter_accepted(start, stop))
+            return candidates, stop - start, 0, stop - start - len(candidates)
+        candidates = index.iter_accepted(start, stop)
+        accepted = 0
+        lines = []
+        suppressed = 0
+        for candidate in candidates:
+            accepted += 1
+            encoded = candidate.encode("utf-8")
+            if bloom is not None and not bloom.add(encoded):
+                suppressed += 1
+                continue
+            lines.append(encoded)
+        pruned = stop - start - accepted
+        if not as_bytes:
+            return [line.decode("utf-8") for line in lines], stop - start, suppressed, pruned
+        if lines:
+            lines.append(b"")
+        return b"\n".join(lines), stop - start, suppressed, pruned
+
+    def _iter_parallel_chunks(self, keywords_settings, chunk_size, as_bytes, num_processes,
+                              ordered=True, bloom_descriptor=None, redirect_stdout=False, engine="auto"):
+        """
+        Reparte los bloques entre un pool de procesos y devuelve un generador de
+        (bloque, tamaño del rango, suprimidas, descartadas por la política). Como mucho hay STREAM_WINDOW_PER_PROCESS
+        bloques por proceso en vuelo: si el consumidor va más despacio, los procesos esperan
+        y la memoria no crece. Con ordered=True los bloques salen en el orden de generación;
+        si no, según terminan. Al cerrar el generador se detiene el pool.
+        engine elige el motor de los bloques numéricos ('auto', 'python' o 'numpy').
+        """
+        chunks = _iter_chunks(keywords_settings, chunk_size)
+        # Las tablas de números se construyen una vez aquí y se instalan en cada proceso
+        affix_tables = build_affix_tables((CandidateIndex(keyword, args_dict) for keyword, args_dict in keywords_settings), engine)
+        with Pool(processes=num_processes, initializer=_init_chunk_worker,
+                  initargs=(affix_tables, bloom_descriptor, _verbose_mode, redirect_stdout)) as pool:
+            jobs = (chunk + (as_bytes,) for chunk in chunks)
+            yield from _iter_windowed(pool, self._generate_chunk, jobs,
+                                      STREAM_WINDOW_PER_PROCESS * num_processes, ordered)
+
+    def iter_candidates(self, keyword, settings=None, start=0, stop=None):
+        """
+        Devuelve un generador perezoso con los candidatos (str) de una palabra clave,
+        en el mismo orden que el archivo. settings es un GenerationSettings (por defecto,
+        solo las variaciones básicas); start/stop recorren solo las posiciones [start, stop).
+        """
+        settings = settings or GenerationSettings()
+        return CandidateIndex(keyword, keyword_args_dict(settings)).iter_accepted(start, stop)
+
+    def iter_batches(self, keyword, settings=None, batch_size=STREAM_CHUNK_CANDIDATES, as_bytes=False):
+        """
+        Devuelve un generador de lotes de como mucho batch_size candidatos de una palabra
+        clave: listas de cadenas o, con as_bytes=True, bloques de bytes con una clave por línea.
+        """
+        if batch_size <= 0:
+            raise ValueError("El tamaño del lote debe ser un número positivo.")
+        settings = settings or GenerationSettings()
+        for keyword, args_dict, start, stop in _iter_chunks([(keyword, keyword_args_dict(settings))], batch_size):
+            yield self._generate_chunk((keyword, args_dict, start, stop, as_bytes))[0]
+
+    def iter_batches_parallel(self, keywords, settings=None, batch_size=STREAM_CHUNK_CANDIDATES,
+                              as_bytes=False, num_processes=None, ordered=False, engine="auto"):
+        """
+        Igual que iter_batches, pero para varias palabras clave y generando los lotes en un
+        pool de procesos. Los lotes se devuelven según terminan (ordered=True los devuelve
+        en el orden de generación) y la memoria queda acotada a unos pocos lotes por proceso.
+        settings puede ser un GenerationSettings común o una lista con uno por palabra clave.
+        """
+        if batch_size <= 0:
+            raise ValueError("El tamaño del lote debe ser un número positivo.")
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        if settings is None or isinstance(settings, GenerationSettings):
+            settings = [settings or GenerationSettings()] * len(keywords)
+        if len(settings) != len(keywords):
+            raise ValueError("Debe haber una configuración por palabra clave.")
+        keywords_settings = [(keyword, keyword_args_dict(item)) for keyword, item in zip(keywords, settings)]
+        for data, _, _, _ in self._iter_parallel_chunks(keywords_settings, batch_size, as_bytes,
+                                                     num_processes or os.cpu_count() or 1, ordered=ordered,
+                                                     engine=engine):
+            yield data
+
+    def generate_dictionary_stream(self, keywords_data, stream, num_processes=None,
+                                   bloom_fp_rate=None, bloom_memory=None, engine="auto"):
+        """
+        Genera el diccionario directamente en 'stream' (un flujo binario, normalmente
+        sys.stdout.buffer) sin tocar el disco. Las palabras clave se dividen en bloques de
+        STREAM_CHUNK_CANDIDATES claves que generan los procesos y se escriben en orden.
+        Si el consumidor lee más despacio, la escritura se bloquea y los procesos esperan.
+        Si el consumidor cierra la tubería, se detiene sin error.
+        Devuelve el número de claves escritas.
+        """
+        if num_processes is None:
+            num_processes = os.cpu_count() or 1
+        tqdm.write(f"Usando {num_processes} procesos para la generación (salida estándar).")
+
+        keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+        expected = sum(CandidateIndex(keyword, args_dict).count for keyword, args_dict in keywords_settings)
+        _print_verbose(f"Generando {expected} claves en bloques de hasta {STREAM_CHUNK_CANDIDATES}.")
+
+        bloom = None
+        if bloom_fp_rate is not None:
+            num_bits, num_hashes, effective_rate = bloom_parameters(expected, bloom_fp_rate, bloom_memory)
+            if effective_rate > bloom_fp_rate * 1.01:
+                tqdm.write(f"Advertencia: con el límite de memoria, la tasa de falsos positivos del filtro Bloom "
+                           f"será ~{effective_rate:.2%} en lugar de {bloom_fp_rate:.2%}.")
+            bloom = SharedBloomFilter.create(num_bits, num_hashes)
+
+        written = 0
+        suppressed = 0
+        pruned = 0
+        pbar = tqdm(desc="Total generado", unit="claves", total=expected, leave=True, file=sys.stderr)
+        chunks = self._iter_parallel_chunks(keywords_settings, STREAM_CHUNK_CANDIDATES, True, num_processes,
+                                            bloom_descriptor=bloom.descriptor() if bloom is not None else None,
+                                            redirect_stdout=True, engine=engine)
+        try:
+            for data, size, chunk_suppressed, chunk_pruned in chunks:
+                try:
+                    stream.write(data)
+                except BrokenPipeError:
+                    # El consumidor (p. ej. el cracker) terminó: se descarta el resto sin error
+                    _discard_stream(stream)
+                    chunks.close()
+                    pbar.close()
+                    tqdm.write("\nLa salida estándar se cerró; generación detenida.")
+                    return written
+                written += size - chunk_suppressed - chunk_pruned
+                suppressed += chunk_suppressed
+                pruned += chunk_pruned
+                pbar.update(size)
+            try:
+                stream.flush()
+            except BrokenPipeError:
+                _discard_stream(stream)
+        finally:
+            chunks.close()
+            pbar.close()
+            if bloom is not None:
+                bloom.close()
+                bloom.unlink()
+
+        if bloom is not None:
+            tqdm.write(f"Filtro Bloom: {suppressed:,} claves repetidas suprimidas durante la escritura.")
+        if pruned:
+            tqdm.write(f"Política de claves: {pruned:,} candidatos descartados sin escribirse.")
+        tqdm.write(f"\n¡Generación completa! {written:,} claves enviadas a la salida estándar.")
+        return written
+
+    def generate_dictionary_parallel(self, keywords_data, output_filepath, num_processes=None,
+                                     buffer_size=DEFAULT_BUFFER_SIZE, flush_every=None, keep_shards=False,
+                                     checkpoint=False, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                                     resume=False, bloom_fp_rate=None, bloom_memory=None, engine="auto",
+                                     compression=None, stats=None, candidate_range=None, preallocate=False):
+        """
+        Genera el diccionario en paralelo. Cada tarea escribe en su propio fragmento
+        y al final los fragmentos se concatenan, en el orden de las palabras clave,
+        al final de output_filepath. Con keep_shards=True no se concatenan y se
+        devuelve la lista de fragmentos.
+        Las partes se reparten por coste estimado (bytes de salida y claves): las palabras
+        grandes se dividen y las tareas se envían de la más cara a la más barata, para que
+        ningún proceso quede trabajando solo al final. Se informa de la utilización de cada proceso.
+        Con checkpoint=True cada tarea guarda periódicamente su posición junto a los
+        fragmentos; resume=True continúa un trabajo interrumpido a partir de ese punto.
+        Con bloom_fp_rate se eliminan durante la escritura las claves repetidas entre palabras
+        clave mediante un filtro Bloom compartido (de como mucho bloom_memory bytes si se indica).
+        Un falso positivo descarta una clave nueva con esa probabilidad.
+        Si alguna tarea falla se lanza IOError en lugar de unir un diccionario incompleto; con
+        checkpoint=True el punto de control se conserva para terminar las tareas con resume=True.
+        engine elige el motor de los bloques numéricos: 'auto' usa NumPy si está instalado.
+        compression ('gzip', 'bz2' o 'xz') comprime la salida: cada proceso comprime sus propios
+        bloques como miembros independientes y el archivo final es su concatenación.
+        stats (RunStats, --stats) recoge el tiempo de cada etapa del proceso principal y el
+        resumen instrumentado de cada tarea; sin él las tareas no miden nada.
+        candidate_range=(inicio, fin) genera solo ese rango del índice global (todas las
+        palabras clave una tras otra, ver reparto.keyword_ranges): es la porción de --shard
+        o el rango cedido por el coordinador. El resultado no depende del número de procesos.
+        Con preallocate=True (--preallocate) no hay fragmentos: el tamaño exacto de cada tarea se
+        calcula antes de empezar, la zona de todas se reserva al final de output_filepath con
+        posix_fallocate y cada tarea escribe la suya con escrituras posicionales. El archivo es
+        idéntico al de los fragmentos concatenados, sin la copia final. No admite compresión,
+        filtro Bloom, puntos de control ni keep_shards (el tamaño o los fragmentos no se conocen).
+        """
+        if preallocate and (compression is not None or bloom_fp_rate is not None or checkpoint or resume
+                            or keep_shards):
+            raise ValueError("La salida reservada (--preallocate) no es compatible con compresión, filtro Bloom, "
+                             "puntos de control ni fragmentos conservados.")
+        clock = stats.clock() if stats is not None else None
         if num_processes is None:
             num_processes = os.cpu_count()
             if num_processes is None or num_processes < 1:
@@ -181,34 +547,181 @@ class DictionaryGenerator:
         else:
             tqdm.write(f"Usando {num_processes} procesos para la generación.")
 
-        _print_verbose(f"Iniciando pool de procesos con {num_processes} workers.")
-        with Manager() as manager:
-            self.file_lock = manager.Lock()
-            pbar_lock = manager.Lock()
-
-            tqdm.total_pbar = tqdm(desc="Total generado", unit="claves", leave=True, file=sys.stdout)
-
-            tasks = []
-            for item in keywords_data:
-                args_dict_for_process = {
-                    'numbers': item['args'].numbers,
-                    'digits': item['args'].digits,
-                    'years_range': item['args'].years_range,
-                    'special_chars': item['args'].special_chars,
-                    'case_mix': item['args'].case_mix,
-                    'limit': item['args'].limit
-                }
+        checkpoint = checkpoint or resume
+        shard_dir = shard_directory(output_filepath)
+        keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+
+        # Cada tarea es una parte [inicio, fin) de una palabra clave
+        tasks = []
+        if resume:
+            manifest = load_manifest(shard_dir, output_filepath, keywords_settings, compression, candidate_range)
+            for saved in manifest['tasks']:
                 tasks.append({
-                    'keyword': item['keyword'],
-                    'output_filepath': output_filepath,
-                    'args_dict': args_dict_for_process,
-                    'pbar_lock': pbar_lock,
-                    'file_lock': self.file_lock
+                    'keyword_index': saved['keyword_index'],
+                    'part': {'first': saved['start'], 'start': saved['start'],
+                             'stop': saved['stop'], 'label': saved['label']}
                 })
-            
-            _print_verbose(f"Tareas de generación creadas: {len(tasks)}")
-            with Pool(processes=num_processes) as pool:
-                pool.map(self._process_keyword, tasks)
-            
-            tqdm.total_pbar.close()
-            tqdm.write(f"\n¡Generación completa! Diccionario guardado en '{output_filepath}'.")
\ No newline at end of file
+        else:
+            if not preallocate:
+                prepare_shard_directory(shard_dir)
+            # Coste máximo de una parte: el total repartido en PARTS_PER_PROCESS partes por proceso
+            if candidate_range is not None:
+                ranges = keyword_ranges(keywords_settings, *candidate_range)
+            else:
+                ranges = [(keyword_index, 0, None) for keyword_index in range(len(keywords_settings))]
+            target_cost = 0
+            if num_processes > 1:
+                total_cost = sum(estimate_cost(CandidateIndex(*keywords_settings[keyword_index]), start, stop)
+                                 for keyword_index, start, stop in ranges)
+                target_cost = -(-total_cost // (num_processes * PARTS_PER_PROCESS))
+            for keyword_index, start, stop in ranges:
+                keyword, args_dict = keywords_settings[keyword_index]
+                for part in self._split_keyword(keyword, args_dict, target_cost, start, stop):
+                    part['first'] = part['start']
+                    tasks.append({'keyword_index': keyword_index, 'part': part})
+            if checkpoint:
+                save_manifest(shard_dir, output_filepath, keywords_settings, tasks, compression, candidate_range)
+        if preallocate:
+            # Zona de cada tarea, en el orden del archivo: los tamaños son exactos antes de generar nada
+            sizes = [CandidateIndex(*keywords_settings[task['keyword_index']]).accepted_size(
+                task['part']['start'], task['part']['stop'])[1] for task in tasks]
+            offset = preallocate_output(output_filepath, sum(sizes))
+            for task, size in zip(tasks, sizes):
+                task['region'] = (offset, size)
+                offset += size
+            _print_verbose(f"Reservados {sum(sizes):,} bytes en '{output_filepath}' para {len(tasks)} tareas "
+                           f"(búfer de {buffer_size} bytes por tarea).")
+        else:
+            _print_verbose(f"Directorio de fragmentos: '{shard_dir}' (búfer de {buffer_size} bytes por fragmento).")
+        if compression is not None:
+            _print_verbose(f"Compresión {compression}: cada proceso comprime sus volcados como miembros independientes.")
+
+        bloom = None
+        if bloom_fp_rate is not None:
+            expected = sum(task['part']['stop'] - task['part']['first'] for task in tasks)
+            num_bits, num_hashes, effective_rate = bloom_parameters(expected, bloom_fp_rate, bloom_memory)
+            if effective_rate > bloom_fp_rate * 1.01:
+                tqdm.write(f"Advertencia: con el límite de memoria, la tasa de falsos positivos del filtro Bloom "
+                           f"será ~{effective_rate:.2%} en lugar de {bloom_fp_rate:.2%}.")
+            _print_verbose(f"Filtro Bloom: {num_bits // 8} bytes, {num_hashes} funciones hash, "
+                           f"{expected} claves esperadas, tasa de falsos positivos ~{effective_rate:.4%}.")
+            bloom = SharedBloomFilter.create(num_bits, num_hashes)
+
+        shard_paths = []
+        pending_tasks = []
+        # Progreso de cada tarea para la barra: claves totales y ya generadas antes de empezar
+        progress_tasks = []
+        for task_number, task in enumerate(tasks):
+            keyword, args_dict = keywords_settings[task['keyword_index']]
+            task['keyword'] = keyword
+            task['args_dict'] = args_dict
+            task['shard_path'] = shard_path(shard_dir, task_number) if not preallocate else None
+            task['output_path'] = output_filepath
+            task['state_path'] = state_path(task['shard_path']) if checkpoint else None
+            task['buffer_size'] = buffer_size
+            task['flush_every'] = flush_every
+            task['checkpoint_interval'] = checkpoint_interval if checkpoint else None
+            task['bloom'] = bloom.descriptor() if bloom is not None else None
+            task['compression'] = compression
+            task['slot'] = task_number
+            task['stats'] = stats.worker_options() if stats is not None else None
+            if not preallocate:
+                shard_paths.append(task['shard_path'])
+            progress = {'keyword': keyword, 'total': task['part']['stop'] - task['part']['first'], 'done': 0}
+            progress_tasks.append(progress)
+            if resume:
+                position, _, done = restore_task(task['shard_path'], task['part']['start'])
+                if done:
+                    progress['done'] = progress['total']
+                    continue
+                task['part']['start'] = position
+                progress['done'] = position - task['part']['first']
+            task['cost'] = estimate_cost(CandidateIndex(keyword, args_dict), task['part']['start'], task['part']['stop'])
+            pending_tasks.append(task)
+        if resume:
+            tqdm.write(f"Reanudando desde el punto de control: {len(tasks) - len(pending_tasks)} de {len(tasks)} tareas ya completadas.")
+
+        if clock is not None:
+            clock.lap('plan')
+        # Las tablas de números se construyen una vez aquí y se instalan en cada proceso
+        affix_tables = build_affix_tables((CandidateIndex(keyword, args_dict) for keyword, args_dict in keywords_settings), engine)
+        if clock is not None:
+            clock.lap('affix_tables')
+        _print_verbose(f"Motor de generación: {'NumPy' if any(table.vectorized for table in affix_tables.values()) else 'Python'}.")
+        _print_verbose(f"Iniciando pool de procesos con {num_processes} workers.")
+        counters = create_counters(len(tasks))
+        # Las tareas más caras primero; cada proceso toma la siguiente al terminar (sin lotes)
+        pending_tasks = longest_first(pending_tasks)
+        _print_verbose(f"Tareas de generación creadas: {len(pending_tasks)} "
+                       f"(coste estimado de la mayor: {pending_tasks[0]['cost'] if pending_tasks else 0:,}).")
+        try:
+            reporter = ProgressReporter(counters, progress_tasks)
+            started = time.perf_counter()
+            try:
+                with Pool(processes=num_processes, initializer=_init_generation_worker,
+                          initargs=(affix_tables, counters, _verbose_mode)) as pool, reporter:
+                    results = list(pool.imap_unordered(self._process_keyword, pending_tasks, chunksize=1))
+            except KeyboardInterrupt:
+                if checkpoint:
+                    tqdm.write(f"\nPunto de control guardado en '{shard_dir}'. Usa --resume para continuar.")
+                elif preallocate:
+                    # Las zonas a medio escribir no forman un diccionario válido: se libera la reserva
+                    os.truncate(output_filepath, tasks[0]['region'][0] if tasks else os.path.getsize(output_filepath))
+                elif not keep_shards:
+                    # Los fragmentos ya contienen líneas completas: se unen para dejar un diccionario parcial válido
+                    concatenate_shards(shard_paths, output_filepath, compressed=compression is not None)
+                    remove_shards(shard_dir)
+                raise
+            wall_seconds = time.perf_counter() - started
+            if clock is not None:
+                clock.lap('pool')
+        finally:
+            if bloom is not None:
+                bloom.close()
+                bloom.unlink()
+
+        if bloom is not None:
+            suppressed = sum(result['suppressed'] for result in results if result is not None)
+            tqdm.write(f"Filtro Bloom: {suppressed:,} claves repetidas suprimidas durante la escritura.")
+        # Claves descartadas por la política, a partir del resumen de cada tarea
+        pruned = collections.Counter()
+        for result in results:
+            if result is not None and result['pruned']:
+                pruned[result['keyword']] += result['pruned']
+        if pruned:
+            tqdm.write(f"Política de claves: {sum(pruned.values()):,} candidatos descartados sin escribirse.")
+            for keyword in dict.fromkeys(keyword for keyword, _ in keywords_settings):
+                if pruned[keyword]:
+                    _print_verbose(f"'{keyword}': {pruned[keyword]:,} candidatos descartados por la política.")
+
+        print_utilization(worker_utilization(results, wall_seconds), wall_seconds, num_processes)
+        if stats is not None:
+            stats.add_tasks(results)
+
+        # Una tarea que falla devuelve None: el diccionario quedaría incompleto, así que no se da por terminado
+        failed = sum(1 for result in results if result is None)
+        if failed:
+            if checkpoint:
+                tqdm.write(f"\nPunto de control conservado en '{shard_dir}'. Usa --resume para completar las tareas que fallaron.")
+            elif preallocate:
+                os.truncate(output_filepath, tasks[0]['region'][0])
+            elif not keep_shards:
+                remove_shards(shard_dir)
+            raise IOError(f"{failed} de {len(pending_tasks)} tareas de generación han fallado; "
+                          f"el diccionario '{output_filepath}' está incompleto.")
+
+        if keep_shards:
+            tqdm.write(f"\n¡Generación completa! {len(shard_paths)} fragmentos guardados en '{shard_dir}'.")
+            return shard_paths
+
+        if preallocate:
+            tqdm.write(f"\n¡Generación completa! Diccionario guardado en '{output_filepath}'.")
+            return [output_filepath]
+
+        _print_verbose(f"Concatenando {len(shard_paths)} fragmentos en '{output_filepath}'.")
+        concatenate_shards(shard_paths, output_filepath, compressed=compression is not None)
+        remove_shards(shard_dir)
+        if clock is not None:
+            clock.lap('concatenate')
+        tqdm.write(f"\n¡Generación completa! Diccionario guardado en '{output_filepath}'.")
+        return [output_filepath]
@@ -0,0 +1,344 @@
+import asyncio
+import heapq
+import json
+import os
+import socket
+import threading
+import time
+from tqdm import tqdm
+from compresion import split_suffix
+from contenido import keyword_args_dict
+from reparto import keyword_offsets, job_fingerprint
+
+# Claves por rango cedido a un nodo (por defecto)
+DEFAULT_LEASE_SIZE = 1 << 22
+
+# Segundos sin latidos tras los que se da por muerto a un nodo y su rango vuelve a cederse
+DEFAULT_LEASE_TIMEOUT = 60.0
+
+# Latidos por periodo de cesión: un nodo vivo renueva su rango varias veces antes de que caduque
+HEARTBEATS_PER_TIMEOUT = 4
+
+# Segundos que espera un nodo cuando no quedan rangos libres pero aún hay rangos cedidos a otros
+WAIT_SECONDS = 1.0
+
+def parse_address(text):
+    """
+    Interpreta la dirección del coordinador: 'unix:/ruta/socket' o 'host:puerto'.
+    Devuelve ('unix', ruta) o ('tcp', (host, puerto)); lanza ValueError si no es válida.
+    """
+    if text.startswith("unix:"):
+        path = text[len("unix:"):]
+        if not path:
+            raise ValueError(f"Dirección inválida '{text}': falta la ruta del socket.")
+        return 'unix', path
+    host, _, port = text.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Dirección inválida '{text}': usa host:puerto o unix:/ruta.") from None
+    if not host or not 0 < port < 65536:
+        raise ValueError(f"Dirección inválida '{text}': usa host:puerto o unix:/ruta.")
+    return 'tcp', (host.strip("[]"), port)
+
+def range_path(output_filepath, start, stop, total):
+    """
+    Archivo de un rango cedido: 'dict.txt' -> 'dict.range-000100-000200.txt'. Los números se
+    rellenan con ceros hasta la longitud del total, así que el orden alfabético de los nombres
+    es el orden de generación y basta con concatenarlos (cat dict.range-* > dict.txt).
+    """
+    path, compression_suffix = split_suffix(output_filepath)
+    base, ext = os.path.splitext(path)
+    width = len(str(total))
+    return f"{base}.range-{start:0{width}d}-{stop:0{width}d}{ext}{compression_suffix}"
+
+class LeaseTable:
+    """
+    Estado del coordinador: rangos [inicio, fin) pendientes (siempre se cede primero el de menor
+    inicio), cedidos a un nodo hasta una fecha de caducidad, y completados. Un rango se da por
+    completado la primera vez que cualquier nodo lo termina: como la salida es determinista, dos
+    nodos que terminen el mismo rango producen el mismo archivo.
+    """
+    def __init__(self, total, lease_size, lease_timeout):
+        self.total = total
+        self.lease_timeout = lease_timeout
+        self.pending = [(start, min(start + lease_size, total)) for start in range(0, total, lease_size)]
+        heapq.heapify(self.pending)
+        self.leases = {}
+        self.completed = set()
+        self.requeued = 0
+
+    @property
+    def finished(self):
+        return not self.pending and not self.leases
+
+    def acquire(self, node, now):
+        """Cede al nodo el siguiente rango pendiente; None si no queda ninguno libre."""
+        if not self.pending:
+            return None
+        lease = heapq.heappop(self.pending)
+        self.leases[lease] = {'node': node, 'expires': now + self.lease_timeout}
+        return lease
+
+    def renew(self, node, now):
+        """Renueva la caducidad de todos los rangos cedidos al nodo (latido)."""
+        for lease in self.leases.values():
+            if lease['node'] == node:
+                lease['expires'] = now + self.lease_timeout
+
+    def complete(self, lease):
+        """Marca el rango como completado, aunque hubiera caducado o se hubiera cedido a otro nodo."""
+        lease = tuple(lease)
+        if lease in self.completed:
+            return
+        self.completed.add(lease)
+        self.leases.pop(lease, None)
+        if lease in self.pending:
+            self.pending.remove(lease)
+            heapq.heapify(self.pending)
+
+    def release(self, node):
+        """Devuelve a pendientes los rangos del nodo (se ha desconectado). Devuelve cuántos."""
+        return self._requeue([lease for lease, info in self.leases.items() if info['node'] == node])
+
+    def expire(self, now):
+        """Devuelve a pendientes los rangos caducados (el nodo dejó de enviar latidos). Devuelve cuántos."""
+        return self._requeue([lease for lease, info in self.leases.items() if info['expires'] <= now])
+
+    def _requeue(self, leases):
+        for lease in leases:
+            del self.leases[lease]
+            heapq.heappush(self.pending, lease)
+        self.requeued += len(leases)
+        return len(leases)
+
+class Coordinator:
+    """
+    Coordinador asyncio de una generación repartida entre varios nodos (--coordinator). Escucha en
+    TCP o en un socket Unix y habla líneas JSON:
+
+        {"op": "hello", "job": huella}       -> {"ok": true, "total": N, "ttl": segundos}
+        {"op": "lease"}                       -> {"lease": [inicio, fin]} | {"wait": segundos} | {"done": true}
+        {"op": "heartbeat"}                   (sin respuesta: renueva los rangos del nodo)
+        {"op": "complete", "range": [i, f]}   -> {"ok": true}
+
+    Los rangos de un nodo que se desconecta se vuelven a ceder de inmediato, y los de un nodo que
+    deja de enviar latidos, al caducar. Termina cuando todos los rangos están completados.
+    """
+    def __init__(self, fingerprint, total, lease_size=DEFAULT_LEASE_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        self.fingerprint = fingerprint
+        self.table = LeaseTable(total, lease_size, lease_timeout)
+        self.lease_timeout = lease_timeout
+        self._next_node = 0
+        self._nodes = set()
+        self._writers = set()
+        self._finished = None
+
+    async def serve(self, address):
+        """Atiende a los nodos en address (ver parse_address) hasta completar todos los rangos."""
+        self._finished = asyncio.Event()
+        if self.table.finished:
+            self._finished.set()
+        kind, location = address
+        if kind == 'unix':
+            if os.path.exists(location):
+                os.unlink(location)
+            server = await asyncio.start_unix_server(self._handle, path=location)
+        else:
+            server = await asyncio.start_server(self._handle, *location)
+        tqdm.write(f"Coordinador escuchando en {self._describe(server, address)}: "
+                   f"{self.table.total:,} claves en {len(self.table.pending)} rangos.")
+        expiry = asyncio.ensure_future(self._expire_leases())
+        try:
+            await self._finished.wait()
+            # Los nodos que esperaban un rango lo piden de nuevo, reciben 'done' y se desconectan
+            deadline = time.monotonic() + 2 * WAIT_SECONDS
+            while self._writers and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+        finally:
+            expiry.cancel()
+            server.close()
+            # Los nodos que siguen conectados (colgados) reciben el cierre de la conexión
+            for writer in list(self._writers):
+                writer.close()
+            if kind == 'unix' and os.path.exists(location):
+                os.unlink(location)
+        tqdm.write(f"¡Generación repartida completa! {len(self.table.completed)} rangos terminados "
+                   f"({self.table.requeued} cedidos de nuevo).")
+
+    @staticmethod
+    def _describe(server, address):
+        kind, location = address
+        if kind == 'unix':
+            return f"unix:{location}"
+        host, port = server.sockets[0].getsockname()[:2]
+        return f"{host}:{port}"
+
+    async def _expire_leases(self):
+        while True:
+            await asyncio.sleep(self.lease_timeout / HEARTBEATS_PER_TIMEOUT)
+            expired = self.table.expire(time.monotonic())
+            if expired:
+                tqdm.write(f"{expired} rangos caducados sin latidos: se cederán de nuevo.")
+
+    async def _handle(self, reader, writer):
+        node = self._next_node
+        self._next_node += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = self._dispatch(node, json.loads(line))
+                if reply is not None:
+                    writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            tqdm.write(f"Nodo {node}: conexión interrumpida ({e}).")
+        finally:
+            self._writers.discard(writer)
+            self._nodes.discard(node)
+            released = self.table.release(node)
+            if released:
+                tqdm.write(f"Nodo {node} desconectado: {released} rangos se cederán de nuevo.")
+            writer.close()
+
+    def _dispatch(self, node, message):
+        op = message.get('op')
+        now = time.monotonic()
+        if op == 'hello':
+            if message.get('job') != self.fingerprint:
+                return {'ok': False, 'error': "las palabras clave u opciones no coinciden con las del coordinador"}
+            self._nodes.add(node)
+            tqdm.write(f"Nodo {node} conectado.")
+            return {'ok': True, 'total': self.table.total, 'ttl': self.lease_timeout}
+        if node not in self._nodes:
+            return {'ok': False, 'error': "el nodo no se ha presentado (hello)"}
+        if op == 'lease':
+            if self.table.finished:
+                return {'done': True}
+            lease = self.table.acquire(node, now)
+            if lease is None:
+                return {'wait': WAIT_SECONDS}
+            return {'lease': list(lease)}
+        if op == 'heartbeat':
+            self.table.renew(node, now)
+            return None
+        if op == 'complete':
+            self.table.complete(message['range'])
+            if self.table.finished:
+                self._finished.set()
+            return {'ok': True}
+        return {'ok': False, 'error': f"operación desconocida '{op}'"}
+
+class CoordinatorClient:
+    """
+    Conexión bloqueante de un nodo con el coordinador. Mientras está abierta, un hilo envía
+    latidos periódicos para que el coordinador no dé por muerto al nodo durante un rango largo.
+    """
+    def __init__(self, address, fingerprint):
+        self.address = address
+        self.fingerprint = fingerprint
+        self.total = None
+        self._socket = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        kind, location = self.address
+        try:
+            if kind == 'unix':
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._socket.connect(location)
+            else:
+                self._socket = socket.create_connection(location)
+        except OSError as e:
+            raise ValueError(f"No se pudo conectar con el coordinador: {e}") from None
+        self._file = self._socket.makefile("rb")
+        reply = self.request({'op': 'hello', 'job': self.fingerprint})
+        if not reply.get('ok'):
+            self.close()
+            raise ValueError(f"El coordinador rechazó el nodo: {reply.get('error')}.")
+        self.total = reply['total']
+        self._thread = threading.Thread(target=self._heartbeat, args=(reply['ttl'] / HEARTBEATS_PER_TIMEOUT,),
+                                        name="latidos", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send(self, message):
+        with self._lock:
+            self._socket.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+    def _heartbeat(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self._send({'op': 'heartbeat'})
+            except OSError:
+                return
+
+    def request(self, message):
+        """Envía un mensaje y espera su respuesta (los latidos no tienen respuesta)."""
+        self._send(message)
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("El coordinador cerró la conexión.")
+        return json.loads(line)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+
+def keywords_job(keywords_data):
+    """Palabras clave con sus opciones, huella del trabajo y total de claves."""
+    keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+    _, total = keyword_offsets(keywords_settings)
+    return keywords_settings, job_fingerprint(keywords_settings), total
+
+def run_coordinator(keywords_data, address, lease_size=DEFAULT_LEASE_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+    """Reparte el espacio de candidatos de keywords_data entre los nodos que se conecten a address."""
+    _, fingerprint, total = keywords_job(keywords_data)
+    coordinator = Coordinator(fingerprint, total, lease_size, lease_timeout)
+    asyncio.run(coordinator.serve(parse_address(address)))
+
+def run_node(generator, keywords_data, address, output_filepath, **generation_options):
+    """
+    Nodo de una generación repartida (--connect): pide rangos al coordinador hasta que no quedan y
+    genera cada uno con generate_dictionary_parallel en su propio archivo (ver range_path). El rango
+    se escribe en un temporal que se renombra al terminar, así que un archivo de rango existe solo
+    si está completo. Devuelve la lista de archivos escritos por este nodo.
+    """
+    _, fingerprint, _ = keywords_job(keywords_data)
+    written = []
+    with CoordinatorClient(parse_address(address), fingerprint) as client:
+        tqdm.write(f"Conectado al coordinador en {address} ({client.total:,} claves en total).")
+        while True:
+            reply = client.request({'op': 'lease'})
+            if reply.get('done'):
+                break
+            if 'wait' in reply:
+                time.sleep(reply['wait'])
+                continue
+            start, stop = reply['lease']
+            path = range_path(output_filepath, start, stop, client.total)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            tqdm.write(f"Rango cedido [{start:,}, {stop:,}) -> '{path}'.")
+            open(temporary_path, "wb").close()
+            generator.generate_dictionary_parallel(keywords_data, temporary_path, candidate_range=(start, stop),
+                                                   **generation_options)
+            os.replace(temporary_path, path)
+            client.request({'op': 'complete', 'range': [start, stop]})
+            written.append(path)
+    tqdm.write(f"Nodo terminado: {len(written)} rangos generados.")
+    return written
@@ -0,0 +1,256 @@
+import collections
+import heapq
+import io
+import os
+import shutil
+import tempfile
+import zlib
+from multiprocessing import Pool
+from compresion import detect_compression, open_compressed
+
+# Memoria máxima por defecto para la deduplicación (256 MiB)
+DEFAULT_DEDUP_MEMORY = 256 * 1024 * 1024
+# Una lista de líneas en Python ocupa varias veces el tamaño del texto: margen para cada tramo
+MEMORY_OVERHEAD_FACTOR = 6
+MIN_RUN_SIZE = 1024 * 1024
+# Máximo de archivos abiertos a la vez en cada pasada de mezcla
+MAX_MERGE_FILES = 128
+IO_BUFFER_SIZE = 1024 * 1024
+
+def _split_lines(data):
+    """Separa un bloque en líneas (bytes) sin el salto final; la última puede no tener salto."""
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    return lines
+
+def _line_ranges(input_filepath, chunk_size):
+    """
+    Divide el archivo en rangos de bytes de ~chunk_size que empiezan y terminan en
+    un límite de línea, para que cada proceso ordene su tramo de forma independiente.
+    """
+    size = os.path.getsize(input_filepath)
+    ranges = []
+    start = 0
+    with open(input_filepath, "rb") as f:
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                f.seek(end)
+                rest = f.readline()
+                end += len(rest)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _iter_stream_runs(f, run_size):
+    """Lee un flujo (p. ej. comprimido, sin posibilidad de saltar) en tramos de líneas completas."""
+    rest = b""
+    while True:
+        chunk = f.read(run_size)
+        if not chunk:
+            break
+        data = rest + chunk
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut]
+    if rest:
+        yield rest
+
+def _open_output(path, compression):
+    """Abre la salida de la deduplicación, comprimida si se indica, con un búfer grande."""
+    if compression is None:
+        return open(path, "wb", buffering=IO_BUFFER_SIZE)
+    return io.BufferedWriter(open_compressed(path, "wb", compression), IO_BUFFER_SIZE)
+
+def _sort_run(job):
+    """
+    Ordena y deduplica un tramo del archivo de entrada (o un bloque de bytes ya leído) y lo
+    guarda como un 'run' ordenado. Devuelve (líneas leídas, líneas únicas en el run).
+    """
+    input_filepath, start, end, run_path = job
+    if isinstance(input_filepath, bytes):
+        lines = _split_lines(input_filepath)
+    else:
+        with open(input_filepath, "rb") as f:
+            f.seek(start)
+            lines = _split_lines(f.read(end - start))
+    unique_lines = sorted(set(lines))
+    with open(run_path, "wb", buffering=IO_BUFFER_SIZE) as out:
+        for line in unique_lines:
+            out.write(line)
+            out.write(b"\n")
+    return len(lines), len(unique_lines)
+
+def _iter_run(path):
+    with open(path, "rb", buffering=IO_BUFFER_SIZE) as f:
+        for line in f:
+            yield line.rstrip(b"\n")
+
+def _merge_runs(run_paths, output_filepath, compression=None):
+    """Mezcla k runs ordenados en uno solo, eliminando repetidos. Devuelve las líneas escritas."""
+    written = 0
+    previous = None
+    with _open_output(output_filepath, compression) as out:
+        for line in heapq.merge(*(_iter_run(path) for path in run_paths)):
+            if line == previous:
+                continue
+            out.write(line)
+            out.write(b"\n")
+            previous = line
+            written += 1
+    return written
+
+def _merge_all(run_paths, output_filepath, temp_dir, compression=None):
+    """Mezcla los runs en varias pasadas si hay más de MAX_MERGE_FILES."""
+    generation = 0
+    while len(run_paths) > MAX_MERGE_FILES:
+        merged = []
+        for i in range(0, len(run_paths), MAX_MERGE_FILES):
+            group = run_paths[i:i + MAX_MERGE_FILES]
+            path = os.path.join(temp_dir, f"merge-{generation}-{i // MAX_MERGE_FILES:06d}")
+            _merge_runs(group, path)
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        run_paths = merged
+        generation += 1
+    return _merge_runs(run_paths, output_filepath, compression)
+
+def _sorted_unique_stream(input_filepath, input_compression, output_filepath, run_size, num_processes,
+                          temp_dir, compression):
+    """
+    Como _sorted_unique, pero para una entrada comprimida: el proceso principal la lee en
+    streaming y envía cada tramo a los procesos, con como mucho num_processes tramos en vuelo.
+    """
+    run_paths = []
+    results = []
+    with open_compressed(input_filepath, "rb", input_compression) as f:
+        runs = _iter_stream_runs(f, run_size)
+        if num_processes > 1:
+            pending = collections.deque()
+            with Pool(processes=num_processes) as pool:
+                for data in runs:
+                    run_paths.append(os.path.join(temp_dir, f"run-{len(run_paths):06d}"))
+                    pending.append(pool.apply_async(_sort_run, ((data, 0, len(data), run_paths[-1]),)))
+                    if len(pending) >= num_processes:
+                        results.append(pending.popleft().get())
+                results.extend(result.get() for result in pending)
+        else:
+            for data in runs:
+                run_paths.append(os.path.join(temp_dir, f"run-{len(run_paths):06d}"))
+                results.append(_sort_run((data, 0, len(data), run_paths[-1])))
+    if not run_paths:
+        _open_output(output_filepath, compression).close()
+        return 0, 0
+    unique = _merge_all(run_paths, output_filepath, temp_dir, compression)
+    return sum(result[0] for result in results), unique
+
+def _sorted_unique(input_filepath, output_filepath, memory_budget, num_processes, temp_dir, compression=None):
+    """Ordenación externa: runs ordenados en paralelo dentro del presupuesto y mezcla k-way."""
+    run_size = max(MIN_RUN_SIZE, memory_budget // (num_processes * MEMORY_OVERHEAD_FACTOR))
+    input_compression = detect_compression(input_filepath)
+    if input_compression is not None:
+        return _sorted_unique_stream(input_filepath, input_compression, output_filepath, run_size,
+                                     num_processes, temp_dir, compression)
+    ranges = _line_ranges(input_filepath, run_size)
+    jobs = [
+        (input_filepath, start, end, os.path.join(temp_dir, f"run-{i:06d}"))
+        for i, (start, end) in enumerate(ranges)
+    ]
+    if not jobs:
+        _open_output(output_filepath, compression).close()
+        return 0, 0
+    if num_processes > 1 and len(jobs) > 1:
+        with Pool(processes=min(num_processes, len(jobs))) as pool:
+            results = pool.map(_sort_run, jobs)
+    else:
+        results = [_sort_run(job) for job in jobs]
+    lines_read = sum(result[0] for result in results)
+    unique = _merge_all([job[3] for job in jobs], output_filepath, temp_dir, compression)
+    return lines_read, unique
+
+def _dedup_bucket(job):
+    """
+    Deduplica un cubo de la partición por hash: en memoria si cabe en su parte del
+    presupuesto, o con ordenación externa si no. Devuelve (líneas leídas, únicas).
+    """
+    bucket_path, output_path, memory_budget = job
+    if os.path.getsize(bucket_path) * MEMORY_OVERHEAD_FACTOR <= memory_budget:
+        with open(bucket_path, "rb") as f:
+            lines = _split_lines(f.read())
+        unique_lines = sorted(set(lines))
+        with open(output_path, "wb", buffering=IO_BUFFER_SIZE) as out:
+            for line in unique_lines:
+                out.write(line)
+                out.write(b"\n")
+        return len(lines), len(unique_lines)
+    bucket_temp = tempfile.mkdtemp(prefix="bucket-", dir=os.path.dirname(bucket_path))
+    try:
+        return _sorted_unique(bucket_path, output_path, memory_budget, 1, bucket_temp)
+    finally:
+        shutil.rmtree(bucket_temp, ignore_errors=True)
+
+def _bucketed_unique(input_filepath, output_filepath, memory_budget, num_processes, buckets, temp_dir,
+                     compression=None):
+    """
+    Particiona la entrada por hash (crc32, estable entre ejecuciones) en 'buckets' cubos:
+    una línea repetida siempre cae en el mismo cubo, así cada cubo se deduplica por separado.
+    La salida queda ordenada dentro de cada cubo, no globalmente.
+    """
+    bucket_paths = [os.path.join(temp_dir, f"bucket-{i:05d}") for i in range(buckets)]
+    handles = [open(path, "wb", buffering=IO_BUFFER_SIZE // 4) for path in bucket_paths]
+    try:
+        input_compression = detect_compression(input_filepath)
+        with (open(input_filepath, "rb", buffering=IO_BUFFER_SIZE) if input_compression is None
+              else open_compressed(input_filepath, "rb", input_compression)) as f:
+            for line in f:
+                line = line.rstrip(b"\n")
+                handles[zlib.crc32(line) % buckets].write(line + b"\n")
+    finally:
+        for handle in handles:
+            handle.close()
+
+    jobs = [(path, f"{path}.unique", max(MIN_RUN_SIZE, memory_budget // num_processes)) for path in bucket_paths]
+    if num_processes > 1:
+        with Pool(processes=min(num_processes, buckets)) as pool:
+            results = pool.map(_dedup_bucket, jobs)
+    else:
+        results = [_dedup_bucket(job) for job in jobs]
+
+    with _open_output(output_filepath, compression) as out:
+        for _, unique_path, _ in jobs:
+            with open(unique_path, "rb") as f:
+                shutil.copyfileobj(f, out, IO_BUFFER_SIZE)
+    return sum(result[0] for result in results), sum(result[1] for result in results)
+
+def external_sort_unique(input_filepath, output_filepath, memory_budget=DEFAULT_DEDUP_MEMORY,
+                         num_processes=None, buckets=0, compression=None):
+    """
+    Elimina las líneas duplicadas de input_filepath y escribe el resultado en output_filepath
+    usando como mucho ~memory_budget bytes de RAM, igual en todos los sistemas operativos.
+    Por defecto ordena por bytes (como 'LC_ALL=C sort -u'); con buckets > 0 particiona por hash.
+    La entrada puede estar comprimida (gzip, bz2 o xz, se detecta por su cabecera) y con
+    compression la salida se comprime en ese formato.
+    Devuelve un diccionario con las líneas leídas, las únicas y los duplicados eliminados.
+    """
+    if memory_budget is None or memory_budget <= 0:
+        raise ValueError("El presupuesto de memoria debe ser un número positivo.")
+    if buckets is not None and buckets < 0:
+        raise ValueError("El número de cubos no puede ser negativo.")
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+
+    output_dir = os.path.dirname(os.path.abspath(output_filepath))
+    temp_dir = tempfile.mkdtemp(prefix=".dedup-", dir=output_dir)
+    try:
+        if buckets:
+            lines_read, unique = _bucketed_unique(input_filepath, output_filepath, memory_budget,
+                                                  num_processes, buckets, temp_dir, compression)
+        else:
+            lines_read, unique = _sorted_unique(input_filepath, output_filepath, memory_budget,
+                                                num_processes, temp_dir, compression)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {'lines': lines_read, 'unique': unique, 'duplicates': lines_read - unique}
@@ -1,18 +1,39 @@
 # dictgen.py
 
+import contextlib
 import os
 import sys
 from tqdm import tqdm # Necesario para tqdm.write en el main
 import argparse # Necesario para argparse.Namespace
 
 # Importar las clases y funciones de los otros módulos
-from contenido import DictionaryGenerator, set_verbose_mode # set_verbose_mode ahora viene de contenido
+from contenido import DictionaryGenerator, set_verbose_mode, keyword_args_dict # set_verbose_mode ahora viene de contenido
 from parametros import parse_cli_arguments, run_interactive_mode, deduplicate_file_auto, _print_verbose
+from planificador import plan_generation, print_plan, check_plan_thresholds, CALIBRATION_SECONDS
+from combinador import generate_combinations
+from lista_palabras import generate_from_keywords_file
+from probabilidad import generate_probable
+from estadisticas import RunStats
+from reparto import keyword_offsets, shard_range
+from coordinador import run_coordinator, run_node
 
 def main():
     """
     Función principal que orquesta la ejecución del generador de diccionarios.
     """
+    parser_obj = None 
+    args = None       
+    try:
+        parser_obj, args = parse_cli_arguments()
+    except SystemExit:
+        return 
+
+    # Con --stdout la salida estándar queda reservada para las claves: todo lo demás va a stderr
+    stream = None
+    if args.stdout:
+        stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+
     # --- ASCII Art de Título ---
     print(r"""
           ___ ___ ___ _____ ___ ___ _  _ 
@@ -23,28 +44,26 @@ def main():
     """)
     # --- Fin ASCII Art ---
     print("\n--- Generador de Diccionarios Avanzado (Optimizado para Bajos Recursos y Multi-Proceso) ---\n") # Añadí un \n para más espacio
-    
-    parser_obj = None 
-    args = None       
-    try:
-        parser_obj, args = parse_cli_arguments()
-    except SystemExit:
-        return 
 
     # Asignar el valor de verbosidad desde los argumentos CLI a la variable global en 'contenido.py'
     set_verbose_mode(args.verbose)
     _print_verbose("Modo verboso activado desde CLI.")
 
+    # Informe de la ejecución (--stats): cada etapa se mide con stage(nombre); sin él no se mide nada
+    stats = RunStats(args.stats, profile=args.profile, trace_memory=args.trace_memory) if args.stats else None
+    stage = stats.stage if stats is not None else (lambda name: contextlib.nullcontext())
+
     # Determina si se proporcionaron argumentos relevantes por CLI (para no iniciar el interactivo por defecto)
     relevant_cli_args_provided = any(
         (key == 'keywords' and args.keywords is not None and len(args.keywords) > 0) or
+        (key == 'keywords_file' and args.keywords_file is not None) or
         (key == 'numbers' and args.numbers) or
         (key == 'years' and args.years is not None) or
         (key == 'digits' and args.digits is not None) or
         (key == 'special_chars' and args.special_chars is not None and len(args.special_chars) > 0) or
         (key == 'limit' and args.limit is not None) or
         (key == 'case_mix' and args.case_mix)
-        for key in ['keywords', 'numbers', 'years', 'digits', 'special_chars', 'limit', 'case_mix']
+        for key in ['keywords', 'keywords_file', 'numbers', 'years', 'digits', 'special_chars', 'limit', 'case_mix']
     )
 
     generator = None 
@@ -73,26 +92,34 @@ def main():
 
     try: # Bloque try-except para KeyboardInterrupt en el modo CLI y general
         if args.interactive or not relevant_cli_args_provided:
+            if args.stdout:
+                tqdm.write("Error: --stdout solo está disponible en modo de línea de comandos (con -k).")
+                return
             # Ejecuta el modo interactivo
             run_interactive_mode(generator, args) 
         else: # Ejecuta el modo de línea de comandos (CLI)
-            if not args.keywords: 
-                tqdm.write("Error: En modo de línea de comandos, debes proporcionar al menos una palabra clave con -k o --keywords.")
+            if not args.keywords and args.keywords_file is None: 
+                tqdm.write("Error: En modo de línea de comandos, debes proporcionar al menos una palabra clave con -k o --keywords (o una lista con --keywords-file).")
                 return
             
-            output_dir = os.path.dirname(generator.output_file)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-                _print_verbose(f"Directorio de salida '{output_dir}' creado.")
-
-            # Asegúrate de que el archivo se crea vacío o se trunca antes de empezar a escribir
-            with open(generator.output_file, "w") as f:
-                pass # Solo abrir y cerrar para asegurar que el archivo esté vacío
-            _print_verbose(f"Archivo de salida '{generator.output_file}' creado/truncado.")
+            # Opciones de generación de la lista de palabras (--keywords-file): las mismas que las de -k
+            keywords_file_args = argparse.Namespace(
+                numbers=args.numbers,
+                digits=args.digits,
+                years_range=args.years_range,
+                special_chars=args.special_chars,
+                case_mix=args.case_mix,
+                limit=args.limit,
+                canonical=args.canonical,
+                rules=args.rules,
+                leet=args.leet,
+                leet_max=args.leet_max,
+                policy=args.policy
+            )
 
             # Prepara los datos para los procesos en CLI
             keywords_data_for_parallel = []
-            for keyword in args.keywords:
+            for keyword in args.keywords or []:
                 # En modo CLI, las configuraciones (numbers, digits, etc.) son globales para todas las keywords
                 # Creamos un namespace para cada keyword para que _process_keyword pueda leerlo uniformemente
                 keyword_specific_args = argparse.Namespace(
@@ -101,36 +128,185 @@ def main():
                     years_range=args.years_range, # Ya parseado arriba
                     special_chars=args.special_chars, # Ya es una lista o None
                     case_mix=args.case_mix,
-                    limit=args.limit
+                    limit=args.limit,
+                    canonical=args.canonical,
+                    rules=args.rules,
+                    leet=args.leet,
+                    leet_max=args.leet_max,
+                    policy=args.policy
                 )
                 keywords_data_for_parallel.append({
                     'keyword': keyword,
                     'args': keyword_specific_args # Las configuraciones son las mismas para todas las keywords en CLI
                 })
             
+            combine_options = None
+            if args.combine is not None:
+                combine_options = {'max_words': args.combine, 'separators': args.separators, 'permute': args.permute}
+
+            # Porción K/N del espacio de claves global (--shard): independiente del número de procesos
+            candidate_range = None
+            if args.shard is not None:
+                keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data_for_parallel]
+                _, total = keyword_offsets(keywords_settings)
+                candidate_range = shard_range(total, *args.shard)
+                tqdm.write(f"Porción {args.shard[0]}/{args.shard[1]}: claves [{candidate_range[0]:,}, "
+                           f"{candidate_range[1]:,}) de {total:,}.")
+
+            # Plan de generación: con --plan solo se informa; los umbrales pueden rechazar la ejecución
+            if args.plan or args.warn_size or args.max_size or args.max_candidates:
+                plan = plan_generation(
+                    keywords_data_for_parallel,
+                    num_processes=args.processes,
+                    calibration_seconds=CALIBRATION_SECONDS if args.plan else 0,
+                    engine=args.engine,
+                    combine=combine_options,
+                    keywords_file=args.keywords_file,
+                    keywords_file_args=keywords_file_args,
+                    output_dir=None if args.stdout else os.path.dirname(os.path.abspath(args.output)),
+                    compression=args.compress,
+                    buffer_size=args.buffer_size,
+                    # Sin concatenación final: salida estándar, fragmentos conservados o salida reservada
+                    concatenate=not (args.stdout or args.keep_shards or args.preallocate),
+                    candidate_range=candidate_range,
+                    budget=args.budget
+                )
+                if args.plan:
+                    print_plan(plan)
+                allowed = check_plan_thresholds(plan, args.warn_size, args.max_size, args.max_candidates)
+                if args.plan:
+                    return
+                if not allowed:
+                    tqdm.write("Generación cancelada. Ajusta las opciones o los umbrales (--max-size, --max-candidates).")
+                    return
+
+            # Generación repartida: el coordinador solo cede rangos de claves a los nodos, no escribe nada
+            if args.coordinator is not None:
+                with stage('coordinator'):
+                    run_coordinator(keywords_data_for_parallel, args.coordinator,
+                                    lease_size=args.lease_size, lease_timeout=args.lease_timeout)
+                return
+
+            if stream is not None:
+                if args.probability:
+                    with stage('probability'):
+                        generate_probable(keywords_data_for_parallel, stream=stream, budget=args.budget)
+                    return
+                if keywords_data_for_parallel:
+                    _print_verbose(f"Iniciando generación hacia la salida estándar para {len(keywords_data_for_parallel)} palabras clave.")
+                    with stage('stream'):
+                        generator.generate_dictionary_stream(
+                            keywords_data=keywords_data_for_parallel,
+                            stream=stream,
+                            num_processes=args.processes,
+                            bloom_fp_rate=args.bloom_fp if args.bloom else None,
+                            bloom_memory=args.bloom_memory,
+                            engine=args.engine
+                        )
+                if args.keywords_file is not None:
+                    with stage('keywords_file'):
+                        generate_from_keywords_file(args.keywords_file, keywords_file_args, stream=stream,
+                                                    num_processes=args.processes, engine=args.engine)
+                return
+
+            output_dir = os.path.dirname(generator.output_file)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+                _print_verbose(f"Directorio de salida '{output_dir}' creado.")
+
+            # Nodo de una generación repartida: cada rango cedido va a su propio archivo junto a la salida
+            if args.connect is not None:
+                run_node(generator, keywords_data_for_parallel, args.connect, generator.output_file,
+                         num_processes=args.processes, buffer_size=args.buffer_size, flush_every=args.flush_every,
+                         engine=args.engine, compression=args.compress, stats=stats)
+                return
+
+            # Asegúrate de que el archivo se crea vacío o se trunca antes de empezar a escribir
+            # (al reanudar se conserva: los fragmentos se añadirán al final)
+            if not args.resume:
+                with open(generator.output_file, "w") as f:
+                    pass # Solo abrir y cerrar para asegurar que el archivo esté vacío
+                _print_verbose(f"Archivo de salida '{generator.output_file}' creado/truncado.")
+
             _print_verbose(f"Iniciando generación CLI para {len(keywords_data_for_parallel)} palabras clave.")
+            # Orden de probabilidad: un único recorrido global, sin fragmentos por proceso
+            if args.probability:
+                with stage('probability'):
+                    generate_probable(keywords_data_for_parallel, output_filepath=generator.output_file,
+                                      budget=args.budget, compression=args.compress)
             # Llama a la función de generación paralela
-            generator.generate_dictionary_parallel(
-                keywords_data=keywords_data_for_parallel,
-                output_filepath=generator.output_file,
-                num_processes=args.processes
-            )
+            elif keywords_data_for_parallel:
+                generator.generate_dictionary_parallel(
+                    keywords_data=keywords_data_for_parallel,
+                    output_filepath=generator.output_file,
+                    num_processes=args.processes,
+                    buffer_size=args.buffer_size,
+                    flush_every=args.flush_every,
+                    keep_shards=args.keep_shards,
+                    checkpoint=args.checkpoint,
+                    checkpoint_interval=args.checkpoint_interval,
+                    resume=args.resume,
+                    bloom_fp_rate=args.bloom_fp if args.bloom else None,
+                    bloom_memory=args.bloom_memory,
+                    engine=args.engine,
+                    compression=args.compress,
+                    stats=stats,
+                    candidate_range=candidate_range,
+                    preallocate=args.preallocate
+                )
+
+            # Lista de palabras: se genera en streaming y se añade al final del mismo archivo
+            if args.keywords_file is not None:
+                with stage('keywords_file'):
+                    generate_from_keywords_file(args.keywords_file, keywords_file_args,
+                                                output_filepath=generator.output_file,
+                                                num_processes=args.processes,
+                                                buffer_size=args.buffer_size,
+                                                engine=args.engine,
+                                                compression=args.compress)
+
+            # Etapa de combinación: se añade al final del mismo archivo
+            if combine_options is not None:
+                with stage('combine'):
+                    generate_combinations(
+                        keywords_data_for_parallel,
+                        generator.output_file,
+                        num_processes=args.processes,
+                        memory_budget=args.combine_memory,
+                        buffer_size=args.buffer_size,
+                        engine=args.engine,
+                        compression=args.compress,
+                        **combine_options
+                    )
             
             # Deduplicación automática si se solicitó en CLI
-            if args.deduplicate:
-                deduplicate_file_auto(generator.output_file)
+            if args.keep_shards:
+                tqdm.write("Fragmentos conservados: la deduplicación automática se omite.")
+            elif args.deduplicate:
+                with stage('deduplicate'):
+                    deduplicate_file_auto(generator.output_file, memory_budget=args.dedup_memory,
+                                          num_processes=args.processes, buckets=args.dedup_buckets)
             else:
                 tqdm.write("Deduplicación omitida. Puedes hacerlo manualmente más tarde si lo deseas.")
                 tqdm.write(f"Para Linux/macOS: sort -u \"{generator.output_file}\" > \"{os.path.splitext(generator.output_file)[0]}_unique{os.path.splitext(generator.output_file)[1]}\"")
                 tqdm.write(f"Para Windows (PowerShell): Get-Content '{generator.output_file}' | Sort-Object -Unique | Set-Content '{os.path.splitext(generator.output_file)[0]}_unique{os.path.splitext(generator.output_file)[1]}'")
 
     except KeyboardInterrupt:
-        tqdm.write(f"\nOperación principal cancelada por el usuario. Diccionario parcial guardado en '{generator.output_file}'.")
+        if args.checkpoint or args.resume or args.stdout or args.coordinator or args.connect or args.preallocate:
+            tqdm.write("\nOperación principal cancelada por el usuario.")
+        else:
+            tqdm.write(f"\nOperación principal cancelada por el usuario. Diccionario parcial guardado en '{generator.output_file}'.")
+    except ValueError as e:
+        tqdm.write(f"Error: {e}")
     except IOError as e:
         tqdm.write(f"Error de E/S al abrir o escribir el diccionario en '{generator.output_file}': {e}")
         tqdm.write("Verifica permisos de escritura o la ruta del archivo.")
     except Exception as e:
         tqdm.write(f"Ocurrió un error inesperado: {e}")
+    finally:
+        if stats is not None:
+            stats.write()
+            tqdm.write(f"Informe de la ejecución guardado en '{args.stats}'.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,311 @@
+import errno
+import os
+import shutil
+import time
+from compresion import compress_member
+
+# Tamaño por defecto del búfer de cada fragmento (8 MiB)
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+# Tamaño de bloque usado al concatenar los fragmentos en el archivo final
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+SHARD_DIR_SUFFIX = ".parts"
+
+def shard_directory(output_filepath):
+    """Devuelve el directorio donde se guardan los fragmentos de un archivo de salida."""
+    return f"{output_filepath}{SHARD_DIR_SUFFIX}"
+
+def shard_path(shard_dir, task_index):
+    """Devuelve la ruta del fragmento asociado a una tarea."""
+    return os.path.join(shard_dir, f"shard-{task_index:06d}.txt")
+
+def prepare_shard_directory(shard_dir):
+    """
+    Crea el directorio de fragmentos, eliminando restos de ejecuciones anteriores.
+    """
+    if os.path.isdir(shard_dir):
+        shutil.rmtree(shard_dir)
+    os.makedirs(shard_dir)
+
+class ShardWriter:
+    """
+    Escritor con búfer propio para el fragmento de una única tarea.
+    Cada tarea escribe en su propio archivo, por lo que no necesita ningún lock
+    entre procesos: las claves se acumulan en memoria y se vuelcan en bloques grandes.
+    """
+    # Cada cuántas claves se comprueba el reloj para flush_interval
+    CLOCK_CHECK_EVERY = 4096
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE, flush_every=None,
+                 flush_interval=None, on_flush=None, append=False, candidate_filter=None, compression=None,
+                 stages=None):
+        """
+        flush_every: vuelca cada N claves. flush_interval: vuelca si han pasado N segundos.
+        on_flush(claves_procesadas, bytes_en_disco): se llama tras cada volcado (puntos de control).
+        append: continúa un fragmento existente en lugar de truncarlo.
+        candidate_filter: objeto con add(bytes) -> bool; las claves para las que devuelve
+        False (ya vistas) se descartan. 'count' incluye las descartadas (cuenta posiciones).
+        compression: 'gzip', 'bz2' o 'xz'; cada volcado se escribe como un miembro comprimido
+        completo, así el fragmento siempre termina en un límite de miembro.
+        stages: StageTimes donde acumular el tiempo de filtrar, comprimir, escribir en disco y
+        guardar el punto de control (--stats); con None no se mide nada.
+        """
+        if buffer_size is None or buffer_size <= 0:
+            raise ValueError("El tamaño del búfer debe ser un número positivo.")
+        if flush_every is not None and flush_every <= 0:
+            raise ValueError("flush_every debe ser un número positivo si se especifica.")
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.candidate_filter = candidate_filter
+        self.compression = compression
+        self.stages = stages
+        self.count = 0
+        self.suppressed = 0
+        self._pending = 0
+        self._buffer = bytearray()
+        self._last_flush = time.monotonic()
+        self._file = open(path, "ab" if append else "wb", buffering=0)
+
+    def write(self, candidate):
+        """Añade una clave (str) al búfer, seguida de un salto de línea."""
+        encoded = candidate.encode("utf-8")
+        self.count += 1
+        if self.candidate_filter is not None and not self.candidate_filter.add(encoded):
+            self.suppressed += 1
+            return
+        self._buffer += encoded
+        self._buffer += b"\n"
+        self._pending += 1
+        if len(self._buffer) >= self.buffer_size or (
+            self.flush_every is not None and self._pending >= self.flush_every
+        ) or (
+            self.flush_interval is not None and self._pending % self.CLOCK_CHECK_EVERY == 0
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def write_block(self, block, count):
+        """
+        Añade un bloque de bytes ya codificado que recorre 'count' posiciones del índice
+        (cada clave terminada en salto de línea; con política de claves, el bloque puede
+        traer menos líneas). Con filtro, las claves se comprueban una a una. 'count' avanza
+        siempre en posiciones, que es lo que guarda el punto de control para reanudar.
+        """
+        if self.candidate_filter is not None:
+            started = time.perf_counter() if self.stages is not None else None
+            for line in block.split(b"\n")[:-1]:
+                if self.candidate_filter.add(line):
+                    self._buffer += line
+                    self._buffer += b"\n"
+                else:
+                    self.suppressed += 1
+            if started is not None:
+                self.stages.add('filter', time.perf_counter() - started)
+        else:
+            self._buffer += block
+        self.count += count
+        self._pending += count
+        if len(self._buffer) >= self.buffer_size or (
+            self.flush_every is not None and self._pending >= self.flush_every
+        ) or (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Vuelca el búfer al disco. Solo se escriben líneas completas."""
+        if self._buffer:
+            data = self._buffer
+            started = time.perf_counter() if self.stages is not None else None
+            if self.compression is not None:
+                data = compress_member(bytes(self._buffer), self.compression)
+                if started is not None:
+                    compressed = time.perf_counter()
+                    self.stages.add('compress', compressed - started)
+                    started = compressed
+            self._file.write(data)
+            if started is not None:
+                self.stages.add('disk_write', time.perf_counter() - started)
+            self._buffer.clear()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush is not None:
+            started = time.perf_counter() if self.stages is not None else None
+            self.on_flush(self.count, self._file.tell())
+            if started is not None:
+                self.stages.add('checkpoint', time.perf_counter() - started)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def preallocate_output(output_filepath, size):
+    """
+    Reserva 'size' bytes al final del archivo de salida con os.posix_fallocate (o, si el
+    sistema o el sistema de archivos no lo admiten, ampliándolo con truncate).
+    Devuelve la posición donde empieza la zona reservada.
+    """
+    with open(output_filepath, "ab") as out:
+        offset = out.seek(0, os.SEEK_END)
+        if size <= 0:
+            return offset
+        fallocate = getattr(os, "posix_fallocate", None)
+        if fallocate is not None:
+            try:
+                fallocate(out.fileno(), offset, size)
+                return offset
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+                    raise
+        out.truncate(offset + size)
+    return offset
+
+class RegionWriter:
+    """
+    Escritor con búfer para la zona [offset, offset + size) de un archivo de salida
+    ya reservado (ver preallocate_output). Cada tarea escribe su propia zona con
+    escrituras posicionales (os.pwrite), sin locks ni fragmentos intermedios.
+    Al cerrar comprueba que la zona se ha llenado exactamente.
+    """
+    def __init__(self, path, offset, size, buffer_size=DEFAULT_BUFFER_SIZE, flush_every=None, stages=None):
+        """
+        offset, size: zona del archivo asignada a la tarea, en bytes.
+        flush_every: vuelca cada N claves. stages: StageTimes donde acumular el tiempo de
+        escribir en disco (--stats); con None no se mide nada.
+        """
+        if buffer_size is None or buffer_size <= 0:
+            raise ValueError("El tamaño del búfer debe ser un número positivo.")
+        if flush_every is not None and flush_every <= 0:
+            raise ValueError("flush_every debe ser un número positivo si se especifica.")
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.buffer_size = buffer_size
+        self.flush_every = flush_every
+        self.stages = stages
+        self.count = 0
+        self.suppressed = 0
+        self.written = 0
+        self._pending = 0
+        self._buffer = bytearray()
+        self._fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+
+    def write(self, candidate):
+        """Añade una clave (str) al búfer, seguida de un salto de línea."""
+        self.write_block(candidate.encode("utf-8") + b"\n", 1)
+
+    def write_block(self, block, count):
+        """Añade un bloque de bytes ya codificado con 'count' claves completas."""
+        self._buffer += block
+        self.count += count
+        self._pending += count
+        if len(self._buffer) >= self.buffer_size or (
+            self.flush_every is not None and self._pending >= self.flush_every
+        ):
+            self.flush()
+
+    def flush(self):
+        """Escribe el búfer en su posición de la zona."""
+        if self._buffer:
+            if self.written + len(self._buffer) > self.size:
+                raise IOError(f"La tarea escribe más de los {self.size} bytes reservados para su zona.")
+            started = time.perf_counter() if self.stages is not None else None
+            view = memoryview(self._buffer)
+            while view:
+                position = self.offset + self.written
+                if hasattr(os, "pwrite"):
+                    written = os.pwrite(self._fd, view, position)
+                else:
+                    # Sin pwrite (Windows): el descriptor es propio de la tarea, así que basta con posicionarlo
+                    os.lseek(self._fd, position, os.SEEK_SET)
+                    written = os.write(self._fd, view)
+                self.written += written
+                view = view[written:]
+            view.release()
+            if started is not None:
+                self.stages.add('disk_write', time.perf_counter() - started)
+            self._buffer.clear()
+        self._pending = 0
+
+    def close(self):
+        if self._fd is None:
+            return
+        try:
+            self.flush()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        if self.written != self.size:
+            raise IOError(f"La tarea ha escrito {self.written} de los {self.size} bytes reservados para su zona.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+def _complete_lines_size(path):
+    """
+    Devuelve el número de bytes del archivo que forman líneas completas.
+    Un proceso terminado a la fuerza puede dejar la última línea a medias.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, "rb") as f:
+        position = size
+        while position > 0:
+            step = min(COPY_CHUNK_SIZE, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                return position + newline + 1
+    return 0
+
+def concatenate_shards(shard_paths, output_filepath, compressed=False):
+    """
+    Añade los fragmentos, en el orden recibido, al final del archivo de salida.
+    Ignora fragmentos inexistentes y descarta líneas incompletas. Los fragmentos
+    comprimidos se copian enteros: están formados por miembros completos.
+    Devuelve el número de bytes escritos.
+    """
+    written = 0
+    with open(output_filepath, "ab") as out:
+        for path in shard_paths:
+            if not os.path.exists(path):
+                continue
+            remaining = os.path.getsize(path) if compressed else _complete_lines_size(path)
+            with open(path, "rb") as shard:
+                while remaining > 0:
+                    chunk = shard.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    remaining -= len(chunk)
+                    written += len(chunk)
+    return written
+
+def remove_shards(shard_dir):
+    """Elimina el directorio de fragmentos y su contenido."""
+    shutil.rmtree(shard_dir, ignore_errors=True)
@@ -0,0 +1,145 @@
+import contextlib
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+class StageTimes:
+    """
+    Segundos y llamadas acumulados por etapa dentro de una tarea (generar, escribir, volcar...).
+    Solo se crea con --stats: sin él, el código instrumentado recibe None y no mide nada.
+    """
+    __slots__ = ('seconds', 'calls')
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def merge(self, stages):
+        """Suma las etapas de otro resumen ({etapa: {'seconds', 'calls'}})."""
+        for stage, values in stages.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + values['seconds']
+            self.calls[stage] = self.calls.get(stage, 0) + values['calls']
+
+    def as_dict(self):
+        return {stage: {'seconds': round(self.seconds[stage], 6), 'calls': self.calls[stage]}
+                for stage in sorted(self.seconds)}
+
+class StageClock:
+    """Cronómetro por vueltas: cada lap(etapa) suma a esa etapa el tiempo desde la vuelta anterior."""
+    def __init__(self, stages):
+        self.stages = stages
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages.add(stage, now - self._last)
+        self._last = now
+
+class TaskProfiler:
+    """
+    Perfilado opcional de una tarea en el proceso que la ejecuta: con profile_dir guarda un
+    perfil de cProfile por tarea (se abre con pstats) y con trace_memory mide el pico de memoria
+    reservada por Python con tracemalloc.
+    """
+    def __init__(self, options, name):
+        self.profile_dir = options.get('profile_dir')
+        self.trace_memory = options.get('trace_memory', False)
+        self.name = name
+        self.memory_peak = None
+        self._profile = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile_dir is not None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(os.path.join(self.profile_dir, f"{self.name}-{os.getpid()}.prof"))
+        if self.trace_memory:
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return False
+
+class RunStats:
+    """
+    Informe de una ejecución (--stats): etapas del proceso principal, y tiempo, claves, bytes
+    y etapas de cada tarea, agregados por palabra clave y por proceso. Se guarda como JSON.
+    """
+    def __init__(self, path, profile=False, trace_memory=False):
+        self.path = path
+        self.profile_dir = f"{path}.profiles" if profile else None
+        self.trace_memory = trace_memory
+        self.stages = StageTimes()
+        self.tasks = []
+        self._started = time.perf_counter()
+
+    def worker_options(self):
+        """Opciones que reciben las tareas para instrumentarse (se envían a los procesos)."""
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        return {'profile_dir': self.profile_dir, 'trace_memory': self.trace_memory}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Mide una etapa del proceso principal (plan, pool, concatenación, deduplicación...)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.add(name, time.perf_counter() - started)
+
+    def clock(self):
+        """Cronómetro por vueltas sobre las etapas del proceso principal."""
+        return StageClock(self.stages)
+
+    def add_tasks(self, results):
+        """Añade los resúmenes devueltos por las tareas (se ignoran las que fallaron)."""
+        self.tasks.extend(result for result in results if result is not None)
+
+    def report(self):
+        """Construye el informe: totales, etapas, palabras clave, procesos y tareas."""
+        keywords = {}
+        workers = {}
+        for task in self.tasks:
+            for key, group in ((task['keyword'], keywords), (task['pid'], workers)):
+                entry = group.setdefault(key, {'tasks': 0, 'seconds': 0.0, 'candidates': 0, 'pruned': 0, 'bytes': 0,
+                                               'stages': StageTimes()})
+                entry['tasks'] += 1
+                entry['seconds'] += task['seconds']
+                entry['candidates'] += task['candidates']
+                entry['pruned'] += task.get('pruned', 0)
+                entry['bytes'] += task['bytes']
+                entry['stages'].merge(task['stages'])
+                if task.get('memory_peak') is not None:
+                    entry['memory_peak'] = max(entry.get('memory_peak', 0), task['memory_peak'])
+        for group in (keywords, workers):
+            for entry in group.values():
+                entry['seconds'] = round(entry['seconds'], 6)
+                entry['stages'] = entry['stages'].as_dict()
+        return {
+            'wall_seconds': round(time.perf_counter() - self._started, 6),
+            'candidates': sum(task['candidates'] for task in self.tasks),
+            'pruned': sum(task.get('pruned', 0) for task in self.tasks),
+            'bytes': sum(task['bytes'] for task in self.tasks),
+            'stages': self.stages.as_dict(),
+            'keywords': keywords,
+            'workers': [dict(pid=pid, **workers[pid]) for pid in sorted(workers)],
+            'tasks': self.tasks,
+            'profiles': self.profile_dir,
+        }
+
+    def write(self):
+        """Guarda el informe en self.path."""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
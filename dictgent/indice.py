@@ -0,0 +1,711 @@
+import bisect
+import itertools
+from afijos import affix_table
+from politica import CandidatePolicy, Piece
+from reglas import BASIC_RULES, rule_plan
+from sustituciones import DEFAULT_LEET_MAX, PositionalSpace, leet_options
+import vectorial
+
+# Número de plantillas que se aplican a cada número y a cada carácter especial
+NUMBER_TEMPLATES = 5   # palabra+num, num+palabra, palabra_num, num_palabra, palabra+num+palabra
+SPECIAL_TEMPLATES = 3  # palabra+car, car+palabra, palabra+car+palabra
+
+class CandidateIndex:
+    """
+    Índice de acceso aleatorio sobre los candidatos de una palabra clave.
+
+    El espacio de candidatos es el producto cartesiano
+    variación base × hueco numérico × hueco especial, en el mismo orden en que
+    lo recorren los generadores anidados de DictionaryGenerator:
+      - variación base: máscara de mayúsculas (bit más significativo = primer carácter)
+        o el resultado de cada regla (por defecto, las 4 variaciones básicas como reglas
+        ':', 'l', 'u', 'c'); las reglas que dejan la palabra vacía se omiten. Con 'leet',
+        cada una se amplía con sus sustituciones leet (como mucho 'leet_max' por palabra)
+        en un espacio posicional que se cuenta y recorre sin enumerar las descartadas;
+      - hueco numérico: 0 = sin número, luego (índice del número × 5 plantillas);
+      - hueco especial: 0 = sin carácter, luego (índice del carácter × 3 plantillas).
+    Permite conocer el total y obtener el N-ésimo candidato sin recorrer los anteriores.
+
+    En modo canónico ('canonical') se evitan las repeticiones que salen de la propia
+    estructura: las máscaras ignoran los caracteres sin mayúscula/minúscula (dígitos,
+    símbolos), las variaciones básicas repetidas se omiten y los caracteres especiales
+    repetidos se cuentan una vez. Aún puede haber duplicados cuando un carácter especial
+    coincide con uno de la palabra o de los números (ej. con -k a -s a,
+    palabra+carácter y carácter+palabra dan los dos 'aa').
+
+    Con una política de claves ('policy', ver CandidatePolicy) las posiciones no cambian,
+    pero iter_blocks solo devuelve las claves que la cumplen: las variaciones base, plantillas
+    numéricas y caracteres especiales que no pueden cumplirla se descartan sin generarse, a
+    partir de la longitud y las clases de caracteres de cada trozo. accepted_size cuenta las
+    claves que quedan sin generarlas.
+    """
+    def __init__(self, keyword, args_dict):
+        if not isinstance(keyword, str) or not keyword:
+            raise ValueError("La palabra base no puede estar vacía o no ser una cadena.")
+        self.keyword = keyword
+        self.case_mix = bool(args_dict['case_mix'])
+        self.canonical = bool(args_dict.get('canonical'))
+        self.limit = args_dict['limit']
+        rules = args_dict.get('rules')
+        if rules and self.case_mix:
+            raise ValueError("Las reglas no se pueden combinar con la mezcla de mayúsculas (case_mix).")
+
+        leet = args_dict.get('leet')
+        leet_max = args_dict.get('leet_max')
+        leet_max = DEFAULT_LEET_MAX if leet_max is None else leet_max
+        self._spaces = None
+
+        # Variaciones base
+        if self.case_mix:
+            # Posiciones que recorre la máscara de mayúsculas (en modo canónico, solo las que cambian)
+            self.case_positions = tuple(
+                position for position, char in enumerate(keyword)
+                if not self.canonical or char.upper() != char.lower()
+            )
+            self.base_count = 2 ** len(self.case_positions)
+            self._basic = None
+            if leet:
+                # Cada posición elige minúscula, mayúscula (si está en la máscara) o una sustitución
+                chars = [[char.lower(), char.upper()] if position in self.case_positions else [char.lower()]
+                         for position, char in enumerate(keyword)]
+                self._spaces = [PositionalSpace(leet_options(chars, leet, self.canonical), leet_max)]
+        else:
+            self.case_positions = ()
+            self._basic = tuple(word for word in rule_plan(rules or BASIC_RULES).apply(keyword) if word)
+            if self.canonical:
+                self._basic = tuple(dict.fromkeys(self._basic))
+            self.base_count = len(self._basic)
+            if leet:
+                self._spaces = [PositionalSpace(leet_options([[char] for char in word], leet, self.canonical), leet_max)
+                                for word in self._basic]
+                self._basic = None
+        if self._spaces is not None:
+            # Primera variación base de cada espacio (uno por variación sin sustituciones)
+            self._space_starts = list(itertools.accumulate((space.count for space in self._spaces[:-1]), initial=0))
+            self.base_count = sum(space.count for space in self._spaces)
+
+        # Números: años o dígitos con relleno de ceros
+        self.years_start = None
+        self.num_digits = 0
+        self.number_count = 0
+        years_range = args_dict['years_range']
+        num_digits = args_dict['digits'] or 0
+        if args_dict['numbers']:
+            if years_range:
+                if not isinstance(years_range, tuple) or len(years_range) != 2:
+                    raise ValueError("years_range debe ser una tupla de dos enteros (inicio, fin).")
+                start_year, end_year = years_range
+                if not all(isinstance(y, int) for y in years_range) or start_year > end_year:
+                    raise ValueError("Los años deben ser enteros válidos y el año de inicio no puede ser mayor que el de fin.")
+                self.years_start = start_year
+                self.number_count = end_year - start_year + 1
+            elif num_digits > 0:
+                if not isinstance(num_digits, int):
+                    raise ValueError("num_digits debe ser un entero positivo.")
+                self.num_digits = num_digits
+                self.number_count = 10 ** num_digits
+
+        # Caracteres especiales
+        special_chars = args_dict['special_chars'] or []
+        if not isinstance(special_chars, list) or not all(isinstance(c, str) for c in special_chars):
+            raise ValueError("special_chars_list debe ser una lista de cadenas.")
+        if self.canonical:
+            special_chars = list(dict.fromkeys(special_chars))
+        self.special_chars = special_chars
+
+        self.number_slots = 1 + NUMBER_TEMPLATES * self.number_count
+        self.special_slots = 1 + SPECIAL_TEMPLATES * len(self.special_chars)
+        self.per_base = self.number_slots * self.special_slots
+        self.full_count = self.base_count * self.per_base
+        if self.limit is not None:
+            self.count = min(self.full_count, self.limit)
+        else:
+            self.count = self.full_count
+
+        # Política de claves: se resume cada trozo una vez para podar ramas enteras
+        policy = args_dict.get('policy')
+        self.policy = CandidatePolicy(**policy) if policy else None
+        if self.policy is not None and not self.policy.active:
+            self.policy = None
+        if self.policy is not None:
+            self._prepare_policy()
+
+    @property
+    def limited(self):
+        """Indica si el límite por palabra clave recorta el espacio de candidatos."""
+        return self.limit is not None and self.limit <= self.full_count
+
+    # --- Componentes individuales ---
+
+    def base(self, base_index):
+        """Devuelve la variación base número base_index."""
+        if not 0 <= base_index < self.base_count:
+            raise IndexError("Índice de variación base fuera de rango.")
+        if self._basic is not None:
+            return self._basic[base_index]
+        if self._spaces is not None:
+            space = bisect.bisect_right(self._space_starts, base_index) - 1
+            return self._spaces[space].unrank(base_index - self._space_starts[space])
+        chars = [char.lower() for char in self.keyword]
+        last = len(self.case_positions) - 1
+        for bit_number, position in enumerate(self.case_positions):
+            if (base_index >> (last - bit_number)) & 1:
+                chars[position] = self.keyword[position].upper()
+        return "".join(chars)
+
+    def number(self, number_index):
+        """Devuelve el texto del número número_index (año o dígitos con ceros)."""
+        if not 0 <= number_index < self.number_count:
+            raise IndexError("Índice de número fuera de rango.")
+        if self.years_start is not None:
+            return str(self.years_start + number_index)
+        return str(number_index).zfill(self.num_digits)
+
+    # --- Rank / unrank ---
+
+    def compose(self, base_index, number_slot=0, special_slot=0):
+        """Devuelve la posición global de un candidato a partir de sus componentes (rank)."""
+        if not (0 <= base_index < self.base_count and 0 <= number_slot < self.number_slots
+                and 0 <= special_slot < self.special_slots):
+            raise IndexError("Componentes del candidato fuera de rango.")
+        return (base_index * self.number_slots + number_slot) * self.special_slots + special_slot
+
+    rank = compose
+
+    def decompose(self, position):
+        """Devuelve (variación base, hueco numérico, hueco especial) de una posición."""
+        if not 0 <= position < self.full_count:
+            raise IndexError("Posición fuera del espacio de candidatos.")
+        rest, special_slot = divmod(position, self.special_slots)
+        base_index, number_slot = divmod(rest, self.number_slots)
+        return base_index, number_slot, special_slot
+
+    def unrank(self, position):
+        """Devuelve el candidato que ocupa la posición indicada, en O(1)."""
+        if not 0 <= position < self.count:
+            raise IndexError("Posición fuera del espacio de candidatos.")
+        base_index, number_slot, special_slot = self.decompose(position)
+        word = self._apply_number(self.base(base_index), number_slot)
+        return self._apply_special(word, special_slot)
+
+    def _apply_number(self, word, number_slot):
+        if number_slot == 0:
+            return word
+        number_index, template = divmod(number_slot - 1, NUMBER_TEMPLATES)
+        return _NUMBER_FORMATS[template](word, self.number(number_index))
+
+    def _apply_special(self, word, special_slot):
+        if special_slot == 0:
+            return word
+        char_index, template = divmod(special_slot - 1, SPECIAL_TEMPLATES)
+        return _SPECIAL_FORMATS[template](word, self.special_chars[char_index])
+
+    # --- Tamaño en bytes ---
+
+    def byte_size(self, start=0, stop=None):
+        """
+        Devuelve el tamaño exacto en bytes (UTF-8, con un salto de línea por clave)
+        de los candidatos en las posiciones [start, stop), sin generarlos.
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return 0
+        return self._bytes_before(stop) - self._bytes_before(start)
+
+    def _bytes_before(self, position):
+        """Bytes de los candidatos en [0, position)."""
+        base_index, rest = divmod(position, self.per_base)
+        number_slot, special_slot = divmod(rest, self.special_slots)
+        per_base_k, per_base_c = self._inner_bytes(self.number_slots, 0)
+        total = self._base_length_sum(base_index) * per_base_k + base_index * per_base_c
+        if base_index < self.base_count and rest:
+            k, c = self._inner_bytes(number_slot, special_slot)
+            total += _utf8_len(self.base(base_index)) * k + c
+        return total
+
+    def _inner_bytes(self, number_slot, special_slot):
+        """
+        Bytes de los huecos internos [0, (number_slot, special_slot)) de una variación base,
+        como (k, c): el tamaño es k * longitud_base + c. Cada candidato mide de forma
+        lineal respecto a la longitud de su variación base.
+        """
+        full_k, full_c = self._special_bytes(self.special_slots)
+        k = c = 0
+        if number_slot:
+            # Hueco 0 (sin número): palabra sola
+            k += full_k
+            c += full_c
+            full_numbers, partial = divmod(number_slot - 1, NUMBER_TEMPLATES)
+            # Por número: plantillas con 1,1,1,1,2 copias de la palabra y 0,0,1,1,0 guiones bajos
+            k += full_k * 6 * full_numbers
+            c += full_k * (5 * self._number_length_sum(full_numbers) + 2 * full_numbers)
+            c += full_c * NUMBER_TEMPLATES * full_numbers
+            if partial:
+                length = len(self.number(full_numbers))
+                for template in range(partial):
+                    word_k, word_c = _NUMBER_SHAPES[template]
+                    k += full_k * word_k
+                    c += full_k * (word_c + length) + full_c
+        if special_slot:
+            word_k, word_c = self._number_slot_shape(number_slot)
+            slot_k, slot_c = self._special_bytes(special_slot)
+            k += slot_k * word_k
+            c += slot_k * word_c + slot_c
+        return k, c
+
+    def _number_slot_shape(self, number_slot):
+        """Longitud de la palabra de un hueco numérico como (copias de la base, caracteres extra)."""
+        if number_slot == 0:
+            return 1, 0
+        number_index, template = divmod(number_slot - 1, NUMBER_TEMPLATES)
+        word_k, word_c = _NUMBER_SHAPES[template]
+        return word_k, word_c + len(self.number(number_index))
+
+    def _special_bytes(self, special_slot):
+        """
+        Bytes de los huecos especiales [0, special_slot) aplicados a una palabra de longitud W,
+        como (a, d): el tamaño es a * W + d (incluye los saltos de línea).
+        """
+        if special_slot == 0:
+            return 0, 0
+        a, d = 1, 1
+        for slot in range(1, special_slot):
+            char_index, template = divmod(slot - 1, SPECIAL_TEMPLATES)
+            char_length = _utf8_len(self.special_chars[char_index])
+            a += 2 if template == 2 else 1
+            d += char_length + 1
+        return a, d
+
+    def _number_length_sum(self, count):
+        """Suma de las longitudes de los primeros 'count' números."""
+        if self.years_start is None:
+            return count * self.num_digits
+        total = 0
+        value, end = self.years_start, self.years_start + count
+        while value < end:
+            length = len(str(value))
+            block_end = min(end, 10 ** length) if value >= 0 else value + 1
+            total += (block_end - value) * length
+            value = block_end
+        return total
+
+    def _base_length_sum(self, base_count):
+        """Suma de las longitudes en bytes de las primeras 'base_count' variaciones base."""
+        if self._basic is not None:
+            return sum(_utf8_len(word) for word in self._basic[:base_count])
+        if self._spaces is not None:
+            total = 0
+            for space, start in zip(self._spaces, self._space_starts):
+                if base_count <= start:
+                    break
+                total += space.length_sum(base_count - start)
+            return total
+        total = sum(_utf8_len(char.lower()) for char in self.keyword) * base_count
+        last = len(self.case_positions) - 1
+        for bit_number, position in enumerate(self.case_positions):
+            char = self.keyword[position]
+            bit = last - bit_number
+            # Cantidad de máscaras en [0, base_count) con este bit activo (mayúscula)
+            period = 1 << (bit + 1)
+            upper = (base_count // period) * (1 << bit) + max(0, base_count % period - (1 << bit))
+            total += upper * (_utf8_len(char.upper()) - _utf8_len(char.lower()))
+        return total
+
+    # --- Política de claves ---
+
+    def _prepare_policy(self):
+        policy = self.policy
+        self._special_pieces = [policy.piece(char) for char in self.special_chars]
+        self._separator_piece = policy.piece("_")
+        # Grupos de números del mismo ancho: (primero, fin, resumen del número sin juego de caracteres)
+        self._number_groups = []
+        first = 0
+        while first < self.number_count:
+            text = self.number(first)
+            last = self.number_count
+            if self.years_start is not None:
+                last = first + 1
+                while last < self.number_count and len(self.number(last)) == len(text):
+                    last += 1
+            piece = policy.piece(text)
+            self._number_groups.append((first, last, Piece(piece.length, piece.size, piece.classes, True)))
+            first = last
+        self._number_group_starts = [first for first, _, _ in self._number_groups]
+        # Dígitos permitidos (los números de dígitos se cuentan sin recorrerlos)
+        self._allowed_digits = None
+        if policy.allowed_chars is not None:
+            self._allowed_digits = [digit for digit in "0123456789" if digit in policy.allowed_chars]
+        self._cells_cache = {}
+        self._base_totals = {}
+
+    def _number_allowed(self, number_index):
+        return self.policy.allowed_chars is None or self.policy.allows(self.number(number_index))
+
+    def _allowed_numbers(self, start, stop):
+        """Cantidad de números en [start, stop) cuyos caracteres están en el juego permitido."""
+        if stop <= start:
+            return 0
+        if self.policy.allowed_chars is None:
+            return stop - start
+        if self.years_start is not None:
+            return sum(1 for number_index in range(start, stop) if self._number_allowed(number_index))
+        return self._allowed_digits_before(stop) - self._allowed_digits_before(start)
+
+    def _allowed_digits_before(self, position):
+        """Números de num_digits cifras menores que 'position' formados solo por dígitos permitidos."""
+        digits = self._allowed_digits
+        if position >= self.number_count:
+            return len(digits) ** self.num_digits
+        count = 0
+        text = str(position).zfill(self.num_digits)
+        for place, char in enumerate(text):
+            count += sum(1 for digit in digits if digit < char) * len(digits) ** (self.num_digits - place - 1)
+            if char not in digits:
+                break
+        return count
+
+    def _number_group(self, number_index):
+        """Grupo de ancho al que pertenece un número."""
+        return bisect.bisect_right(self._number_group_starts, number_index) - 1
+
+    def _cells(self, base_piece, group=None):
+        """
+        Tamaño en bytes (con salto de línea) de cada hueco interno de una variación base con
+        ese resumen, o 0 si la clave no cumple la política. Sin grupo, los huecos especiales
+        de la palabra sin número; con grupo, las NUMBER_TEMPLATES plantillas de un número de
+        ese grupo por cada hueco especial. Devuelve (tamaños, claves válidas, bytes válidos).
+        """
+        key = (base_piece, group)
+        cells = self._cells_cache.get(key)
+        if cells is not None:
+            return cells
+        if group is None:
+            words = [base_piece]
+        else:
+            number = self._number_groups[group][2]
+            separator = self._separator_piece
+            words = [base_piece + number, number + base_piece, base_piece + separator + number,
+                     number + separator + base_piece, base_piece + number + base_piece]
+        accepts = self.policy.accepts_piece
+        sizes = []
+        for word in words:
+            for candidate in [word] + [piece for char in self._special_pieces
+                                       for piece in (word + char, char + word, word + char + word)]:
+                sizes.append(candidate.size + 1 if accepts(candidate) else 0)
+        cells = (sizes, sum(1 for size in sizes if size), sum(sizes))
+        self._cells_cache[key] = cells
+        return cells
+
+    def _inner_tally(self, base_piece, stop):
+        """Claves válidas y sus bytes entre los primeros 'stop' huecos internos de una variación base."""
+        sizes, count, num_bytes = self._cells(base_piece)
+        if stop < len(sizes):
+            head = sizes[:stop]
+            return sum(1 for size in head if size), sum(head)
+        stop -= len(sizes)
+        if stop <= 0 or not self.number_count:
+            return count, num_bytes
+        full, partial = divmod(stop, NUMBER_TEMPLATES * self.special_slots)
+        for group, (first, last, _) in enumerate(self._number_groups):
+            if first >= full:
+                break
+            _, group_count, group_bytes = self._cells(base_piece, group)
+            numbers = self._allowed_numbers(first, min(last, full))
+            count += numbers * group_count
+            num_bytes += numbers * group_bytes
+        if partial and self._number_allowed(full):
+            head = self._cells(base_piece, self._number_group(full))[0][:partial]
+            count += sum(1 for size in head if size)
+            num_bytes += sum(head)
+        return count, num_bytes
+
+    def _base_total(self, base_piece):
+        """Claves válidas y bytes de una variación base completa (en caché por resumen)."""
+        total = self._base_totals.get(base_piece)
+        if total is None:
+            total = self._inner_tally(base_piece, self.per_base)
+            self._base_totals[base_piece] = total
+        return total
+
+    def accepted_size(self, start=0, stop=None):
+        """
+        Devuelve (claves, bytes) de los candidatos de [start, stop) que cumplen la política, sin
+        generarlos (sin política, todos). Cada variación base se resume una vez: el recuento es
+        exacto y cuesta una operación por variación base, no por candidato.
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return 0, 0
+        if self.policy is None:
+            return stop - start, self.byte_size(start, stop)
+        count = num_bytes = 0
+        position = start
+        while position < stop:
+            base_index, rest = divmod(position, self.per_base)
+            base_start = base_index * self.per_base
+            end = min(stop - base_start, self.per_base)
+            base_piece = self.policy.piece(self.base(base_index))
+            if rest == 0 and end == self.per_base:
+                base_count, base_bytes = self._base_total(base_piece)
+            else:
+                base_count, base_bytes = self._inner_tally(base_piece, end)
+                if rest:
+                    head_count, head_bytes = self._inner_tally(base_piece, rest)
+                    base_count -= head_count
+                    base_bytes -= head_bytes
+            count += base_count
+            num_bytes += base_bytes
+            position = base_start + end
+        return count, num_bytes
+
+    def iter_accepted(self, start=0, stop=None):
+        """Como iter_range, pero solo con los candidatos que cumplen la política (camino escalar)."""
+        candidates = self.iter_range(start, stop)
+        if self.policy is None:
+            return candidates
+        return filter(self.policy.accepts, candidates)
+
+    # --- Recorrido secuencial ---
+
+    def _iter_bases(self, start):
+        if self._basic is not None:
+            yield from self._basic[start:]
+            return
+        for base_index in range(start, self.base_count):
+            yield self.base(base_index)
+
+    def _iter_numbers(self, start):
+        if self.years_start is not None:
+            for year in range(self.years_start + start, self.years_start + self.number_count):
+                yield str(year)
+        else:
+            num_digits = self.num_digits
+            for i in range(start, self.number_count):
+                yield str(i).zfill(num_digits)
+
+    def _iter_number_variants(self, word, start_slot=0):
+        if start_slot == 0:
+            yield word
+            first_number, first_template = 0, 0
+        else:
+            first_number, first_template = divmod(start_slot - 1, NUMBER_TEMPLATES)
+        numbers = self._iter_numbers(first_number)
+        if first_template:
+            num = next(numbers)
+            for template in _NUMBER_FORMATS[first_template:]:
+                yield template(word, num)
+        for num in numbers:
+            yield f"{word}{num}"
+            yield f"{num}{word}"
+            yield f"{word}_{num}"
+            yield f"{num}_{word}"
+            yield f"{word}{num}{word}"
+
+    def _iter_special_variants(self, word, start_slot=0):
+        if start_slot == 0:
+            yield word
+            first_char, first_template = 0, 0
+        else:
+            first_char, first_template = divmod(start_slot - 1, SPECIAL_TEMPLATES)
+        chars = iter(self.special_chars[first_char:])
+        if first_template:
+            char = next(chars)
+            for template in _SPECIAL_FORMATS[first_template:]:
+                yield template(word, char)
+        for char in chars:
+            yield f"{word}{char}"
+            yield f"{char}{word}"
+            yield f"{word}{char}{word}"
+
+    def _iter_from(self, position):
+        base_index, number_slot, special_slot = self.decompose(position)
+        has_numbers = self.number_count > 0
+        has_specials = bool(self.special_chars)
+        for base in self._iter_bases(base_index):
+            if has_numbers:
+                number_variants = self._iter_number_variants(base, number_slot)
+            else:
+                number_variants = iter([base])
+            number_slot = 0
+            for num_var in number_variants:
+                if has_specials:
+                    yield from self._iter_special_variants(num_var, special_slot)
+                else:
+                    yield num_var
+                special_slot = 0
+
+    def iter_range(self, start=0, stop=None):
+        """
+        Recorre los candidatos en las posiciones [start, stop) sin generar los anteriores.
+        Devuelve un generador.
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return iter(())
+        return itertools.islice(self._iter_from(start), stop - start)
+
+    # --- Recorrido por bloques de bytes ---
+
+    def iter_blocks(self, start=0, stop=None):
+        """
+        Recorre los candidatos [start, stop) como bloques de bytes UTF-8 (una clave por
+        línea), idénticos a codificar iter_range. Los números salen de la tabla de afijos
+        precodificada y cada bloque se construye concatenando bytes, sin cadenas intermedias.
+        Con política, el bloque solo contiene las claves que la cumplen: las variaciones base
+        sin ninguna clave válida se saltan enteras y de cada número solo se construyen las
+        plantillas y caracteres especiales que pueden cumplirla.
+        Devuelve un generador de (bloque, posiciones recorridas por el bloque).
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        position = start
+        group = NUMBER_TEMPLATES * self.special_slots
+        table = affix_table(self) if self.number_count else None
+        policy = self.policy
+        # Variación base actual: (índice, bytes, resumen para la política)
+        encoded_base = (None, None, None)
+        while position < stop:
+            base_index, rest = divmod(position, self.per_base)
+            base_start = base_index * self.per_base
+            if policy is not None:
+                if encoded_base[0] != base_index:
+                    word = self.base(base_index)
+                    encoded_base = (base_index, word.encode("utf-8"), policy.piece(word))
+                if not self._base_total(encoded_base[2])[0]:
+                    # Ninguna clave de esta variación base cumple la política: no se genera
+                    end = min(stop, base_start + self.per_base)
+                    yield b"", end - position
+                    position = end
+                    continue
+            if table is None or rest < self.special_slots:
+                # Palabra sin número (y sus variaciones especiales): camino normal
+                end = min(stop, base_start + (self.per_base if table is None else self.special_slots))
+                yield self._encode_range(position, end), end - position
+                position = end
+                continue
+            number_index, inner = divmod(rest - self.special_slots, group)
+            if inner:
+                # Se empieza a mitad de un número: se completa por el camino normal
+                end = min(stop, position + group - inner)
+                yield self._encode_range(position, end), end - position
+                position = end
+                continue
+            numbers_end = min(table.block_stop(number_index), number_index + (stop - position) // group)
+            if numbers_end == number_index:
+                # Queda menos de un número completo antes de 'stop'
+                yield self._encode_range(position, stop), stop - position
+                position = stop
+                continue
+            if encoded_base[0] != base_index:
+                encoded_base = (base_index, self.base(base_index).encode("utf-8"), None)
+            numbers = table.block(number_index, numbers_end)
+            size = (numbers_end - number_index) * group
+            keep = None
+            if policy is not None:
+                # Plantillas y caracteres especiales que pueden cumplir la política con este ancho de número
+                sizes = self._cells(encoded_base[2], self._number_group(number_index))[0]
+                keep = [cell for cell, cell_size in enumerate(sizes) if cell_size]
+                if policy.allowed_chars is not None:
+                    numbers = [number for number in numbers if policy.allows(number.decode("ascii"))]
+                if not keep or not numbers:
+                    yield b"", size
+                    position += size
+                    continue
+                if len(keep) == group:
+                    keep = None
+            if table.vectorized:
+                block = vectorial.render_numbers(encoded_base[1], numbers, self._encoded_specials(), keep)
+            else:
+                block = self._render_numbers(encoded_base[1], numbers, keep)
+            yield block, size
+            position += size
+
+    def _encode_range(self, start, stop):
+        return "".join(candidate + "\n" for candidate in self.iter_accepted(start, stop)).encode("utf-8")
+
+    def _encoded_specials(self):
+        return [char.encode("utf-8") for char in self.special_chars]
+
+    def _render_numbers(self, word, numbers, keep=None):
+        """
+        Aplica las plantillas numéricas (y las especiales) a una lista de números codificados.
+        Cada plantilla se construye como una lista completa y luego se intercalan en orden.
+        keep limita el resultado a esos huecos internos (plantilla * special_slots + hueco
+        especial, en orden): las columnas descartadas por la política no se construyen.
+        """
+        if keep is not None:
+            return self._render_kept_numbers(word, numbers, keep)
+        word_sep = word + b"_"
+        sep_word = b"_" + word
+        variants = list(_interleave(
+            [word + num for num in numbers],
+            [num + word for num in numbers],
+            [word_sep + num for num in numbers],
+            [num + sep_word for num in numbers],
+            [word + num + word for num in numbers],
+        ))
+        if self.special_chars:
+            columns = [variants]
+            for char in self._encoded_specials():
+                columns.append([variant + char for variant in variants])
+                columns.append([char + variant for variant in variants])
+                columns.append([variant + char + variant for variant in variants])
+            variants = list(_interleave(*columns))
+        variants.append(b"")
+        return b"\n".join(variants)
+
+    def _render_kept_numbers(self, word, numbers, keep):
+        specials = self._encoded_specials()
+        templates = {}
+        columns = []
+        for cell in keep:
+            template, special_slot = divmod(cell, self.special_slots)
+            variants = templates.get(template)
+            if variants is None:
+                variants = templates[template] = [_NUMBER_BYTES[template](word, num) for num in numbers]
+            if special_slot == 0:
+                columns.append(variants)
+                continue
+            char_index, special_template = divmod(special_slot - 1, SPECIAL_TEMPLATES)
+            char = specials[char_index]
+            columns.append([_SPECIAL_BYTES[special_template](variant, char) for variant in variants])
+        lines = list(_interleave(*columns))
+        lines.append(b"")
+        return b"\n".join(lines)
+
+def _interleave(*columns):
+    """Intercala listas del mismo tamaño: a0, b0, c0, a1, b1, c1..."""
+    return itertools.chain.from_iterable(zip(*columns))
+
+def _utf8_len(text):
+    return len(text.encode("utf-8"))
+
+# Longitud de cada plantilla numérica: (copias de la palabra, caracteres fijos sin contar el número)
+_NUMBER_SHAPES = ((1, 0), (1, 0), (1, 1), (1, 1), (2, 0))
+
+_NUMBER_FORMATS = (
+    lambda word, num: f"{word}{num}",
+    lambda word, num: f"{num}{word}",
+    lambda word, num: f"{word}_{num}",
+    lambda word, num: f"{num}_{word}",
+    lambda word, num: f"{word}{num}{word}",
+)
+
+_NUMBER_BYTES = (
+    lambda word, num: word + num,
+    lambda word, num: num + word,
+    lambda word, num: word + b"_" + num,
+    lambda word, num: num + b"_" + word,
+    lambda word, num: word + num + word,
+)
+
+_SPECIAL_BYTES = (
+    lambda word, char: word + char,
+    lambda word, char: char + word,
+    lambda word, char: word + char + word,
+)
+
+_SPECIAL_FORMATS = (
+    lambda word, char: f"{word}{char}",
+    lambda word, char: f"{char}{word}",
+    lambda word, char: f"{word}{char}{word}",
+)
@@ -0,0 +1,179 @@
+import mmap
+import os
+import sys
+from multiprocessing import Pool
+from tqdm import tqdm
+import contenido
+from contenido import (_print_verbose, keyword_args_dict, _iter_windowed, _init_chunk_worker, _discard_stream,
+                       STREAM_WINDOW_PER_PROCESS)
+from indice import CandidateIndex
+from afijos import build_affix_tables
+from compresion import detect_compression, open_compressed
+from escritor import (DEFAULT_BUFFER_SIZE, ShardWriter, shard_directory, shard_path, prepare_shard_directory,
+                      concatenate_shards, remove_shards)
+
+# Claves aproximadas que genera cada bloque de palabras enviado a un proceso
+CHUNK_CANDIDATES = 1 << 20
+# Longitud media supuesta de una palabra (con su salto de línea) para convertir palabras en bytes
+AVERAGE_WORD_BYTES = 10
+MAX_CHUNK_WORDS = 100000
+# Palabra de ejemplo para estimar cuántas claves genera cada palabra de la lista
+SAMPLE_WORD = "password"
+
+def _decode_words(data):
+    """Convierte un bloque de líneas en palabras: sin saltos de línea ni líneas vacías."""
+    words = []
+    for line in data.split(b"\n"):
+        line = line.rstrip(b"\r")
+        if line:
+            words.append(line.decode("utf-8", errors="replace"))
+    return words
+
+def words_per_chunk(args_dict):
+    """Palabras por bloque para que cada bloque genere ~CHUNK_CANDIDATES claves."""
+    per_word = CandidateIndex(SAMPLE_WORD, args_dict).count or 1
+    return max(1, min(MAX_CHUNK_WORDS, CHUNK_CANDIDATES // per_word))
+
+def iter_keyword_jobs(path, chunk_words):
+    """
+    Divide la lista de palabras en bloques sin leerla entera. Para archivos normales solo
+    se buscan los límites de línea de cada rango de bytes (cada proceso lee su rango con
+    mmap); si está comprimido (gzip, bz2 o xz), como no permite saltar, se lee en streaming
+    y se envían las palabras.
+    Devuelve un generador de bloques ('range', ruta, inicio, fin) o ('words', palabras).
+    """
+    compression = detect_compression(path)
+    if compression is not None:
+        with open_compressed(path, "rb", compression) as f:
+            words = []
+            for line in f:
+                words.append(line)
+                if len(words) >= chunk_words:
+                    yield ('words', _decode_words(b"".join(words)))
+                    words = []
+            if words:
+                yield ('words', _decode_words(b"".join(words)))
+        return
+    size = os.path.getsize(path)
+    chunk_bytes = chunk_words * AVERAGE_WORD_BYTES
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                end += len(f.readline())
+            yield ('range', path, start, end)
+            start = end
+
+def iter_keywords_file(path):
+    """Recorre todas las palabras del archivo en streaming (para el plan de generación)."""
+    for chunk in iter_keyword_jobs(path, MAX_CHUNK_WORDS):
+        yield from _chunk_words(chunk)
+
+def _chunk_words(chunk):
+    if chunk[0] == 'words':
+        return chunk[1]
+    _, path, start, end = chunk
+    if end <= start:
+        return []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return _decode_words(mapped[start:end])
+
+def _process_words_chunk(job):
+    """
+    Genera las variaciones de un bloque de palabras. Si se indica un fragmento las escribe
+    en él; si no, las devuelve como bytes (salida estándar).
+    Devuelve (bytes o None, palabras, claves).
+    """
+    chunk, args_dict, shard, buffer_size, compression = job
+    words = _chunk_words(chunk)
+    generated = 0
+    blocks = []
+    writer = ShardWriter(shard, buffer_size=buffer_size, compression=compression) if shard is not None else None
+    try:
+        for word in words:
+            try:
+                index = CandidateIndex(word, args_dict)
+            except ValueError as e:
+                _print_verbose(f"Palabra '{word}' omitida: {e}")
+                continue
+            for block, count in index.iter_blocks():
+                if writer is not None:
+                    writer.write_block(block, count)
+                else:
+                    blocks.append(block)
+                generated += count if index.policy is None else block.count(b"\n")
+    finally:
+        if writer is not None:
+            writer.close()
+    return (b"".join(blocks) if writer is None else None), len(words), generated
+
+def generate_from_keywords_file(path, args, output_filepath=None, stream=None, num_processes=None,
+                                buffer_size=DEFAULT_BUFFER_SIZE, engine="auto", compression=None):
+    """
+    Genera las variaciones de cada palabra de una lista (texto o comprimida) con las opciones de
+    'args', sin cargar la lista en memoria. Los bloques de palabras se reparten entre los
+    procesos con una ventana acotada y sus resultados se añaden en orden, según terminan,
+    al final de output_filepath (cada bloque en un fragmento que se borra al añadirlo) o,
+    si se indica stream, a ese flujo binario. compression comprime los fragmentos como en la
+    generación principal. Devuelve (palabras, claves generadas).
+    """
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+    args_dict = keyword_args_dict(args)
+    chunk_words = words_per_chunk(args_dict)
+    input_compression = detect_compression(path)
+    tqdm.write(f"Procesando la lista de palabras '{path}'{f' ({input_compression})' if input_compression else ''} "
+               f"en bloques de {chunk_words} palabras con {num_processes} procesos.")
+
+    work_dir = None
+    if stream is None:
+        work_dir = shard_directory(output_filepath)
+        prepare_shard_directory(work_dir)
+
+    def jobs():
+        for number, chunk in enumerate(iter_keyword_jobs(path, chunk_words)):
+            shard = shard_path(work_dir, number) if work_dir is not None else None
+            yield chunk, args_dict, shard, buffer_size, compression
+
+    # Las tablas de números dependen solo de las opciones: se construyen una vez para toda la lista
+    affix_tables = build_affix_tables([CandidateIndex(SAMPLE_WORD, args_dict)], engine)
+    words = generated = 0
+    number = 0
+    pbar = tqdm(desc="Total generado", unit="claves", leave=True, file=sys.stderr if stream is not None else sys.stdout)
+    try:
+        with Pool(processes=num_processes, initializer=_init_chunk_worker,
+                  initargs=(affix_tables, None, contenido._verbose_mode, stream is not None)) as pool:
+            for data, chunk_words_read, count in _iter_windowed(pool, _process_words_chunk, jobs(),
+                                                                 STREAM_WINDOW_PER_PROCESS * num_processes):
+                if stream is not None:
+                    try:
+                        stream.write(data)
+                    except BrokenPipeError:
+                        _discard_stream(stream)
+                        pool.terminate()
+                        pbar.close()
+                        tqdm.write("\nLa salida estándar se cerró; generación detenida.")
+                        return words, generated
+                else:
+                    # Cada bloque se añade en cuanto le toca, así en disco solo quedan los de la ventana
+                    shard = shard_path(work_dir, number)
+                    concatenate_shards([shard], output_filepath, compressed=compression is not None)
+                    os.remove(shard)
+                number += 1
+                words += chunk_words_read
+                generated += count
+                pbar.update(count)
+        if stream is not None:
+            try:
+                stream.flush()
+            except BrokenPipeError:
+                _discard_stream(stream)
+    finally:
+        pbar.close()
+        if work_dir is not None:
+            remove_shards(work_dir)
+
+    tqdm.write(f"Lista de palabras procesada: {words:,} palabras, {generated:,} claves.")
+    return words, generated
@@ -3,6 +3,18 @@ import os
 import sys
 from tqdm import tqdm
 from contenido import set_verbose_mode, _print_verbose # Importar funciones desde contenido
+from escritor import DEFAULT_BUFFER_SIZE
+from puntos_control import DEFAULT_CHECKPOINT_INTERVAL
+from deduplicacion import DEFAULT_DEDUP_MEMORY, external_sort_unique
+from bloom import DEFAULT_BLOOM_FP_RATE
+from vectorial import ENGINES, numpy_available
+from combinador import DEFAULT_COMBINE_MEMORY
+from reglas import load_rules
+from sustituciones import DEFAULT_LEET_TABLE, DEFAULT_LEET_MAX, load_leet_table
+from compresion import COMPRESSION_FORMATS, detect_compression, split_suffix, compressed_path
+from reparto import parse_shard
+from politica import CandidatePolicy
+from coordinador import DEFAULT_LEASE_SIZE, DEFAULT_LEASE_TIMEOUT, parse_address
 
 def get_interactive_input(prompt, validation_func=None, error_message="Entrada inválida. Inténtalo de nuevo."):
     """Helper para obtener entrada de usuario con validación."""
@@ -17,6 +29,25 @@ def get_interactive_input(prompt, validation_func=None, error_message="Entrada i
             print("\nOperación cancelada por el usuario.")
             return None
 
+def parse_size(value):
+    """
+    Convierte un tamaño legible (ej. 512K, 8M, 2G) a bytes.
+    Se usa como 'type' de argparse.
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = str(value).strip().upper().rstrip('B')
+    multiplier = 1
+    if text and text[-1] in units:
+        multiplier = units[text[-1]]
+        text = text[:-1]
+    try:
+        size = int(float(text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Tamaño inválido: '{value}'. Usa por ejemplo 512K, 8M o 1G.")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("El tamaño debe ser un número positivo.")
+    return size
+
 def parse_cli_arguments():
     """
     Se encarga de recibir y procesar los argumentos de la línea de comandos usando argparse.
@@ -31,10 +62,25 @@ def parse_cli_arguments():
         nargs='+',
         help="Palabras clave base para generar el diccionario (ej. -k nombre ciudad mascota)."
     )
+    parser.add_argument(
+        "--keywords-file",
+        metavar="ARCHIVO",
+        help="Lista de palabras base, una por línea (texto, gzip, bz2 o xz). Se lee en streaming y por bloques,\nsin cargarla en memoria; sus palabras se generan después de las de -k con las mismas opciones."
+    )
     parser.add_argument(
         "-o", "--output",
         default="dictionary.txt",
-        help="Nombre del archivo de salida para el diccionario (por defecto: dictionary.txt)."
+        help="Nombre del archivo de salida para el diccionario (por defecto: dictionary.txt).\nCon '-' las claves se envían a la salida estándar (igual que --stdout)."
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSION_FORMATS,
+        help="Comprime el diccionario (gzip, bz2 o xz). Cada proceso comprime sus propios bloques\ny el archivo final es la concatenación de sus miembros. Se añade la extensión si falta."
+    )
+    parser.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Envía las claves a la salida estándar en lugar de a un archivo (ej. para pasarlas a un cracker).\nEl banner, la barra de progreso y los mensajes van a stderr."
     )
     parser.add_argument(
         "-n", "--numbers",
@@ -65,6 +111,98 @@ def parse_cli_arguments():
         action="store_true",
         help="Generar todas las combinaciones posibles de mayúsculas y minúsculas para cada palabra clave (ej. 'Palabra' -> 'PaLaBrA')."
     )
+    parser.add_argument(
+        "--canonical",
+        action="store_true",
+        help="Genera menos duplicados por palabra clave: omite variaciones básicas repetidas, no mezcla\nmayúsculas en dígitos/símbolos e ignora caracteres especiales repetidos. No garantiza claves\núnicas si un carácter especial coincide con uno de la palabra o de los números (usa -x o --bloom)."
+    )
+    parser.add_argument(
+        "--rules",
+        metavar="ARCHIVO",
+        help="Archivo de reglas con sintaxis de hashcat (subconjunto: : l u c C t TN r d $X ^X sXY 'N [ ]).\nCada regla produce una variación base que sustituye a las básicas. No es compatible con -c."
+    )
+    parser.add_argument(
+        "--leet",
+        action="store_true",
+        help="Añade variaciones leetspeak (a->4/@, e->3, o->0, s->$/5...) a cada variación base, incluida la mezcla de mayúsculas."
+    )
+    parser.add_argument(
+        "--leet-table",
+        metavar="ARCHIVO",
+        help="Tabla de sustituciones leet propia (implica --leet): una línea por carácter, ej. 'a 4 @'."
+    )
+    parser.add_argument(
+        "--leet-max",
+        type=int,
+        default=DEFAULT_LEET_MAX,
+        help=f"Máximo de sustituciones leet por palabra (por defecto: {DEFAULT_LEET_MAX})."
+    )
+    parser.add_argument(
+        "--min-length",
+        type=int,
+        metavar="N",
+        help="Política de claves: descarta las claves de menos de N caracteres. Las variaciones, números y\ncaracteres especiales que no pueden cumplir la política no llegan a generarse."
+    )
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        metavar="N",
+        help="Política de claves: descarta las claves de más de N caracteres."
+    )
+    parser.add_argument(
+        "--require-digit",
+        action="store_true",
+        help="Política de claves: solo claves con al menos un dígito."
+    )
+    parser.add_argument(
+        "--require-upper",
+        action="store_true",
+        help="Política de claves: solo claves con al menos una mayúscula."
+    )
+    parser.add_argument(
+        "--require-symbol",
+        action="store_true",
+        help="Política de claves: solo claves con al menos un símbolo (cualquier carácter que no sea letra ni dígito, incluido '_')."
+    )
+    parser.add_argument(
+        "--charset",
+        metavar="CARACTERES",
+        help="Política de claves: solo claves formadas por estos caracteres, con rangos (ej. 'a-zA-Z0-9!@#')."
+    )
+    parser.add_argument(
+        "--probability",
+        action="store_true",
+        help="Genera las claves de todas las palabras clave en orden de probabilidad estimada: capitalizada,\npocas mayúsculas, años recientes y sufijos habituales primero. Con -l, las N más probables por palabra."
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        metavar="N",
+        help="Con --probability, genera solo las N claves más probables en total (presupuesto global)."
+    )
+    parser.add_argument(
+        "--combine",
+        type=int,
+        metavar="N",
+        help="Añade combinaciones de 2 a N palabras clave con sus variaciones (ej. nombre+año+mascota)."
+    )
+    parser.add_argument(
+        "--separators",
+        nargs='+',
+        default=[""],
+        help="Separadores para unir las palabras combinadas (ej. --separators \"\" _ .). Por defecto, sin separador."
+    )
+    parser.add_argument(
+        "--permute",
+        action="store_true",
+        help="Combina las palabras en todos los órdenes (por defecto, solo en el orden de -k)."
+    )
+    parser.add_argument(
+        "--combine-memory",
+        type=parse_size,
+        default=DEFAULT_COMBINE_MEMORY,
+        help="Memoria para la última palabra de cada combinación; si no cabe, se vuelca a disco (por defecto: 256M)."
+    )
     parser.add_argument(
         "-i", "--interactive",
         action="store_true",
@@ -80,6 +218,148 @@ def parse_cli_arguments():
         action="store_true",
         help="Elimina automáticamente los duplicados al finalizar la generación."
     )
+    parser.add_argument(
+        "--dedup-memory",
+        type=parse_size,
+        default=DEFAULT_DEDUP_MEMORY,
+        help="Memoria máxima que puede usar la deduplicación (ej. 512M, 2G). Por defecto: 256M."
+    )
+    parser.add_argument(
+        "--dedup-buckets",
+        type=int,
+        default=0,
+        help="Particiona por hash en N cubos que se deduplican por separado (salida no ordenada globalmente)."
+    )
+    parser.add_argument(
+        "--bloom",
+        action="store_true",
+        help="Suprime durante la generación las claves repetidas entre palabras clave con un filtro Bloom\ncompartido por todos los procesos (sin pasada posterior; puede descartar alguna clave nueva por falso positivo)."
+    )
+    parser.add_argument(
+        "--bloom-memory",
+        type=parse_size,
+        help="Memoria máxima del filtro Bloom (ej. 256M). Por defecto se dimensiona según el número de claves."
+    )
+    parser.add_argument(
+        "--bloom-fp",
+        type=float,
+        default=DEFAULT_BLOOM_FP_RATE,
+        help=f"Tasa de falsos positivos objetivo del filtro Bloom (por defecto: {DEFAULT_BLOOM_FP_RATE})."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Motor para los bloques con números (--digits/--years): 'numpy' los construye vectorizados,\n'python' no usa NumPy y 'auto' (por defecto) usa NumPy si está instalado. La salida es idéntica."
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=parse_size,
+        default=DEFAULT_BUFFER_SIZE,
+        help="Tamaño del búfer de escritura de cada proceso (ej. 512K, 8M). Por defecto: 8M."
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        help="Vuelca el búfer al disco cada N claves además de cuando se llena (por defecto solo al llenarse)."
+    )
+    parser.add_argument(
+        "--keep-shards",
+        action="store_true",
+        help="No concatena los fragmentos de cada proceso al finalizar; se conservan en '<salida>.parts'."
+    )
+    parser.add_argument(
+        "--preallocate",
+        action="store_true",
+        help="Reserva de antemano el tamaño exacto del diccionario (posix_fallocate) y cada proceso escribe su zona\n"
+             "con escrituras posicionales, sin fragmentos ni concatenación final. La salida es idéntica byte a byte\n"
+             "entre ejecuciones."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="Guarda periódicamente la posición de cada tarea en '<salida>.parts' para poder reanudar con --resume."
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=DEFAULT_CHECKPOINT_INTERVAL,
+        help=f"Segundos entre puntos de control (por defecto: {DEFAULT_CHECKPOINT_INTERVAL})."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reanuda una generación interrumpida desde su punto de control, sin repetir lo ya generado.\nRequiere las mismas palabras clave y opciones."
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="K/N",
+        help="Genera solo la porción K de N del espacio de claves (todas las palabras clave y variaciones).\n"
+             "Las porciones son disjuntas y deterministas: concatenadas de 1 a N dan el diccionario completo."
+    )
+    parser.add_argument(
+        "--coordinator",
+        metavar="DIRECCION",
+        help="Reparte la generación entre nodos: escucha en host:puerto o unix:/ruta y cede rangos de claves\n"
+             "a los nodos que se conectan con --connect (mismas palabras clave y opciones)."
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="DIRECCION",
+        help="Trabaja como nodo del coordinador en esa dirección: cada rango cedido se guarda en\n"
+             "'<salida>.range-<inicio>-<fin>'; concatenados en orden dan el diccionario completo."
+    )
+    parser.add_argument(
+        "--lease-size",
+        type=int,
+        default=DEFAULT_LEASE_SIZE,
+        metavar="N",
+        help=f"Con --coordinator, claves por rango cedido (por defecto: {DEFAULT_LEASE_SIZE})."
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=DEFAULT_LEASE_TIMEOUT,
+        metavar="SEGUNDOS",
+        help=f"Con --coordinator, segundos sin latidos tras los que el rango de un nodo se cede de nuevo\n(por defecto: {DEFAULT_LEASE_TIMEOUT:g})."
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Muestra el número exacto de claves, el tamaño del archivo, los duplicados esperados\ny el tiempo estimado, sin generar nada."
+    )
+    parser.add_argument(
+        "--warn-size",
+        type=parse_size,
+        help="Avisa si el diccionario va a ocupar en disco más de este tamaño (ej. 10G).\n"
+             "Con --compress se compara el tamaño comprimido estimado; con --shard o --budget, solo lo que se genera."
+    )
+    parser.add_argument(
+        "--max-size",
+        type=parse_size,
+        help="Rechaza la generación si el diccionario va a ocupar en disco más de este tamaño (ej. 100G).\n"
+             "Con --compress se compara el tamaño comprimido estimado; con --shard o --budget, solo lo que se genera."
+    )
+    parser.add_argument(
+        "--max-candidates",
+        type=int,
+        help="Rechaza la generación si se van a generar más de este número de claves."
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="ARCHIVO",
+        help="Guarda un informe JSON de la ejecución: tiempo por etapa (generar, escribir, comprimir,\nvolcar, concatenar...) y tiempo, claves y bytes por palabra clave y por proceso."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Con --stats, guarda un perfil de cProfile de cada tarea en '<informe>.profiles'."
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Con --stats, mide el pico de memoria de Python de cada tarea con tracemalloc (más lento)."
+    )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
@@ -99,45 +379,187 @@ def parse_cli_arguments():
         if args.processes is not None and args.processes <= 0:
             parser.error("El número de procesos debe ser un número positivo si se especifica.")
 
+        if args.dedup_buckets < 0:
+            parser.error("--dedup-buckets no puede ser negativo.")
+
+        if not 0 < args.bloom_fp <= 0.5:
+            parser.error("--bloom-fp debe estar entre 0 y 0.5.")
+
+        if args.bloom_memory is not None and args.bloom_memory <= 0:
+            parser.error("--bloom-memory debe ser un tamaño positivo.")
+        if args.bloom and (args.checkpoint or args.resume):
+            # El filtro no se guarda en el punto de control: al reanudar no recordaría las claves ya escritas
+            parser.error("--bloom no es compatible con --checkpoint ni --resume.")
+
+        if args.checkpoint_interval <= 0:
+            parser.error("--checkpoint-interval debe ser un número positivo.")
+
+        if args.max_candidates is not None and args.max_candidates <= 0:
+            parser.error("--max-candidates debe ser un número positivo si se especifica.")
+
+        if args.flush_every is not None and args.flush_every <= 0:
+            parser.error("--flush-every debe ser un número positivo si se especifica.")
+
+        if args.combine is not None:
+            if args.combine < 2:
+                parser.error("--combine necesita al menos 2 palabras clave.")
+            if not args.keywords or args.combine > len(args.keywords):
+                parser.error("--combine no puede ser mayor que el número de palabras clave (-k).")
+            if args.checkpoint or args.resume or args.keep_shards:
+                parser.error("--combine no es compatible con --checkpoint, --resume ni --keep-shards.")
+
+        if args.rules is not None:
+            if args.case_mix:
+                parser.error("--rules no es compatible con --case-mix (-c).")
+            try:
+                args.rules = load_rules(args.rules)
+            except (OSError, ValueError) as e:
+                parser.error(f"No se pudieron cargar las reglas: {e}")
+            if not args.rules:
+                parser.error("El archivo de reglas no contiene ninguna regla.")
+
+        if args.leet_max < 0:
+            parser.error("--leet-max no puede ser negativo.")
+        if args.leet_table is not None:
+            try:
+                args.leet = load_leet_table(args.leet_table)
+            except (OSError, ValueError) as e:
+                parser.error(f"No se pudo cargar la tabla leet: {e}")
+        elif args.leet:
+            args.leet = DEFAULT_LEET_TABLE
+        else:
+            args.leet = None
+
+        args.policy = None
+        if (args.min_length is not None or args.max_length is not None or args.require_digit
+                or args.require_upper or args.require_symbol or args.charset is not None):
+            try:
+                args.policy = CandidatePolicy(min_length=args.min_length, max_length=args.max_length,
+                                              require_digit=args.require_digit, require_upper=args.require_upper,
+                                              require_symbol=args.require_symbol, charset=args.charset)
+            except ValueError as e:
+                parser.error(f"Política de claves inválida: {e}")
+            if args.combine is not None:
+                parser.error("La política de claves (--min-length, --max-length, --require-*, --charset) "
+                             "no es compatible con --combine.")
+
+        if args.keywords_file is not None:
+            if not os.path.isfile(args.keywords_file):
+                parser.error(f"No se encuentra la lista de palabras '{args.keywords_file}'.")
+            incompatible = [name for name, value in (("--checkpoint", args.checkpoint), ("--resume", args.resume),
+                                                     ("--keep-shards", args.keep_shards), ("--bloom", args.bloom),
+                                                     ("--interactive", args.interactive)) if value]
+            if incompatible:
+                parser.error(f"--keywords-file no es compatible con {', '.join(incompatible)}.")
+
+        if (args.profile or args.trace_memory) and args.stats is None:
+            parser.error("--profile y --trace-memory requieren --stats.")
+
+        if args.budget is not None:
+            if not args.probability:
+                parser.error("--budget requiere --probability.")
+            if args.budget <= 0:
+                parser.error("--budget debe ser un número positivo.")
+        if args.probability:
+            incompatible = [name for name, value in (("--checkpoint", args.checkpoint), ("--resume", args.resume),
+                                                     ("--keep-shards", args.keep_shards), ("--bloom", args.bloom),
+                                                     ("--combine", args.combine is not None),
+                                                     ("--keywords-file", args.keywords_file is not None),
+                                                     ("--deduplicate", args.deduplicate),
+                                                     ("--interactive", args.interactive)) if value]
+            if incompatible:
+                parser.error(f"--probability no es compatible con {', '.join(incompatible)}.")
+
+        distributed = [name for name, value in (("--shard", args.shard), ("--coordinator", args.coordinator),
+                                                ("--connect", args.connect)) if value is not None]
+        if len(distributed) > 1:
+            parser.error(f"{' y '.join(distributed)} no pueden usarse a la vez.")
+        if args.shard is not None:
+            try:
+                args.shard = parse_shard(args.shard)
+            except ValueError as e:
+                parser.error(str(e))
+        for name in ("coordinator", "connect"):
+            if getattr(args, name) is not None:
+                try:
+                    parse_address(getattr(args, name))
+                except ValueError as e:
+                    parser.error(str(e))
+        if args.lease_size <= 0:
+            parser.error("--lease-size debe ser un número positivo.")
+        if args.lease_timeout <= 0:
+            parser.error("--lease-timeout debe ser un número positivo.")
+        if distributed:
+            incompatible = [name for name, value in (("--bloom", args.bloom), ("--combine", args.combine is not None),
+                                                     ("--keywords-file", args.keywords_file is not None),
+                                                     ("--probability", args.probability),
+                                                     ("--stdout", args.stdout or args.output == "-"),
+                                                     ("--interactive", args.interactive)) if value]
+            if args.shard is None:
+                incompatible += [name for name, value in (("--checkpoint", args.checkpoint), ("--resume", args.resume),
+                                                          ("--keep-shards", args.keep_shards),
+                                                          ("--deduplicate", args.deduplicate)) if value]
+            if incompatible:
+                parser.error(f"{distributed[0]} no es compatible con {', '.join(incompatible)}.")
+
+        if args.preallocate:
+            incompatible = [name for name, value in (("--compress", args.compress is not None), ("--bloom", args.bloom),
+                                                     ("--keep-shards", args.keep_shards), ("--checkpoint", args.checkpoint),
+                                                     ("--resume", args.resume), ("--probability", args.probability),
+                                                     ("--stdout", args.stdout or args.output == "-"),
+                                                     ("--coordinator", args.coordinator is not None),
+                                                     ("--connect", args.connect is not None),
+                                                     ("--interactive", args.interactive)) if value]
+            if incompatible:
+                parser.error(f"--preallocate no es compatible con {', '.join(incompatible)}.")
+
+        if args.engine == "numpy" and not numpy_available():
+            parser.error("--engine numpy requiere tener NumPy instalado (pip install numpy).")
+
+        args.stdout = args.stdout or args.output == "-"
+        if args.stdout:
+            incompatible = [name for name, value in (("--interactive", args.interactive), ("--deduplicate", args.deduplicate),
+                                                     ("--compress", args.compress is not None),
+                                                     ("--combine", args.combine is not None),
+                                                     ("--keep-shards", args.keep_shards), ("--checkpoint", args.checkpoint),
+                                                     ("--resume", args.resume)) if value]
+            if incompatible:
+                parser.error(f"--stdout no es compatible con {', '.join(incompatible)}.")
+        else:
+            args.output = compressed_path(args.output, args.compress)
+
         return parser, args
     except SystemExit as e:
         if e.code != 0:
             print("Error al procesar los argumentos de línea de comandos.")
         sys.exit(e.code)
 
-def deduplicate_file_auto(input_filepath):
+def deduplicate_file_auto(input_filepath, memory_budget=DEFAULT_DEDUP_MEMORY, num_processes=None, buckets=0):
     """
-    Elimina duplicados del archivo generado, detectando el SO.
+    Elimina duplicados del archivo generado con el motor integrado de ordenación externa,
+    con un uso de memoria acotado y el mismo resultado en cualquier sistema operativo.
+    Un archivo comprimido se lee tal cual y el resultado se comprime en el mismo formato.
+    Devuelve las estadísticas de la deduplicación, o None si falló.
     """
-    output_filepath = f"{os.path.splitext(input_filepath)[0]}_unique{os.path.splitext(input_filepath)[1]}"
+    base, compressed_suffix = split_suffix(input_filepath)
+    output_filepath = f"{os.path.splitext(base)[0]}_unique{os.path.splitext(base)[1]}{compressed_suffix}"
+    compression = detect_compression(input_filepath) if os.path.exists(input_filepath) else None
     
     tqdm.write(f"\nIniciando deduplicación automática de '{input_filepath}' a '{output_filepath}'...")
-    _print_verbose(f"Detectando sistema operativo para deduplicación...")
+    _print_verbose(f"Presupuesto de memoria: {memory_budget} bytes. Procesos: {num_processes or os.cpu_count() or 1}. Cubos: {buckets or 'ninguno (orden global)'}.")
 
-    if sys.platform.startswith('linux') or sys.platform == 'darwin' or sys.platform == 'cygwin':
-        # Linux, macOS, WSL, Git Bash
-        command = f"sort -u \"{input_filepath}\" > \"{output_filepath}\""
-        _print_verbose(f"Ejecutando comando: {command}")
-        try:
-            os.system(command)
-            tqdm.write(f"Deduplicación completada con 'sort -u'. Archivo único guardado en '{output_filepath}'.")
-        except Exception as e:
-            tqdm.write(f"Error al ejecutar 'sort -u': {e}. Por favor, hazlo manualmente.")
-            tqdm.write(f"Comando sugerido: sort -u \"{input_filepath}\" > \"{output_filepath}\"")
-    elif sys.platform == 'win32':
-        # Windows
-        command = f"powershell -command \"Get-Content \\\"{input_filepath}\\\" | Sort-Object -Unique | Set-Content \\\"{output_filepath}\\\"\""
-        _print_verbose(f"Ejecutando comando PowerShell: {command}")
-        try:
-            os.system(command)
-            tqdm.write(f"Deduplicación completada con PowerShell. Archivo único guardado en '{output_filepath}'.")
-        except Exception as e:
-            tqdm.write(f"Error al ejecutar PowerShell: {e}. Por favor, hazlo manualmente.")
-            tqdm.write(f"Comando sugerido en PowerShell: Get-Content '{input_filepath}' | Sort-Object -Unique | Set-Content '{output_filepath}'")
-    else:
-        tqdm.write("Sistema operativo no soportado para deduplicación automática. Por favor, hazlo manualmente.")
+    try:
+        stats = external_sort_unique(input_filepath, output_filepath, memory_budget=memory_budget,
+                                     num_processes=num_processes, buckets=buckets, compression=compression)
+    except (OSError, ValueError) as e:
+        tqdm.write(f"Error durante la deduplicación: {e}. Por favor, hazlo manualmente.")
         tqdm.write(f"Para Linux/macOS: sort -u \"{input_filepath}\" > \"{output_filepath}\"")
         tqdm.write(f"Para Windows (PowerShell): Get-Content '{input_filepath}' | Sort-Object -Unique | Set-Content '{output_filepath}'")
+        return None
+
+    tqdm.write(f"Deduplicación completada: {stats['lines']} líneas leídas, {stats['unique']} únicas, "
+               f"{stats['duplicates']} duplicados eliminados. Archivo único guardado en '{output_filepath}'.")
+    return stats
 
 def run_interactive_mode(generator, global_args):
     """
@@ -166,6 +588,7 @@ def run_interactive_mode(generator, global_args):
         return
     if initial_output_file:
         generator.output_file = initial_output_file
+    generator.output_file = compressed_path(generator.output_file, global_args.compress)
 
     output_dir = os.path.dirname(generator.output_file)
     if output_dir and not os.path.exists(output_dir):
@@ -194,7 +617,12 @@ def run_interactive_mode(generator, global_args):
             # Crear un namespace temporal para esta palabra clave con sus settings
             current_keyword_settings = argparse.Namespace(
                 numbers=False, digits=0, years_range=None,
-                special_chars=None, case_mix=False, limit=None
+                special_chars=None, case_mix=False, limit=None,
+                canonical=global_args.canonical,
+                rules=global_args.rules,
+                leet=global_args.leet,
+                leet_max=global_args.leet_max,
+                policy=global_args.policy
             )
 
             add_numbers_choice = get_interactive_input("¿Deseas añadir números a esta palabra clave? (y/N): ",
@@ -251,13 +679,23 @@ def run_interactive_mode(generator, global_args):
                 else:
                     _print_verbose(f"  Caracteres especiales configurados: {', '.join(current_keyword_settings.special_chars)}")
             
-            add_case_mix_choice = get_interactive_input("¿Deseas generar combinaciones de mayúsculas/minúsculas (ej. 'Palabra' -> 'pAlAbRa')? (y/N): ",
-                                                        lambda x: x.lower() in ['y', 'n'],
-                                                        "Por favor, ingresa 'y' o 'n'. ").lower() == 'y'
+            # Las reglas (--rules) sustituyen a las variaciones básicas y no se combinan con la mezcla de mayúsculas
+            add_case_mix_choice = not global_args.rules and get_interactive_input(
+                "¿Deseas generar combinaciones de mayúsculas/minúsculas (ej. 'Palabra' -> 'pAlAbRa')? (y/N): ",
+                lambda x: x.lower() in ['y', 'n'],
+                "Por favor, ingresa 'y' o 'n'. ").lower() == 'y'
             current_keyword_settings.case_mix = add_case_mix_choice
             if add_case_mix_choice:
                 _print_verbose("  Mezcla de mayúsculas/minúsculas activada.")
 
+            if not current_keyword_settings.canonical:
+                canonical_choice = get_interactive_input("¿Deseas omitir las variaciones repetidas (modo canónico, menos duplicados por palabra)? (y/N): ",
+                                                         lambda x: x.lower() in ['y', 'n'],
+                                                         "Por favor, ingresa 'y' o 'n'. ").lower() == 'y'
+                current_keyword_settings.canonical = canonical_choice
+                if canonical_choice:
+                    _print_verbose("  Modo canónico activado.")
+
             limit_count = None
             limit_keys_choice = get_interactive_input("¿Deseas limitar el número de claves generadas para esta palabra? (y/N): ",
                                                       lambda x: x.lower() in ['y', 'n'],
@@ -290,18 +728,25 @@ def run_interactive_mode(generator, global_args):
             generator.generate_dictionary_parallel(
                 keywords_data=keywords_for_parallel_processing,
                 output_filepath=generator.output_file,
-                num_processes=global_args.processes
+                num_processes=global_args.processes,
+                buffer_size=global_args.buffer_size,
+                flush_every=global_args.flush_every,
+                bloom_fp_rate=global_args.bloom_fp if global_args.bloom else None,
+                bloom_memory=global_args.bloom_memory,
+                engine=global_args.engine,
+                compression=global_args.compress
             )
             tqdm.write("\nNota: El archivo generado puede contener duplicados. La deduplicación se realiza después de la generación.")
 
             tqdm.write("\n--- Deduplicación del Diccionario ---")
-            tqdm.write("ADVERTENCIA: Si el archivo generado es MUY GRANDE, la deduplicación puede consumir una cantidad SIGNIFICATIVA de RAM y CPU, y tomar mucho tiempo.")
-            tqdm.write("En sistemas con recursos limitados, esta operación podría incluso ralentizar o colapsar el sistema.")
+            tqdm.write(f"La deduplicación usa como mucho ~{global_args.dedup_memory // (1024 * 1024)} MiB de RAM (--dedup-memory), pero en archivos MUY GRANDES")
+            tqdm.write("necesita espacio temporal en disco similar al tamaño del archivo y puede tardar bastante.")
             deduplicate_choice = get_interactive_input("¿Deseas eliminar los duplicados automáticamente ahora? (y/N): ",
                                                        lambda x: x.lower() in ['y', 'n'],
                                                        "Por favor, ingresa 'y' o 'n'. ").lower() == 'y'
             if deduplicate_choice:
-                deduplicate_file_auto(generator.output_file)
+                deduplicate_file_auto(generator.output_file, memory_budget=global_args.dedup_memory,
+                                      num_processes=global_args.processes, buckets=global_args.dedup_buckets)
             else:
                 tqdm.write("Deduplicación omitida. Puedes hacerlo manualmente más tarde si lo deseas.")
                 tqdm.write(f"Para Linux/macOS: sort -u \"{generator.output_file}\" > \"{os.path.splitext(generator.output_file)[0]}_unique{os.path.splitext(generator.output_file)[1]}\"")
@@ -0,0 +1,328 @@
+import os
+import tempfile
+import time
+from tqdm import tqdm
+from contenido import keyword_args_dict, _print_verbose, MIN_CANDIDATES_PER_PART
+from indice import CandidateIndex
+from afijos import build_affix_tables
+from combinador import combination_groups
+from lista_palabras import iter_keywords_file
+from escritor import DEFAULT_BUFFER_SIZE, ShardWriter, concatenate_shards
+from compresion import compress_member
+from reparto import keyword_ranges
+
+# Duración por defecto de la ejecución de calibración para estimar la velocidad
+CALIBRATION_SECONDS = 0.5
+# Hasta cuántas variaciones base se cuentan los duplicados de forma exacta
+EXACT_DUPLICATES_MAX_BASES = 1 << 16
+# Bytes de candidatos que se comprimen para estimar el tamaño en disco sin calibración
+COMPRESSION_SAMPLE_BYTES = 1024 * 1024
+
+def format_size(num_bytes):
+    """Convierte un número de bytes a un texto legible (ej. 4.0 GiB)."""
+    size = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB", "PiB"):
+        if size < 1024 or unit == "PiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_duration(seconds):
+    """Convierte segundos a un texto legible (ej. 2h 05m 10s)."""
+    if seconds is None:
+        return "desconocido"
+    seconds = int(round(seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d {hours:02d}h {minutes:02d}m"
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+def estimate_duplicates(index, accepted=None):
+    """
+    Devuelve los duplicados esperados por variaciones base que coinciden entre sí
+    (ej. 'admin' y 'admin'.lower(), o máscaras que solo cambian dígitos o símbolos).
+    Es exacto con reglas y hasta EXACT_DUPLICATES_MAX_BASES máscaras de mayúsculas; a partir
+    de ahí se estima con la proporción de máscaras que afectan a caracteres sin mayúscula/minúscula.
+    Con política de claves solo cuentan las claves que la cumplen (accepted, si ya se conoce).
+    """
+    if index.count == 0:
+        return 0
+    bases_used = -(-index.count // index.per_base)
+    if bases_used <= EXACT_DUPLICATES_MAX_BASES or not index.case_mix:
+        seen = set()
+        duplicates = 0
+        for base_index in range(bases_used):
+            base = index.base(base_index)
+            if base in seen:
+                start = base_index * index.per_base
+                if index.policy is None:
+                    duplicates += min(index.count, start + index.per_base) - start
+                else:
+                    duplicates += index.accepted_size(start, start + index.per_base)[0]
+            else:
+                seen.add(base)
+        return duplicates
+    cased = sum(1 for char in index.keyword if char.upper() != char.lower())
+    distinct_fraction = 2.0 ** (cased - len(index.case_positions))
+    if accepted is None:
+        accepted = index.accepted_size()[0]
+    return round(accepted * (1 - distinct_fraction))
+
+def calibrate(index, seconds=CALIBRATION_SECONDS, directory=None, compression=None,
+              buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Genera bloques de candidatos de la palabra clave durante unos instantes y los escribe
+    con el mismo escritor que los procesos (compresión incluida) en un fragmento temporal
+    dentro de 'directory', que después se copia como en la concatenación final.
+    Devuelve (claves/s de un proceso, bytes en disco por byte generado, bytes/s de la
+    copia), o None si no se generó nada.
+    """
+    with tempfile.TemporaryDirectory(prefix=".dictgen-calibracion-", dir=directory) as sink:
+        shard = os.path.join(sink, "shard.txt")
+        generated = generated_bytes = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        with ShardWriter(shard, buffer_size=buffer_size, compression=compression) as writer:
+            for block, block_count in index.iter_blocks():
+                writer.write_block(block, block_count)
+                generated += block_count
+                generated_bytes += len(block)
+                if time.perf_counter() >= deadline:
+                    break
+        elapsed = time.perf_counter() - start
+        if generated == 0 or generated_bytes == 0 or elapsed <= 0:
+            return None
+        disk_bytes = os.path.getsize(shard)
+        start = time.perf_counter()
+        concatenate_shards([shard], os.path.join(sink, "output.txt"), compressed=compression is not None)
+        copy_elapsed = time.perf_counter() - start
+    copy_rate = disk_bytes / copy_elapsed if copy_elapsed > 0 else None
+    return generated / elapsed, disk_bytes / generated_bytes, copy_rate
+
+def estimate_compression_ratio(index, compression, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Comprime los primeros candidatos de la palabra clave como lo hace el escritor (un miembro
+    por búfer, hasta COMPRESSION_SAMPLE_BYTES) y devuelve los bytes en disco por byte generado.
+    """
+    sample = bytearray()
+    for block, _ in index.iter_blocks():
+        sample += block
+        if len(sample) >= COMPRESSION_SAMPLE_BYTES:
+            break
+    if not sample:
+        return 1.0
+    step = min(buffer_size, COMPRESSION_SAMPLE_BYTES)
+    disk_bytes = sum(len(compress_member(bytes(sample[start:start + step]), compression))
+                     for start in range(0, len(sample), step))
+    return disk_bytes / len(sample)
+
+def plan_generation(keywords_data, num_processes=None, calibration_seconds=CALIBRATION_SECONDS, engine="auto",
+                    combine=None, keywords_file=None, keywords_file_args=None, output_dir=None, compression=None,
+                    buffer_size=DEFAULT_BUFFER_SIZE, concatenate=True, candidate_range=None, budget=None):
+    """
+    Calcula, sin generar nada, el número exacto de candidatos (límite incluido), el tamaño
+    exacto del archivo de salida y los duplicados esperados de cada palabra clave y del total.
+    Con candidate_range (--shard) solo cuenta las claves de ese rango global; con budget
+    (--probability --budget) el total se recorta al presupuesto y los bytes y duplicados se
+    escalan en proporción. 'disk_bytes' es el tamaño en disco: igual a 'bytes' sin compression
+    y, con ella, estimado con el ratio de la calibración o de una muestra comprimida.
+    Con política de claves, los candidatos y bytes son los que la cumplen y 'pruned' cuenta
+    los descartados; el tiempo estimado recorre todas las posiciones ('scanned').
+    Si calibration_seconds > 0, estima además el tiempo de generación con una ejecución corta
+    que escribe de verdad (en output_dir, con compression y buffer_size) y, con concatenate,
+    suma la copia final de los fragmentos. Los procesos útiles no superan los núcleos de la CPU.
+    combine (max_words, separators, permute) añade al plan la etapa de combinación.
+    keywords_file añade las palabras de una lista (con las opciones de keywords_file_args),
+    recorrida en streaming: en el plan aparecen como una sola entrada con sus totales.
+    Devuelve un diccionario con el plan.
+    """
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+
+    plan = {'keywords': [], 'combinations': [], 'candidates': 0, 'bytes': 0, 'duplicates': 0, 'pruned': 0,
+            'scanned': 0, 'processes': num_processes, 'effective_processes': None, 'rate': None,
+            'eta': None, 'concatenate_eta': None, 'disk_bytes': None, 'compression': compression, 'budget': None}
+    ranges = None
+    if candidate_range is not None:
+        keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+        ranges = {keyword_index: (start, stop)
+                  for keyword_index, start, stop in keyword_ranges(keywords_settings, *candidate_range)}
+    largest_index = None
+    for keyword_index, item in enumerate(keywords_data):
+        if ranges is not None and keyword_index not in ranges:
+            continue
+        index = CandidateIndex(item['keyword'], keyword_args_dict(item['args']))
+        start, stop = ranges[keyword_index] if ranges is not None else (0, index.count)
+        accepted, accepted_bytes = index.accepted_size(start, stop)
+        if stop - start == index.count:
+            duplicates = estimate_duplicates(index, accepted)
+        else:
+            # En una porción, los duplicados de la palabra se reparten en proporción a su rango
+            duplicates = round(estimate_duplicates(index) * (stop - start) / index.count)
+        entry = {
+            'keyword': item['keyword'],
+            'candidates': accepted,
+            'bytes': accepted_bytes,
+            'duplicates': duplicates,
+            'pruned': (stop - start) - accepted,
+            'limited': index.limited
+        }
+        plan['keywords'].append(entry)
+        plan['candidates'] += entry['candidates']
+        plan['bytes'] += entry['bytes']
+        plan['duplicates'] += entry['duplicates']
+        plan['pruned'] += entry['pruned']
+        plan['scanned'] += stop - start
+        if largest_index is None or index.count > largest_index.count:
+            largest_index = index
+
+    if keywords_file is not None:
+        args_dict = keyword_args_dict(keywords_file_args)
+        entry = {'keyword': keywords_file, 'words': 0, 'candidates': 0, 'bytes': 0, 'duplicates': 0, 'pruned': 0,
+                 'limited': False}
+        for word in iter_keywords_file(keywords_file):
+            try:
+                index = CandidateIndex(word, args_dict)
+            except ValueError:
+                continue
+            accepted, accepted_bytes = index.accepted_size()
+            entry['words'] += 1
+            entry['candidates'] += accepted
+            entry['bytes'] += accepted_bytes
+            entry['duplicates'] += estimate_duplicates(index, accepted)
+            entry['pruned'] += index.count - accepted
+            plan['scanned'] += index.count
+            entry['limited'] = entry['limited'] or index.limited
+            if largest_index is None or index.count > largest_index.count:
+                largest_index = index
+        plan['keywords_file'] = entry
+        plan['candidates'] += entry['candidates']
+        plan['bytes'] += entry['bytes']
+        plan['duplicates'] += entry['duplicates']
+        plan['pruned'] += entry['pruned']
+
+    if combine is not None:
+        keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+        for group in combination_groups(keywords_settings, combine['max_words'], combine['separators'], combine['permute']):
+            # Una combinación repite claves si alguna de sus palabras repite variaciones
+            distinct = 1.0
+            for member in group['members']:
+                entry = plan['keywords'][member]
+                if entry['candidates']:
+                    distinct *= 1 - entry['duplicates'] / entry['candidates']
+            entry = {
+                'keywords': [keywords_settings[member][0] for member in group['members']],
+                'separator': group['separator'],
+                'candidates': group['count'],
+                'bytes': group['bytes'],
+                'duplicates': round(group['count'] * (1 - distinct))
+            }
+            plan['combinations'].append(entry)
+            plan['candidates'] += entry['candidates']
+            plan['bytes'] += entry['bytes']
+            plan['duplicates'] += entry['duplicates']
+            plan['scanned'] += entry['candidates']
+
+    # --budget detiene la generación por probabilidad tras las N claves más probables en total
+    if budget is not None and budget < plan['candidates']:
+        fraction = budget / plan['candidates']
+        plan['budget'] = budget
+        plan['bytes'] = round(plan['bytes'] * fraction)
+        plan['duplicates'] = round(plan['duplicates'] * fraction)
+        plan['scanned'] = round(plan['scanned'] * fraction)
+        plan['candidates'] = budget
+
+    plan['disk_bytes'] = plan['bytes']
+    disk_ratio = None
+    if calibration_seconds and largest_index is not None and largest_index.count:
+        _print_verbose(f"Calibrando velocidad con '{largest_index.keyword}' durante {calibration_seconds}s.")
+        build_affix_tables([largest_index], engine)
+        # El directorio de salida aún puede no existir: entonces se escribe en el temporal del sistema
+        if output_dir is not None and not os.path.isdir(output_dir):
+            output_dir = None
+        calibration = calibrate(largest_index, calibration_seconds, output_dir, compression, buffer_size)
+        if calibration is not None:
+            plan['rate'], disk_ratio, copy_rate = calibration
+            # Las palabras grandes se reparten entre procesos; las pequeñas no llenan todos los núcleos,
+            # y más procesos que núcleos no generan más deprisa
+            effective = min(num_processes, os.cpu_count() or 1, max(1, plan['scanned'] // MIN_CANDIDATES_PER_PART))
+            plan['effective_processes'] = effective
+            plan['eta'] = plan['scanned'] / (plan['rate'] * effective)
+            if concatenate and copy_rate:
+                # La concatenación copia los fragmentos (ya comprimidos) en un solo proceso
+                plan['concatenate_eta'] = plan['bytes'] * disk_ratio / copy_rate
+                plan['eta'] += plan['concatenate_eta']
+    if compression is not None and largest_index is not None:
+        if disk_ratio is None:
+            disk_ratio = estimate_compression_ratio(largest_index, compression, buffer_size)
+        plan['disk_bytes'] = round(plan['bytes'] * disk_ratio)
+    return plan
+
+def print_plan(plan):
+    """Muestra el plan de generación por palabra clave y en total."""
+    tqdm.write("\n--- Plan de generación (no se ha escrito nada) ---")
+    for entry in plan['keywords']:
+        limited = " (recortado por --limit)" if entry['limited'] else ""
+        pruned = f", {entry['pruned']:,} descartadas por la política" if entry['pruned'] else ""
+        tqdm.write(f"  '{entry['keyword']}': {entry['candidates']:,} claves{limited}, "
+                   f"{format_size(entry['bytes'])} ({entry['bytes']:,} bytes), "
+                   f"~{entry['duplicates']:,} duplicados{pruned}")
+    entry = plan.get('keywords_file')
+    if entry is not None:
+        limited = " (recortado por --limit)" if entry['limited'] else ""
+        pruned = f", {entry['pruned']:,} descartadas por la política" if entry['pruned'] else ""
+        tqdm.write(f"  Lista '{entry['keyword']}' ({entry['words']:,} palabras): {entry['candidates']:,} claves{limited}, "
+                   f"{format_size(entry['bytes'])} ({entry['bytes']:,} bytes), "
+                   f"~{entry['duplicates']:,} duplicados{pruned}")
+    if plan['combinations']:
+        combined = sum(entry['candidates'] for entry in plan['combinations'])
+        combined_bytes = sum(entry['bytes'] for entry in plan['combinations'])
+        tqdm.write(f"  Combinaciones ({len(plan['combinations'])}): {combined:,} claves, "
+                   f"{format_size(combined_bytes)} ({combined_bytes:,} bytes)")
+        for entry in plan['combinations']:
+            _print_verbose(f"'{entry['separator']}'.join({entry['keywords']}): {entry['candidates']:,} claves, {entry['bytes']:,} bytes")
+    tqdm.write(f"Total: {plan['candidates']:,} claves, {format_size(plan['bytes'])} ({plan['bytes']:,} bytes), "
+               f"~{plan['duplicates']:,} duplicados ({plan['candidates'] - plan['duplicates']:,} únicas).")
+    if plan['budget'] is not None:
+        tqdm.write(f"  Recortado por --budget a las {plan['budget']:,} claves más probables "
+                   f"(bytes y duplicados estimados en proporción).")
+    if plan['compression'] is not None:
+        tqdm.write(f"En disco con {plan['compression']}: ~{format_size(plan['disk_bytes'])} "
+                   f"(estimado con una muestra comprimida).")
+    if plan['pruned']:
+        tqdm.write(f"Política de claves: {plan['pruned']:,} candidatos se descartan antes de generarse "
+                   f"({plan['pruned'] / plan['scanned']:.1%} del espacio recorrido).")
+    if plan['rate']:
+        capped = (f" (limitado a {plan['effective_processes']} por los núcleos o el tamaño)"
+                  if plan['effective_processes'] < plan['processes'] else "")
+        tqdm.write(f"Velocidad calibrada: {plan['rate']:,.0f} claves/s por proceso, generando y escribiendo. "
+                   f"Tiempo estimado con {plan['processes']} procesos{capped}: {format_duration(plan['eta'])}.")
+        if plan['concatenate_eta'] is not None:
+            tqdm.write(f"  Incluye {format_duration(plan['concatenate_eta'])} de concatenación de los fragmentos.")
+
+def check_plan_thresholds(plan, warn_size=None, max_size=None, max_candidates=None):
+    """
+    Compara el plan con los umbrales configurados. Avisa si se supera warn_size y
+    devuelve False si se supera max_size o max_candidates (la generación debe rechazarse).
+    Los tamaños se comparan con lo que ocupará en disco ('disk_bytes'): con compresión,
+    el tamaño comprimido estimado.
+    """
+    allowed = True
+    compressed = " comprimido" if plan['compression'] is not None else ""
+    if warn_size is not None and plan['disk_bytes'] > warn_size:
+        tqdm.write(f"Advertencia: el diccionario ocupará {format_size(plan['disk_bytes'])}{compressed}, "
+                   f"por encima del umbral de aviso ({format_size(warn_size)}).")
+    if max_size is not None and plan['disk_bytes'] > max_size:
+        tqdm.write(f"Error: el diccionario ocuparía {format_size(plan['disk_bytes'])}{compressed}, "
+                   f"por encima del máximo permitido ({format_size(max_size)}).")
+        allowed = False
+    if max_candidates is not None and plan['candidates'] > max_candidates:
+        tqdm.write(f"Error: se generarían {plan['candidates']:,} claves, "
+                   f"por encima del máximo permitido ({max_candidates:,}).")
+        allowed = False
+    return allowed
@@ -0,0 +1,131 @@
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+# Clases de caracteres que puede exigir una política de claves (máscara de bits)
+DIGIT = 1
+UPPER = 2
+SYMBOL = 4
+
+def char_classes(text):
+    """Clases de caracteres presentes en el texto (DIGIT, UPPER y SYMBOL combinados)."""
+    classes = 0
+    for char in text:
+        if char.isdigit():
+            classes |= DIGIT
+        elif char.isupper():
+            classes |= UPPER
+        elif not char.isalnum():
+            classes |= SYMBOL
+    return classes
+
+def parse_charset(text):
+    """
+    Expande un juego de caracteres con rangos: 'a-zA-Z0-9!@' -> {'a', ..., 'z', 'A', ..., '@'}.
+    Un guion al principio o al final se toma literalmente. Lanza ValueError si está vacío
+    o si un rango está invertido.
+    """
+    chars = set()
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if position + 2 < len(text) and text[position + 1] == "-":
+            last = text[position + 2]
+            if ord(last) < ord(char):
+                raise ValueError(f"Rango inválido '{char}-{last}' en el juego de caracteres.")
+            chars.update(chr(code) for code in range(ord(char), ord(last) + 1))
+            position += 3
+        else:
+            chars.add(char)
+            position += 1
+    if not chars:
+        raise ValueError("El juego de caracteres no puede estar vacío.")
+    return chars
+
+@dataclass(frozen=True)
+class Piece:
+    """
+    Resumen de un trozo de una clave (palabra base, número, '_' o carácter especial): longitud
+    en caracteres y en bytes UTF-8, clases de caracteres y si todos están en el juego permitido.
+    Una clave se forma concatenando trozos, así que su resumen se obtiene sin construirla.
+    """
+    length: int
+    size: int
+    classes: int
+    allowed: bool
+
+    def __add__(self, other):
+        return Piece(self.length + other.length, self.size + other.size,
+                     self.classes | other.classes, self.allowed and other.allowed)
+
+@dataclass
+class CandidatePolicy:
+    """
+    Política de claves de un objetivo (--min-length, --max-length, --require-*, --charset).
+    accepts() comprueba una clave ya generada (camino escalar); el índice de candidatos usa
+    piece() y accepts_piece() para descartar ramas enteras antes de generarlas.
+    charset es el texto del juego de caracteres (con rangos, ver parse_charset) o None.
+    """
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    require_digit: bool = False
+    require_upper: bool = False
+    require_symbol: bool = False
+    charset: Optional[str] = None
+
+    def __post_init__(self):
+        if self.min_length is not None and self.min_length <= 0:
+            raise ValueError("La longitud mínima debe ser un número positivo.")
+        if self.max_length is not None and self.max_length <= 0:
+            raise ValueError("La longitud máxima debe ser un número positivo.")
+        if self.min_length is not None and self.max_length is not None and self.min_length > self.max_length:
+            raise ValueError("La longitud mínima no puede ser mayor que la máxima.")
+        self.required = ((DIGIT if self.require_digit else 0) | (UPPER if self.require_upper else 0)
+                         | (SYMBOL if self.require_symbol else 0))
+        self.allowed_chars = parse_charset(self.charset) if self.charset is not None else None
+
+    @property
+    def active(self):
+        """Indica si la política descarta algo."""
+        return (self.min_length is not None or self.max_length is not None or self.required
+                or self.allowed_chars is not None)
+
+    def allows(self, text):
+        """Indica si todos los caracteres del texto están en el juego permitido."""
+        return self.allowed_chars is None or all(char in self.allowed_chars for char in text)
+
+    def piece(self, text):
+        """Resumen (Piece) de un trozo de clave."""
+        return Piece(len(text), len(text.encode("utf-8")), char_classes(text), self.allows(text))
+
+    def accepts_piece(self, piece):
+        """Indica si una clave con ese resumen cumple la política."""
+        return (piece.allowed and piece.classes & self.required == self.required
+                and (self.min_length is None or piece.length >= self.min_length)
+                and (self.max_length is None or piece.length <= self.max_length))
+
+    def accepts(self, candidate):
+        """Indica si una clave (str) cumple la política."""
+        length = len(candidate)
+        if (self.min_length is not None and length < self.min_length) or (
+                self.max_length is not None and length > self.max_length):
+            return False
+        if self.required and char_classes(candidate) & self.required != self.required:
+            return False
+        return self.allows(candidate)
+
+    def as_dict(self):
+        """Opciones de la política como diccionario (se envía a los procesos y al punto de control)."""
+        return asdict(self)
+
+    def describe(self):
+        """Descripción legible de la política para los mensajes."""
+        rules = []
+        if self.min_length is not None or self.max_length is not None:
+            rules.append(f"longitud {self.min_length or 1}-{self.max_length if self.max_length is not None else '∞'}")
+        for flag, name in ((self.require_digit, "dígito"), (self.require_upper, "mayúscula"),
+                           (self.require_symbol, "símbolo")):
+            if flag:
+                rules.append(f"con {name}")
+        if self.charset is not None:
+            rules.append(f"caracteres [{self.charset}]")
+        return ", ".join(rules)
@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import sys
+import time
+from tqdm import tqdm
+from contenido import _print_verbose, _discard_stream, keyword_args_dict
+from indice import CandidateIndex, NUMBER_TEMPLATES, SPECIAL_TEMPLATES
+from compresion import open_compressed
+
+# Costes (menor = más probable) de cada componente de un candidato; el coste total es la suma.
+# Plantillas numéricas: palabra+num, num+palabra, palabra_num, num_palabra, palabra+num+palabra
+NUMBER_TEMPLATE_COSTS = (0.0, 1.0, 0.7, 1.5, 3.0)
+# Plantillas especiales: palabra+car, car+palabra, palabra+car+palabra
+SPECIAL_TEMPLATE_COSTS = (0.0, 1.0, 3.0)
+# Caracteres especiales más habituales como sufijo, de más a menos frecuente
+COMMON_SPECIALS = ("!", "@", "#", "$", ".", "*", "?", "_", "-", "&", "%", "+", "=")
+# Coste de un carácter especial; cada puesto en COMMON_SPECIALS añade CHAR_RANK_COST
+SPECIAL_COST, CHAR_RANK_COST = 1.0, 0.2
+# Variaciones base: capitalizada, minúsculas, mayúsculas y luego por número de cambios
+CAPITALIZED_COST, LOWER_COST, UPPER_COST, FLIP_COST = 0.0, 0.3, 1.0, 1.0
+# Cada carácter distinto de la palabra clave (leet, reglas) respecto a la minúscula
+SUBSTITUTION_COST = 1.5
+# Años: los recientes primero; los futuros detrás de todos los pasados cercanos
+YEAR_COST, YEAR_AGE_COST, FUTURE_YEAR_COST = 0.5, 0.05, 2.0
+# Dígitos: la secuencia desde 1 (123), otras secuencias y repetidos (000) antes que el resto,
+# que va en orden natural
+FIRST_SEQUENCE_COST, SEQUENCE_COST, REPEATED_COST, REVERSED_COST, OTHER_DIGITS_COST = 0.6, 0.8, 1.0, 1.2, 3.0
+# Variaciones base que se ordenan en memoria; por encima solo se admite la mezcla de mayúsculas
+MAX_SORTED_BASES = 1 << 18
+
+def base_cost(word, keyword):
+    """Coste de una variación base: forma de las mayúsculas y caracteres cambiados."""
+    cased = [position for position, char in enumerate(word) if char.upper() != char.lower()]
+    upper = {position for position in cased if word[position] != word[position].lower()}
+    if not upper:
+        cost = LOWER_COST
+    elif upper == {0}:
+        cost = CAPITALIZED_COST
+    elif len(upper) == len(cased):
+        cost = UPPER_COST
+    else:
+        cost = FLIP_COST + min(len(upper), len(upper ^ {0}))
+    lower, reference = word.lower(), keyword.lower()
+    if lower != reference:
+        if len(lower) == len(reference):
+            changed = sum(1 for a, b in zip(lower, reference) if a != b)
+        else:
+            changed = abs(len(lower) - len(reference)) + 1
+        cost += SUBSTITUTION_COST * changed
+    return cost
+
+def _case_mix_bases(index):
+    """
+    Máscaras de mayúsculas en orden de coste sin ordenarlas todas (palabras muy largas):
+    capitalizada, minúsculas, mayúsculas y luego por distancia a minúsculas o capitalizada.
+    """
+    positions = len(index.case_positions)
+    last = positions - 1
+    first_bit = 1 << last if positions and index.case_positions[0] == 0 else 0
+    full = (1 << positions) - 1
+    special = [(CAPITALIZED_COST, first_bit), (LOWER_COST, 0), (UPPER_COST, full)] if first_bit else \
+              [(LOWER_COST, 0), (UPPER_COST, full)]
+    seen = set()
+    for cost, mask in sorted(special):
+        if mask not in seen:
+            seen.add(mask)
+            yield cost, mask
+    # Cada máscara sale una sola vez: su distancia a minúsculas y a capitalizada tiene distinta paridad
+    references = (0, first_bit) if first_bit else (0,)
+    for flips in range(1, positions + 1):
+        for reference in references:
+            for bits in itertools.combinations(range(positions), flips):
+                mask = reference ^ sum(1 << (last - bit) for bit in bits)
+                if mask in seen:
+                    continue
+                if first_bit and min(bin(mask).count("1"), bin(mask ^ first_bit).count("1")) != flips:
+                    continue
+                yield FLIP_COST + flips, mask
+
+def _base_stream(index):
+    """
+    Variaciones base de la palabra clave como (coste, índice), de menor a mayor coste.
+    Las repetidas (ej. la original y la minúscula) aparecen una sola vez: con un presupuesto
+    de claves no tiene sentido gastarlo en duplicados.
+    """
+    if index.base_count <= MAX_SORTED_BASES:
+        words = {}
+        for base_index in range(index.base_count):
+            words.setdefault(index.base(base_index), base_index)
+        return iter(sorted((base_cost(word, index.keyword), base_index) for word, base_index in words.items()))
+    if index.case_mix and index._spaces is None:
+        return _case_mix_bases(index)
+    raise ValueError(f"'{index.keyword}' tiene demasiadas variaciones base ({index.base_count:,}) "
+                     f"para ordenarlas por probabilidad; reduce --leet-max o las reglas.")
+
+def _number_costs(index):
+    """Números como (coste, índice del número), de menor a mayor coste."""
+    if index.number_count == 0:
+        return iter(())
+    if index.years_start is not None:
+        current_year = time.localtime().tm_year
+        return iter(sorted(
+            (YEAR_COST + YEAR_AGE_COST * (current_year - year) if year <= current_year
+             else FUTURE_YEAR_COST + YEAR_AGE_COST * (year - current_year), year - index.years_start)
+            for year in range(index.years_start, index.years_start + index.number_count)
+        ))
+    return _digit_costs(index.num_digits)
+
+def _digit_costs(num_digits):
+    """Dígitos: primero secuencias y repetidos, luego años recientes (4 cifras) y el resto en orden."""
+    preferred = {}
+    if num_digits <= 9:
+        preferred[int("123456789"[:num_digits])] = FIRST_SEQUENCE_COST
+    for start in range(10 - num_digits + 1):
+        preferred.setdefault(int("0123456789"[start:start + num_digits]), SEQUENCE_COST)
+        preferred.setdefault(int("9876543210"[start:start + num_digits]), REVERSED_COST)
+    for digit in range(10):
+        preferred.setdefault(int(str(digit) * num_digits), REPEATED_COST)
+    if num_digits == 4:
+        current_year = time.localtime().tm_year
+        for year in range(current_year, current_year - 80, -1):
+            preferred.setdefault(year, YEAR_COST + YEAR_AGE_COST * (current_year - year))
+    ordered = sorted((cost, number) for number, cost in preferred.items())
+    yield from ordered
+    for number in range(10 ** num_digits):
+        if number not in preferred:
+            yield OTHER_DIGITS_COST, number
+
+def _number_stream(index):
+    """Huecos numéricos como (coste, hueco): sin número y luego números × plantillas."""
+    yield 0.0, 0
+    templates = [_number_template_stream(index, template, template_cost)
+                 for template, template_cost in enumerate(NUMBER_TEMPLATE_COSTS)]
+    yield from heapq.merge(*templates)
+
+def _number_template_stream(index, template, template_cost):
+    for cost, number_index in _number_costs(index):
+        yield cost + template_cost, 1 + number_index * NUMBER_TEMPLATES + template
+
+def _special_stream(index):
+    """Huecos especiales como (coste, hueco): sin carácter y luego caracteres × plantillas."""
+    def char_rank(char):
+        return COMMON_SPECIALS.index(char) if char in COMMON_SPECIALS else len(COMMON_SPECIALS)
+    slots = [(0.0, 0)]
+    for char_index, char in enumerate(index.special_chars):
+        for template, template_cost in enumerate(SPECIAL_TEMPLATE_COSTS):
+            slots.append((SPECIAL_COST + CHAR_RANK_COST * char_rank(char) + template_cost,
+                          1 + char_index * SPECIAL_TEMPLATES + template))
+    return iter(sorted(slots))
+
+class _LazyStream:
+    """Lista que se llena bajo demanda desde un iterador ordenado (acceso por posición)."""
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._items = []
+
+    def get(self, position):
+        while len(self._items) <= position:
+            item = next(self._iterator, None)
+            if item is None:
+                return None
+            self._items.append(item)
+        return self._items[position]
+
+def iter_probable_candidates(keyword, args_dict):
+    """
+    Recorre los candidatos de una palabra clave de más a menos probable, como (coste, clave).
+    Las tres componentes (variación base, hueco numérico, hueco especial) se ordenan por
+    separado y se combinan de mejor a peor con una cola de prioridad sobre sus posiciones:
+    cada tripleta se visita una sola vez desde un único predecesor más barato.
+    Con --limit se devuelven solo los 'limit' candidatos más probables. Con política de claves
+    solo se devuelven (y cuentan para el límite) los que la cumplen.
+    """
+    index = CandidateIndex(keyword, args_dict)
+    if index.full_count == 0:
+        return
+    streams = [_LazyStream(_base_stream(index)), _LazyStream(_number_stream(index)),
+               _LazyStream(_special_stream(index))]
+    emitted = 0
+    heap = [(sum(stream.get(0)[0] for stream in streams), 0, 0, 0)]
+    while heap and (index.limit is None or emitted < index.limit):
+        cost, i, j, k = heapq.heappop(heap)
+        base, number_slot, special_slot = streams[0].get(i)[1], streams[1].get(j)[1], streams[2].get(k)[1]
+        word = index._apply_special(index._apply_number(index.base(base), number_slot), special_slot)
+        if index.policy is None or index.policy.accepts(word):
+            yield cost, word
+            emitted += 1
+        successors = [(i + 1, j, k)]
+        if i == 0:
+            successors.append((0, j + 1, k))
+            if j == 0:
+                successors.append((0, 0, k + 1))
+        for successor in successors:
+            items = [stream.get(position) for stream, position in zip(streams, successor)]
+            if None not in items:
+                heapq.heappush(heap, (sum(item[0] for item in items),) + successor)
+
+def iter_probable(keywords_settings, budget=None):
+    """
+    Recorre los candidatos de todas las palabras clave en un único orden global de más
+    a menos probable (mezcla por coste de los recorridos de cada palabra), hasta 'budget'
+    claves en total. Devuelve un generador de claves (str).
+    """
+    streams = [iter_probable_candidates(keyword, args_dict) for keyword, args_dict in keywords_settings]
+    merged = (word for _, word in heapq.merge(*streams, key=lambda item: item[0]))
+    return itertools.islice(merged, budget)
+
+def generate_probable(keywords_data, output_filepath=None, stream=None, budget=None, compression=None,
+                      batch_size=65536):
+    """
+    Genera el diccionario en orden de probabilidad estimada con un presupuesto global de
+    claves: con un tiempo de cracking fijo, las 'budget' más probables de todas las palabras
+    clave. Escribe en output_filepath (comprimido si se indica) o en stream (flujo binario).
+    Devuelve el número de claves escritas.
+    """
+    keywords_settings = [(item['keyword'], keyword_args_dict(item['args'])) for item in keywords_data]
+    tqdm.write(f"Generación por probabilidad: {len(keywords_settings)} palabras clave, "
+               f"presupuesto de {f'{budget:,}' if budget is not None else 'todas las'} claves.")
+    _print_verbose("Orden: capitalizada y pocas mayúsculas, años recientes y sufijos habituales primero.")
+    out = stream if stream is not None else open_compressed(output_filepath, "wb", compression)
+    written = 0
+    pbar = tqdm(desc="Total generado", unit="claves", total=budget, leave=True,
+                file=sys.stderr if stream is not None else sys.stdout)
+    try:
+        candidates = iter_probable(keywords_settings, budget)
+        while True:
+            batch = list(itertools.islice(candidates, batch_size))
+            if not batch:
+                break
+            try:
+                out.write("".join(candidate + "\n" for candidate in batch).encode("utf-8"))
+            except BrokenPipeError:
+                _discard_stream(stream)
+                tqdm.write("\nLa salida estándar se cerró; generación detenida.")
+                return written
+            written += len(batch)
+            pbar.update(len(batch))
+    finally:
+        pbar.close()
+        if stream is None:
+            out.close()
+    tqdm.write(f"\n¡Generación completa! {written:,} claves en orden de probabilidad"
+               f"{f' guardadas en {output_filepath!r}' if stream is None else ''}.")
+    return written
@@ -0,0 +1,68 @@
+import os
+import time
+from tqdm import tqdm
+
+# Coste fijo estimado por clave, en bytes equivalentes: generar una clave cuesta algo más que escribir sus bytes
+CANDIDATE_OVERHEAD = 8
+
+def estimate_cost(index, start=0, stop=None):
+    """
+    Coste estimado de generar las claves [start, stop) de un índice de candidatos: los bytes
+    exactos de salida más un coste fijo por clave. Recoge de una vez la longitud de la palabra,
+    la mezcla de mayúsculas, los números, los caracteres especiales y el límite.
+    """
+    stop = index.count if stop is None else min(stop, index.count)
+    if start >= stop:
+        return 0
+    return index.byte_size(start, stop) + CANDIDATE_OVERHEAD * (stop - start)
+
+def parts_for_cost(count, cost, target_cost, min_candidates):
+    """
+    Número de partes en que dividir un rango de 'count' claves y coste 'cost' para que
+    ninguna supere target_cost, sin bajar de min_candidates claves por parte.
+    """
+    if target_cost <= 0 or cost <= target_cost:
+        return 1
+    wanted = -(-cost // target_cost)
+    return max(1, min(wanted, count // min_candidates))
+
+def longest_first(tasks):
+    """Ordena las tareas de mayor a menor coste estimado ('cost') para repartirlas entre procesos."""
+    return sorted(tasks, key=lambda task: task['cost'], reverse=True)
+
+class TaskTimer:
+    """Mide una tarea en el proceso que la ejecuta: pid, segundos de trabajo y claves generadas."""
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def stats(self, candidates, **extra):
+        """Devuelve el resumen de la tarea para el informe de utilización."""
+        return dict(pid=os.getpid(), seconds=time.perf_counter() - self.started, candidates=candidates, **extra)
+
+def worker_utilization(results, wall_seconds):
+    """
+    Agrupa los resúmenes de las tareas por proceso. Devuelve una lista ordenada por pid de
+    diccionarios con pid, tareas, claves, segundos de trabajo y utilización (trabajo / tiempo total).
+    """
+    workers = {}
+    for result in results:
+        if result is None:
+            continue
+        worker = workers.setdefault(result['pid'], {'pid': result['pid'], 'tasks': 0, 'candidates': 0, 'seconds': 0.0})
+        worker['tasks'] += 1
+        worker['candidates'] += result['candidates']
+        worker['seconds'] += result['seconds']
+    for worker in workers.values():
+        worker['utilization'] = min(1.0, worker['seconds'] / wall_seconds) if wall_seconds > 0 else 0.0
+    return [workers[pid] for pid in sorted(workers)]
+
+def print_utilization(workers, wall_seconds, num_processes):
+    """Muestra el trabajo de cada proceso y la utilización media del pool."""
+    if not workers or wall_seconds <= 0:
+        return
+    busy = sum(worker['seconds'] for worker in workers)
+    tqdm.write(f"Utilización de los procesos ({wall_seconds:.1f} s en total):")
+    for worker in workers:
+        tqdm.write(f"  PID {worker['pid']}: {worker['tasks']} tareas, {worker['candidates']:,} claves, "
+                   f"{worker['seconds']:.1f} s de trabajo ({worker['utilization']:.0%})")
+    tqdm.write(f"  Media: {min(1.0, busy / (wall_seconds * num_processes)):.0%} de {num_processes} procesos.")
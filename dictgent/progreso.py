@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+from multiprocessing import RawArray
+from tqdm import tqdm
+
+# Segundos entre refrescos de la barra de progreso
+REPORT_INTERVAL = 0.5
+
+# Contadores compartidos instalados en este proceso (inicializador del pool)
+_counters = None
+
+def create_counters(slots):
+    """
+    Crea los contadores compartidos de progreso: dos enteros por tarea (claves y bytes
+    generados). Cada hueco lo escribe un único proceso, así que no necesitan lock.
+    """
+    return RawArray('q', 2 * max(1, slots))
+
+def install_counters(counters):
+    """Instala en el proceso actual los contadores creados en el principal (inicializador del pool)."""
+    global _counters
+    _counters = counters
+
+def publish(slot, candidates, num_bytes):
+    """Publica el progreso acumulado de la tarea 'slot' en su hueco (no hace nada sin contadores)."""
+    if _counters is not None and slot is not None:
+        _counters[2 * slot] = candidates
+        _counters[2 * slot + 1] = num_bytes
+
+class ProgressReporter:
+    """
+    Hilo del proceso principal que lee periódicamente los contadores compartidos y actualiza
+    la barra de progreso: claves por segundo, bytes por segundo, palabras clave terminadas y
+    tiempo restante frente al total conocido. Los procesos solo escriben en memoria compartida;
+    no hay comunicación entre procesos por cada bloque.
+
+    tasks es una lista, en el orden de los huecos, de diccionarios con 'keyword', 'total'
+    (claves de la tarea) y 'done' (claves ya generadas antes de empezar, al reanudar).
+    """
+    def __init__(self, counters, tasks, desc="Total generado", interval=REPORT_INTERVAL, file=None):
+        self.counters = counters
+        self.tasks = tasks
+        self.interval = interval
+        self.total = sum(task['total'] for task in tasks)
+        self.initial = sum(task['done'] for task in tasks)
+        self.keywords = {}
+        for slot, task in enumerate(tasks):
+            self.keywords.setdefault(task['keyword'], []).append(slot)
+        self._finished = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self.desc = desc
+        self.file = file
+        self.pbar = None
+
+    def __enter__(self):
+        # La barra se crea al entrar: los procesos creados antes no heredan una copia que cerrar al salir
+        self.pbar = tqdm(desc=self.desc, unit="claves", total=self.total, initial=self.initial, leave=True,
+                         mininterval=0, file=self.file if self.file is not None else sys.stdout)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="progreso", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def refresh(self):
+        """Lee los contadores y actualiza la barra."""
+        values = self.counters[:]
+        done = [task['done'] + values[2 * slot] for slot, task in enumerate(self.tasks)]
+        num_bytes = sum(values[1::2])
+        for keyword, slots in self.keywords.items():
+            if keyword not in self._finished and all(done[slot] >= self.tasks[slot]['total'] for slot in slots):
+                self._finished.add(keyword)
+        elapsed = time.perf_counter() - self._started
+        rate = tqdm.format_sizeof(num_bytes / elapsed, suffix="B/s", divisor=1024) if elapsed > 0 else "?"
+        self.pbar.set_postfix_str(f"{rate}, palabras {len(self._finished)}/{len(self.keywords)}", refresh=False)
+        advanced = sum(done) - self.pbar.n
+        if advanced:
+            self.pbar.update(advanced)
+        else:
+            self.pbar.refresh()
+
+    def close(self):
+        """Detiene el hilo, deja la barra con los valores finales y la cierra."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.pbar is not None:
+            if not self.pbar.disable:
+                self.refresh()
+            self.pbar.close()
+            self.pbar = None
@@ -0,0 +1,102 @@
+import json
+import os
+
+# Archivos del punto de control, dentro del directorio de fragmentos ('<salida>.parts')
+MANIFEST_FILE = "checkpoint.json"
+STATE_SUFFIX = ".state"
+CHECKPOINT_VERSION = 1
+# Intervalo por defecto entre puntos de control (segundos)
+DEFAULT_CHECKPOINT_INTERVAL = 30
+
+def manifest_path(shard_dir):
+    return os.path.join(shard_dir, MANIFEST_FILE)
+
+def state_path(shard_file):
+    """Devuelve la ruta del estado asociado a un fragmento."""
+    return f"{shard_file}{STATE_SUFFIX}"
+
+def write_json_atomic(path, data):
+    """
+    Escribe un JSON de forma atómica: primero a un temporal y luego se renombra,
+    así un corte a mitad de escritura nunca deja un punto de control corrupto.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _keywords_signature(keywords_settings):
+    """Representación comparable de las palabras clave y sus opciones."""
+    return [
+        {'keyword': keyword, 'args_dict': dict(args_dict, years_range=list(args_dict['years_range']) if args_dict['years_range'] else None)}
+        for keyword, args_dict in keywords_settings
+    ]
+
+def save_manifest(shard_dir, output_filepath, keywords_settings, tasks, compression=None, candidate_range=None):
+    """
+    Guarda la descripción del trabajo: palabras clave, opciones y el rango de cada tarea.
+    Al reanudar se reutiliza esta división aunque cambie el número de procesos.
+    """
+    write_json_atomic(manifest_path(shard_dir), {
+        'version': CHECKPOINT_VERSION,
+        'output': os.path.abspath(output_filepath),
+        'keywords': _keywords_signature(keywords_settings),
+        'compression': compression,
+        'range': list(candidate_range) if candidate_range is not None else None,
+        'tasks': [
+            {'keyword_index': task['keyword_index'], 'start': task['part']['start'],
+             'stop': task['part']['stop'], 'label': task['part']['label']}
+            for task in tasks
+        ]
+    })
+
+def load_manifest(shard_dir, output_filepath, keywords_settings, compression=None, candidate_range=None):
+    """
+    Carga el punto de control de un trabajo anterior.
+    Lanza ValueError si no existe o si corresponde a otras palabras clave u opciones.
+    """
+    manifest = _read_json(manifest_path(shard_dir))
+    if manifest is None or manifest.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"No se encontró un punto de control válido en '{shard_dir}'.")
+    if manifest['output'] != os.path.abspath(output_filepath):
+        raise ValueError("El punto de control pertenece a otro archivo de salida.")
+    if manifest['keywords'] != _keywords_signature(keywords_settings):
+        raise ValueError("Las palabras clave u opciones no coinciden con las del punto de control.")
+    if manifest.get('compression') != compression:
+        raise ValueError("La compresión (--compress) no coincide con la del punto de control.")
+    if manifest.get('range') != (list(candidate_range) if candidate_range is not None else None):
+        raise ValueError("La porción (--shard) no coincide con la del punto de control.")
+    return manifest
+
+def save_task_state(path, position, num_bytes, done=False):
+    """Guarda la posición alcanzada por una tarea y los bytes válidos de su fragmento."""
+    write_json_atomic(path, {'position': position, 'bytes': num_bytes, 'done': done})
+
+def load_task_state(path):
+    """Devuelve el estado guardado de una tarea, o None si aún no tiene."""
+    return _read_json(path)
+
+def restore_task(shard_file, start):
+    """
+    Prepara el fragmento de una tarea para continuar donde se quedó.
+    Recorta el fragmento a los bytes confirmados en el estado y devuelve
+    (posición desde la que continuar, bytes conservados, terminada).
+    """
+    state = load_task_state(state_path(shard_file))
+    if state is None or not os.path.exists(shard_file):
+        return start, 0, False
+    if os.path.getsize(shard_file) < state['bytes']:
+        # El fragmento no contiene todo lo confirmado (p. ej. corte de energía): se repite la tarea
+        return start, 0, False
+    with open(shard_file, "r+b") as f:
+        f.truncate(state['bytes'])
+    return state['position'], state['bytes'], bool(state['done'])
@@ -0,0 +1,173 @@
+# Variaciones básicas del generador (original, minúsculas, mayúsculas, capitalizada) como reglas
+BASIC_RULES = (":", "l", "u", "c")
+
+_SIMPLE = {
+    'l': 'lower', 'u': 'upper', 'c': 'capitalize', 'C': 'invert_capitalize', 't': 'swapcase',
+    'r': 'reverse', 'd': 'duplicate', '[': 'delete_first', ']': 'delete_last'
+}
+_WITH_POSITION = {'T': 'toggle_at', "'": 'truncate'}
+_WITH_CHAR = {'$': 'append', '^': 'prepend'}
+
+# Planes ya compilados en este proceso y el último usado (las palabras de un trabajo comparten reglas)
+_plans = {}
+_last_plan = None
+
+def _position(char, rule):
+    if char.isdigit():
+        return int(char)
+    if "A" <= char <= "Z":
+        return ord(char) - ord("A") + 10
+    raise ValueError(f"Posición inválida '{char}' en la regla '{rule}' (usa 0-9 o A-Z).")
+
+def parse_rule(rule):
+    """
+    Convierte una regla de hashcat/John (ej. 'c$1$2') en una lista de operaciones
+    (nombre, argumentos...). Funciones soportadas, con N = posición 0-9 o A-Z (10-35):
+      :  nada           l / u  minúsculas / mayúsculas     c / C  capitaliza / al revés
+      t  invierte mayúsculas   TN  invierte la posición N  r  invierte la palabra
+      d  duplica        $X / ^X  añade X al final / al principio   sXY  cambia X por Y
+      'N recorta a N caracteres    [ / ]  borra el primer / último carácter
+    Lanza ValueError si usa funciones no soportadas o le faltan argumentos.
+    """
+    if not isinstance(rule, str):
+        raise ValueError("Las reglas deben ser cadenas de texto.")
+    operations = []
+    i = 0
+    while i < len(rule):
+        char = rule[i]
+        i += 1
+        if char in (":", " "):
+            continue
+        if char in _SIMPLE:
+            operations.append((_SIMPLE[char],))
+            continue
+        needed = 2 if char == "s" else 1
+        if char not in _WITH_POSITION and char not in _WITH_CHAR and char != "s":
+            raise ValueError(f"Función '{char}' no soportada en la regla '{rule}'.")
+        if i + needed > len(rule):
+            raise ValueError(f"Faltan argumentos para '{char}' en la regla '{rule}'.")
+        if char == "s":
+            operations.append(('substitute', rule[i], rule[i + 1]))
+        elif char in _WITH_POSITION:
+            operations.append((_WITH_POSITION[char], _position(rule[i], rule)))
+        else:
+            operations.append((_WITH_CHAR[char], rule[i]))
+        i += needed
+    return operations
+
+def optimize_rule(operations):
+    """
+    Simplifica una lista de operaciones sin cambiar su resultado: une los añadidos
+    consecutivos al final o al principio en uno solo (ej. '$1$2$3' -> añadir '123').
+    """
+    optimized = []
+    for operation in operations:
+        previous = optimized[-1] if optimized else None
+        if previous is not None:
+            if operation[0] == 'append' and previous[0] == 'append':
+                optimized[-1] = ('append', previous[1] + operation[1])
+                continue
+            if operation[0] == 'prepend' and previous[0] == 'prepend':
+                optimized[-1] = ('prepend', operation[1] + previous[1])
+                continue
+        optimized.append(operation)
+    return optimized
+
+def _expression(operations):
+    """Expresión de Python equivalente a aplicar las operaciones a la palabra 'w'."""
+    expression = "w"
+    for name, *arguments in operations:
+        if name in ('lower', 'upper', 'capitalize', 'swapcase'):
+            expression = f"{expression}.{name}()"
+        elif name == 'invert_capitalize':
+            expression = f"_invert_capitalize({expression})"
+        elif name == 'toggle_at':
+            expression = f"_toggle_at({expression}, {arguments[0]})"
+        elif name == 'reverse':
+            expression = f"{expression}[::-1]"
+        elif name == 'duplicate':
+            expression = f"({expression}) * 2"
+        elif name == 'delete_first':
+            expression = f"{expression}[1:]"
+        elif name == 'delete_last':
+            expression = f"{expression}[:-1]"
+        elif name == 'truncate':
+            expression = f"{expression}[:{arguments[0]}]"
+        elif name == 'substitute':
+            expression = f"{expression}.replace({arguments[0]!r}, {arguments[1]!r})"
+        elif name == 'append':
+            expression = f"({expression} + {arguments[0]!r})"
+        elif name == 'prepend':
+            expression = f"({arguments[0]!r} + {expression})"
+    return expression
+
+def _invert_capitalize(word):
+    return word[:1].lower() + word[1:].upper()
+
+def _toggle_at(word, position):
+    if position >= len(word):
+        return word
+    return word[:position] + word[position].swapcase() + word[position + 1:]
+
+class RulePlan:
+    """
+    Conjunto de reglas analizado y simplificado, listo para aplicarse a cada palabra.
+    Todas las reglas se compilan en una única función que devuelve las variaciones de una
+    palabra con una sola expresión, sin un generador por cada etapa.
+    Se puede enviar a otros procesos: solo viajan las operaciones y cada proceso compila
+    la función la primera vez que la usa.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.operations = [optimize_rule(parse_rule(rule)) for rule in self.rules]
+        self._apply = None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __getstate__(self):
+        return {'rules': self.rules, 'operations': self.operations, '_apply': None}
+
+    def source(self):
+        """Código de la función compilada: una lista con una expresión por regla."""
+        return "lambda w: [" + ", ".join(_expression(operations) for operations in self.operations) + "]"
+
+    def apply(self, word):
+        """Devuelve la lista de variaciones de la palabra, una por regla y en el mismo orden."""
+        if self._apply is None:
+            self._apply = eval(self.source(), {'_invert_capitalize': _invert_capitalize, '_toggle_at': _toggle_at})
+        return self._apply(word)
+
+def rule_plan(rules):
+    """
+    Devuelve el plan compilado de una lista de reglas, creándolo la primera vez en este
+    proceso. Se reutiliza el mismo plan para todas las palabras con las mismas reglas.
+    """
+    global _last_plan
+    if _last_plan is not None and _last_plan[0] is rules:
+        return _last_plan[1]
+    key = tuple(rules)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = RulePlan(key)
+        _plans[key] = plan
+    _last_plan = (rules, plan)
+    return plan
+
+def load_rules(path):
+    """
+    Lee un archivo de reglas (una por línea). Se ignoran las líneas vacías y los
+    comentarios que empiezan por '#'. Lanza ValueError si alguna regla no es válida.
+    """
+    rules = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_number, line in enumerate(f, 1):
+            rule = line.rstrip("\r\n")
+            if not rule or rule.startswith("#"):
+                continue
+            try:
+                parse_rule(rule)
+            except ValueError as e:
+                raise ValueError(f"Línea {line_number} de '{path}': {e}") from None
+            rules.append(rule)
+    return rules
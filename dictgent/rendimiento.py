@@ -0,0 +1,350 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contenido import DictionaryGenerator, GenerationSettings, keyword_args_dict
+from indice import CandidateIndex
+from parametros import deduplicate_file_auto
+from vectorial import ENGINES
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage no se mide la memoria máxima
+    resource = None
+
+# Versión del formato JSON de resultados
+BENCHMARK_FORMAT = 1
+# Número de procesos por defecto: 1, 2, 4... hasta los núcleos disponibles
+DEFAULT_PROCESSES = tuple(sorted({1, 2, 4, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1))))
+# Una regresión es una caída de claves/s mayor que esta fracción respecto a la referencia
+DEFAULT_TOLERANCE = 0.10
+# Claves aproximadas de cada carga de trabajo (con --scale 1)
+WORKLOAD_CANDIDATES = 1 << 18
+# Memoria de la deduplicación: pequeña para que el archivo se ordene en varios runs y se mezcle
+DEDUP_MEMORY = 1024 * 1024
+
+def _words(count, length=8, prefix=""):
+    """Palabras clave sintéticas deterministas (mismas en cada ejecución)."""
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = []
+    for i in range(count):
+        word, n = [], i
+        for _ in range(length):
+            n, digit = divmod(n * 7 + 3, 26)
+            word.append(alphabet[digit])
+        words.append(prefix + "".join(word) + str(i))
+    return words
+
+def workloads(scale=1):
+    """
+    Cargas de trabajo fijas: nombre -> (palabras clave, opciones). Casi todas rondan las
+    WORKLOAD_CANDIDATES claves; 'basic' mide el coste por palabra clave (muchas tareas
+    pequeñas). 'scale' multiplica el número de palabras clave (o el límite, en las de una
+    sola palabra) para ajustar la duración.
+    """
+    size = WORKLOAD_CANDIDATES * scale
+    return {
+        'basic': (_words(5000 * scale), GenerationSettings()),
+        'case_mix': (_words(16 * scale, length=14), GenerationSettings(case_mix=True, canonical=True)),
+        'digits3': (_words(12 * scale), GenerationSettings(numbers=True, digits=3)),
+        'digits4': (_words(1), GenerationSettings(numbers=True, digits=4, limit=size)),
+        'digits5': (_words(1), GenerationSettings(numbers=True, digits=5, limit=size)),
+        'digits6': (_words(1), GenerationSettings(numbers=True, digits=6, limit=size)),
+        'years': (_words(150 * scale), GenerationSettings(numbers=True, years_range=(1950, 2030))),
+        'special': (_words(2000 * scale), GenerationSettings(special_chars=list("!@#$%&*?._"))),
+        # Mismo volumen: muchas palabras pequeñas frente a una sola muy grande
+        'many_keywords': (_words(256 * scale, length=10), GenerationSettings(case_mix=True, canonical=True)),
+        'one_keyword': (_words(1, length=24), GenerationSettings(case_mix=True, canonical=True, limit=size)),
+    }
+
+def _peak_rss():
+    """Memoria residente máxima en bytes de este proceso y de sus hijos ya terminados (o None)."""
+    if resource is None:
+        return None
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * unit
+
+def _quiet():
+    """Silencia los mensajes del generador en el proceso de medida."""
+    sys.stdout = open(os.devnull, "w")
+
+def _measure_generation(job):
+    """Ejecuta una generación en un proceso nuevo y devuelve (segundos, bytes, memoria máxima)."""
+    keywords, settings, output_filepath, processes, engine = job
+    _quiet()
+    open(output_filepath, "w").close()
+    keywords_data = [{'keyword': keyword, 'args': settings} for keyword in keywords]
+    started = time.perf_counter()
+    DictionaryGenerator(output_filepath).generate_dictionary_parallel(
+        keywords_data, output_filepath, num_processes=processes, engine=engine)
+    elapsed = time.perf_counter() - started
+    return elapsed, os.path.getsize(output_filepath), _peak_rss()
+
+def _measure_dedup(job):
+    """Deduplica un archivo en un proceso nuevo y devuelve (segundos, bytes, memoria máxima)."""
+    input_filepath, processes = job
+    _quiet()
+    started = time.perf_counter()
+    stats = deduplicate_file_auto(input_filepath, memory_budget=DEDUP_MEMORY, num_processes=processes)
+    elapsed = time.perf_counter() - started
+    if stats is None:
+        raise RuntimeError(f"La deduplicación de '{input_filepath}' falló.")
+    return elapsed, os.path.getsize(input_filepath), _peak_rss()
+
+def _isolated_entry(function, job, connection):
+    try:
+        connection.send((True, function(job)))
+    except BaseException as e:
+        connection.send((False, repr(e)))
+    finally:
+        connection.close()
+
+def _run_isolated(function, job):
+    """
+    Ejecuta function(job) en un proceso nuevo (no daemon, para que pueda crear su pool):
+    cada medida empieza sin cachés ni memoria de las anteriores y la memoria máxima es solo suya.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_isolated_entry, args=(function, job, sender))
+    process.start()
+    sender.close()
+    try:
+        ok, value = receiver.recv()
+    except EOFError:
+        ok, value = False, None
+    process.join()
+    if value is None and not ok:
+        value = f"el proceso terminó con código {process.exitcode}"
+    if not ok:
+        raise RuntimeError(f"Falló la medida: {value}")
+    return value
+
+def run_benchmarks(names=None, processes=DEFAULT_PROCESSES, repeat=3, scale=1, engine="auto",
+                   dedup=True, work_dir=None, progress=print):
+    """
+    Ejecuta las cargas de trabajo 'names' (todas si es None) con cada número de procesos y,
+    con dedup=True, la deduplicación de la salida de 'many_keywords'. De cada combinación
+    se guarda la mejor de 'repeat' ejecuciones. Devuelve el informe (serializable a JSON).
+    """
+    available = workloads(scale)
+    names = list(available) if names is None else list(names)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Cargas de trabajo desconocidas: {', '.join(unknown)}.")
+    processes = sorted(set(processes))
+
+    report = {
+        'format': BENCHMARK_FORMAT,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'engine': engine,
+        'scale': scale,
+        'repeat': repeat,
+        'results': [],
+    }
+    temp_dir = tempfile.mkdtemp(prefix="dictgen-bench-", dir=work_dir)
+    try:
+        for name in names:
+            keywords, settings = available[name]
+            args_dict = keyword_args_dict(settings)
+            candidates = sum(CandidateIndex(keyword, args_dict).count for keyword in keywords)
+            output_filepath = os.path.join(temp_dir, f"{name}.txt")
+            for count in processes:
+                runs = [_run_isolated(_measure_generation, (keywords, settings, output_filepath, count, engine))
+                        for _ in range(repeat)]
+                report['results'].append(_result(name, count, candidates, runs))
+                progress(_format_result(report['results'][-1]))
+            if name == 'many_keywords' and dedup:
+                dedup_input = os.path.join(temp_dir, "dedup.txt")
+                os.replace(output_filepath, dedup_input)
+            else:
+                os.remove(output_filepath)
+        if dedup:
+            dedup_input = os.path.join(temp_dir, "dedup.txt")
+            if not os.path.exists(dedup_input):
+                keywords, settings = available['many_keywords']
+                _run_isolated(_measure_generation, (keywords, settings, dedup_input, max(processes), engine))
+            with open(dedup_input, "rb") as f:
+                lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+            for count in processes:
+                runs = []
+                for _ in range(repeat):
+                    runs.append(_run_isolated(_measure_dedup, (dedup_input, count)))
+                    os.remove(os.path.join(temp_dir, "dedup_unique.txt"))
+                report['results'].append(_result('dedup', count, lines, runs))
+                progress(_format_result(report['results'][-1]))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    _add_efficiency(report['results'])
+    return report
+
+def _result(name, processes, candidates, runs):
+    """Resultado de una combinación: la ejecución más rápida y la memoria máxima de todas."""
+    seconds, num_bytes, _ = min(runs)
+    peaks = [peak for _, _, peak in runs if peak is not None]
+    return {
+        'workload': name,
+        'processes': processes,
+        'candidates': candidates,
+        'bytes': num_bytes,
+        'seconds': round(seconds, 4),
+        'candidates_per_second': round(candidates / seconds, 1) if seconds > 0 else None,
+        'mb_per_second': round(num_bytes / seconds / (1024 * 1024), 2) if seconds > 0 else None,
+        'peak_rss': max(peaks) if peaks else None,
+    }
+
+def _add_efficiency(results):
+    """
+    Eficiencia de escalado de cada resultado: aceleración frente al menor número de procesos
+    medido en esa carga, dividida entre el aumento de procesos (1.0 = escalado lineal).
+    """
+    reference = {}
+    for result in results:
+        best = reference.get(result['workload'])
+        if best is None or result['processes'] < best['processes']:
+            reference[result['workload']] = result
+    for result in results:
+        base = reference[result['workload']]
+        if result['seconds'] > 0:
+            speedup = base['seconds'] / result['seconds']
+            result['efficiency'] = round(speedup * base['processes'] / result['processes'], 3)
+        else:
+            result['efficiency'] = None
+
+def _format_result(result):
+    peak = f"{result['peak_rss'] / (1024 * 1024):.0f} MiB" if result['peak_rss'] is not None else "?"
+    efficiency = f", eficiencia {result['efficiency']:.0%}" if result.get('efficiency') is not None else ""
+    return (f"{result['workload']:<14} p={result['processes']:<3} {result['seconds']:>8.3f} s  "
+            f"{result['candidates_per_second'] or 0:>12,.0f} claves/s  {result['mb_per_second'] or 0:>8.2f} MB/s  "
+            f"RSS {peak}{efficiency}")
+
+def compare_with_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compara las claves/s de cada (carga, procesos) con las de una ejecución de referencia.
+    Devuelve una lista de (resultado, resultado de referencia, cociente, es_regresión) para
+    las combinaciones presentes en ambos informes.
+    """
+    reference = {(result['workload'], result['processes']): result for result in baseline.get('results', [])}
+    comparison = []
+    for result in report['results']:
+        base = reference.get((result['workload'], result['processes']))
+        if base is None or not base.get('candidates_per_second') or not result.get('candidates_per_second'):
+            continue
+        ratio = result['candidates_per_second'] / base['candidates_per_second']
+        comparison.append((result, base, ratio, ratio < 1 - tolerance))
+    return comparison
+
+def parse_benchmark_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide el rendimiento de la generación y la deduplicación con cargas de trabajo fijas.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "-w", "--workloads",
+        nargs='+',
+        choices=list(workloads()),
+        help="Cargas de trabajo a medir (por defecto, todas)."
+    )
+    parser.add_argument(
+        "-p", "--processes",
+        type=int,
+        nargs='+',
+        default=list(DEFAULT_PROCESSES),
+        help=f"Números de procesos a medir (por defecto: {' '.join(map(str, DEFAULT_PROCESSES))})."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Ejecuciones de cada medida; se guarda la más rápida (por defecto: 3)."
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Multiplica el tamaño de las cargas de trabajo (por defecto: 1)."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Motor de los bloques con números (por defecto: auto)."
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="No mide la deduplicación."
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Guarda los resultados en este archivo JSON."
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Archivo JSON de una ejecución anterior con el que comparar."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Caída de claves/s tolerada frente a la referencia (por defecto: {DEFAULT_TOLERANCE})."
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="Directorio para los archivos temporales (por defecto, el del sistema)."
+    )
+    args = parser.parse_args(argv)
+    if any(count <= 0 for count in args.processes):
+        parser.error("Los números de procesos deben ser positivos.")
+    if args.repeat <= 0 or args.scale <= 0:
+        parser.error("--repeat y --scale deben ser números positivos.")
+    if not 0 <= args.tolerance < 1:
+        parser.error("--tolerance debe estar entre 0 y 1.")
+    return args
+
+def main(argv=None):
+    """
+    Punto de entrada de línea de comandos. Devuelve 1 si hay alguna regresión frente a
+    la referencia (para usarlo antes de publicar una versión) y 0 si no.
+    """
+    args = parse_benchmark_arguments(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_benchmarks(args.workloads, args.processes, repeat=args.repeat, scale=args.scale,
+                            engine=args.engine, dedup=not args.no_dedup, work_dir=args.work_dir)
+    print("\n--- Eficiencia de escalado ---")
+    for result in report['results']:
+        print(_format_result(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados guardados en '{args.output}'.")
+
+    if baseline is None:
+        return 0
+    print(f"\n--- Comparación con '{args.baseline}' (tolerancia {args.tolerance:.0%}) ---")
+    regressions = 0
+    for result, base, ratio, regression in compare_with_baseline(report, baseline, args.tolerance):
+        regressions += regression
+        print(f"{result['workload']:<14} p={result['processes']:<3} {base['candidates_per_second']:>12,.0f} -> "
+              f"{result['candidates_per_second']:>12,.0f} claves/s ({ratio - 1:+.1%}){'  REGRESIÓN' if regression else ''}")
+    if regressions:
+        print(f"\n{regressions} regresiones de rendimiento.")
+        return 1
+    print("\nSin regresiones.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
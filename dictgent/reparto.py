@@ -0,0 +1,54 @@
+import hashlib
+import json
+from indice import CandidateIndex
+from puntos_control import _keywords_signature
+
+def parse_shard(text):
+    """
+    Interpreta una porción 'K/N' (1 <= K <= N): la K-ésima de N partes iguales del espacio
+    de candidatos. Devuelve (K, N) o lanza ValueError.
+    """
+    try:
+        shard, shards = (int(value) for value in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Porción inválida '{text}': usa K/N, ej. 2/4.") from None
+    if shards < 1 or not 1 <= shard <= shards:
+        raise ValueError(f"Porción inválida '{text}': K debe estar entre 1 y N.")
+    return shard, shards
+
+def keyword_offsets(keywords_settings):
+    """
+    Posición de cada palabra clave en el índice global: todas las palabras clave una tras otra,
+    en el orden de generación. Devuelve (lista de inicios, total de candidatos).
+    """
+    offsets = []
+    total = 0
+    for keyword, args_dict in keywords_settings:
+        offsets.append(total)
+        total += CandidateIndex(keyword, args_dict).count
+    return offsets, total
+
+def shard_range(total, shard, shards):
+    """Rango global [inicio, fin) de la porción shard/shards (contigua, del mismo tamaño ±1)."""
+    return total * (shard - 1) // shards, total * shard // shards
+
+def keyword_ranges(keywords_settings, start, stop, offsets=None):
+    """
+    Traduce el rango global [start, stop) a rangos por palabra clave.
+    Devuelve una lista de (índice de palabra, inicio, fin) en el orden de generación; las
+    palabras que no caen en el rango no aparecen.
+    """
+    if offsets is None:
+        offsets, _ = keyword_offsets(keywords_settings)
+    ranges = []
+    for keyword_index, ((keyword, args_dict), offset) in enumerate(zip(keywords_settings, offsets)):
+        count = CandidateIndex(keyword, args_dict).count
+        local_start, local_stop = max(start - offset, 0), min(stop - offset, count)
+        if local_start < local_stop:
+            ranges.append((keyword_index, local_start, local_stop))
+    return ranges
+
+def job_fingerprint(keywords_settings):
+    """Huella de las palabras clave y opciones: los nodos y el coordinador deben compartirla."""
+    signature = json.dumps(_keywords_signature(keywords_settings), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
@@ -0,0 +1,135 @@
+# Tabla de sustituciones leet por defecto (se aplican sin distinguir mayúsculas: 'A' -> '4' o '@')
+DEFAULT_LEET_TABLE = {
+    'a': ['4', '@'],
+    'b': ['8'],
+    'e': ['3'],
+    'g': ['9'],
+    'i': ['1', '!'],
+    'l': ['1'],
+    'o': ['0'],
+    's': ['$', '5'],
+    't': ['7'],
+    'z': ['2'],
+}
+# Sustituciones leet por palabra por defecto
+DEFAULT_LEET_MAX = 2
+
+class PositionalSpace:
+    """
+    Variaciones de una palabra en las que cada posición elige una opción: las opciones
+    gratuitas (el carácter original o sus mayúsculas/minúsculas) o una sustitución, que
+    cuesta 1, con como mucho max_cost sustituciones en total.
+
+    Las variaciones se ordenan lexicográficamente por posición (primero las opciones
+    gratuitas y luego las sustituciones, en el orden de la tabla). Sin sustituciones el
+    orden coincide con el de las máscaras de mayúsculas. Con una tabla de conteo por
+    (posición, presupuesto restante) se obtiene el total y la N-ésima variación sin
+    enumerar ni descartar las que superan el presupuesto.
+    """
+    def __init__(self, options, max_cost):
+        """options: lista por posición de (opciones gratuitas, sustituciones), listas de str."""
+        if max_cost is None or max_cost < 0:
+            raise ValueError("El máximo de sustituciones no puede ser negativo.")
+        self.options = options
+        self.max_cost = max_cost
+        positions = len(options)
+        # ways[i][k]: variaciones de las posiciones i.. con como mucho k sustituciones
+        # lengths[i][k]: suma de sus longitudes en bytes (UTF-8)
+        self._ways = [[1] * (max_cost + 1) for _ in range(positions + 1)]
+        self._lengths = [[0] * (max_cost + 1) for _ in range(positions + 1)]
+        self._sizes = [
+            ([len(option.encode("utf-8")) for option in free], [len(option.encode("utf-8")) for option in paid])
+            for free, paid in options
+        ]
+        for i in range(positions - 1, -1, -1):
+            free_sizes, paid_sizes = self._sizes[i]
+            for k in range(max_cost + 1):
+                ways = len(free_sizes) * self._ways[i + 1][k]
+                lengths = sum(free_sizes) * self._ways[i + 1][k] + len(free_sizes) * self._lengths[i + 1][k]
+                if k:
+                    ways += len(paid_sizes) * self._ways[i + 1][k - 1]
+                    lengths += sum(paid_sizes) * self._ways[i + 1][k - 1] + len(paid_sizes) * self._lengths[i + 1][k - 1]
+                self._ways[i][k] = ways
+                self._lengths[i][k] = lengths
+        self.count = self._ways[0][max_cost]
+
+    def unrank(self, index):
+        """Devuelve la variación número 'index'."""
+        if not 0 <= index < self.count:
+            raise IndexError("Índice de variación fuera de rango.")
+        parts = []
+        budget = self.max_cost
+        for i, (free, paid) in enumerate(self.options):
+            block = self._ways[i + 1][budget]
+            if index < len(free) * block:
+                option, index = divmod(index, block)
+                parts.append(free[option])
+                continue
+            index -= len(free) * block
+            budget -= 1
+            option, index = divmod(index, self._ways[i + 1][budget])
+            parts.append(paid[option])
+        return "".join(parts)
+
+    def length_sum(self, stop):
+        """Suma de las longitudes en bytes de las variaciones [0, stop)."""
+        stop = min(stop, self.count)
+        total = 0
+        prefix = 0  # Bytes de las opciones ya fijadas en las posiciones anteriores
+        budget = self.max_cost
+        remaining = stop
+        for i in range(len(self.options)):
+            if remaining == 0:
+                break
+            free_sizes, paid_sizes = self._sizes[i]
+            chosen = None
+            for sizes, cost in ((free_sizes, 0), (paid_sizes, 1)):
+                if cost > budget:
+                    continue
+                ways = self._ways[i + 1][budget - cost]
+                for size in sizes:
+                    if remaining < ways:
+                        chosen = (size, cost)
+                        break
+                    # Opción completa: todas las variaciones de las posiciones siguientes
+                    total += (prefix + size) * ways + self._lengths[i + 1][budget - cost]
+                    remaining -= ways
+                if chosen is not None or remaining == 0:
+                    break
+            if chosen is None:
+                break
+            prefix += chosen[0]
+            budget -= chosen[1]
+        return total
+
+def leet_options(chars, table, canonical=False):
+    """
+    Construye las opciones por posición para PositionalSpace: 'chars' es una lista de
+    opciones gratuitas por posición y table, un diccionario carácter -> sustituciones
+    (se busca por la minúscula del carácter original, el primero de sus opciones).
+    En modo canónico se omiten las sustituciones que repiten una opción de esa posición.
+    """
+    options = []
+    for free in chars:
+        paid = list(table.get(free[0].lower(), []))
+        if canonical:
+            paid = [option for option in dict.fromkeys(paid) if option not in free]
+        options.append((free, paid))
+    return options
+
+def load_leet_table(path):
+    """
+    Lee una tabla de sustituciones: una línea por carácter con sus sustituciones separadas
+    por espacios (ej. 'a 4 @'). Se ignoran las líneas vacías y las que empiezan por '#'.
+    Lanza ValueError si alguna línea no es válida.
+    """
+    table = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields[0]) != 1 or len(fields) < 2:
+                raise ValueError(f"Línea {line_number} de '{path}': usa 'carácter sustitución [sustitución...]'.")
+            table.setdefault(fields[0].lower(), []).extend(fields[1:])
+    return table
@@ -0,0 +1,70 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa el motor de Python
+    np = None
+
+ENGINES = ("auto", "python", "numpy")
+
+def numpy_available():
+    return np is not None
+
+def resolve_engine(engine="auto"):
+    """
+    Devuelve True si debe usarse el motor vectorizado de NumPy.
+    'auto' lo usa si NumPy está instalado; 'numpy' lo exige (ValueError si falta).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Motor desconocido: '{engine}'. Opciones: {', '.join(ENGINES)}.")
+    if engine == "numpy" and np is None:
+        raise ValueError("El motor 'numpy' requiere tener NumPy instalado (pip install numpy).")
+    return engine != "python" and np is not None
+
+def _row_layout(word, special_chars, keep=None):
+    """
+    Describe la fila de bytes que producen las 5 plantillas numéricas de un número (con sus
+    variaciones especiales) como segmentos: bytes fijos o None en el lugar del número.
+    keep limita la fila a esos huecos (plantilla * huecos especiales + hueco especial).
+    """
+    templates = (
+        [word, None],
+        [None, word],
+        [word, b"_", None],
+        [None, b"_", word],
+        [word, None, word],
+    )
+    cells = []
+    for variant in templates:
+        cells.append(variant + [b"\n"])
+        for char in special_chars:
+            cells.append(variant + [char, b"\n"])
+            cells.append([char] + variant + [b"\n"])
+            cells.append(variant + [char] + variant + [b"\n"])
+    if keep is not None:
+        cells = [cells[cell] for cell in keep]
+    return [segment for cell in cells for segment in cell]
+
+def render_numbers(word, numbers, special_chars=(), keep=None):
+    """
+    Construye con NumPy el bloque de bytes de una variación base (bytes) con una lista
+    de números codificados del mismo ancho. Cada número ocupa una fila de ancho fijo de
+    una matriz uint8: las partes fijas se copian de una fila plantilla y los números se
+    asignan por columnas, así el bloque completo sale de una sola llamada a tobytes().
+    keep (ver _row_layout) construye solo los huecos que cumplen la política de claves.
+    """
+    count = len(numbers)
+    width = len(numbers[0])
+    digits = np.frombuffer(b"".join(numbers), dtype=np.uint8).reshape(count, width)
+
+    template = bytearray()
+    number_columns = []
+    for segment in _row_layout(word, special_chars, keep):
+        if segment is None:
+            number_columns.append(len(template))
+            template += b"\0" * width
+        else:
+            template += segment
+    rows = np.empty((count, len(template)), dtype=np.uint8)
+    rows[:] = np.frombuffer(bytes(template), dtype=np.uint8)
+    for column in number_columns:
+        rows[:, column:column + width] = digits
+    return rows.tobytes()